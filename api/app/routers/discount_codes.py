@@ -1,12 +1,24 @@
+import asyncio
 import logging
-from fastapi import Depends, APIRouter, HTTPException
+from functools import partial
+from typing import Literal
+from fastapi import Depends, APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from api.datatypes.user import User, UserRole
-from api.datatypes.discount_code import DiscountCodeCreate, DiscountCodeUpdate
+from api.datatypes.discount_code import (
+    DiscountCampaignCreate, DiscountCodeCreate, DiscountCodeUpdate
+)
 from api.models.discount_code_model import DiscountCodeModel
 from api.auth_utils import require_role
+from api.utilities.discount_campaign import (
+    MAX_CAMPAIGN_SIZE, MAX_CODE_LENGTH, MIN_CODE_LENGTH, PREFIX_PATTERN,
+    generate_codes
+)
 from api.utilities.discount_code_validation import (
     create_or_update_discount_code_validation
 )
+from api.utilities.export import EXPORT_MEDIA_TYPES, export_chunks
+from api.utilities.prefetch import run_pooled
 from psycopg2.errors import UniqueViolation
 logger = logging.getLogger(__name__)
 
@@ -38,13 +50,76 @@ async def create_discount_code(d: DiscountCodeCreate,
                             detail="Failed to create discount code")
     logger.info("Admin ID %s created new discount code",
                 current_user.id)
-    locations = discount_code_model.get_all_locations_by_code(d.code)
-    created["locations"] = locations
     return {
         "message": "Discount codes created successfully",
         "discount_code": created}
 
 
+@router.post("/discount-codes/campaigns", status_code=201)
+async def create_discount_campaign(
+        campaign: DiscountCampaignCreate,
+        export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+        current_user: User = Depends(require_role(UserRole.SUPERADMIN))):
+    """
+    Generate a campaign of random discount codes with the same rules.
+
+    Args:
+        campaign (DiscountCampaignCreate): The prefix, number and rules of
+            the codes.
+        export_format (str): Either "csv" or "ndjson".
+        current_user (User): The currently authenticated admin user.
+
+    Raises:
+        HTTPException: 400 if the rules, prefix, code length or number of
+            codes are invalid.
+        HTTPException: 500 if not enough unique codes could be generated.
+
+    Returns:
+        StreamingResponse: The generated codes.
+    """
+    create_or_update_discount_code_validation(campaign, current_user)
+    if not 1 <= campaign.count <= MAX_CAMPAIGN_SIZE:
+        logger.error("Admin ID %s tried to create a campaign of %s codes",
+                     current_user.id, campaign.count)
+        raise HTTPException(
+            status_code=400,
+            detail=f"A campaign needs between 1 and {MAX_CAMPAIGN_SIZE} codes")
+    if not MIN_CODE_LENGTH <= campaign.code_length <= MAX_CODE_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Code length must be between {MIN_CODE_LENGTH} and {MAX_CODE_LENGTH}")
+    if not PREFIX_PATTERN.match(campaign.prefix):
+        raise HTTPException(
+            status_code=400,
+            detail="Prefix may only contain letters, digits, - and _, at most 20 characters")
+
+    try:
+        # Runs on its own pooled connection, so other requests can use the
+        # connection of the model while the codes are loaded
+        codes = await asyncio.to_thread(
+            run_pooled, discount_code_model.create_discount_campaign, campaign,
+            partial(generate_codes, campaign.prefix, campaign.code_length))
+    except RuntimeError:
+        logger.error("Admin ID %s tried to create a campaign with prefix %s, "
+                     "but not enough unique codes could be generated",
+                     current_user.id, campaign.prefix)
+        raise HTTPException(status_code=500,
+                            detail="Failed to generate unique discount codes")
+    logger.info("Admin ID %s created a campaign of %s discount codes with prefix %s",
+                current_user.id, len(codes), campaign.prefix)
+
+    chunk_size = 5000
+    chunks = ([(code,) for code in codes[i:i + chunk_size]]
+              for i in range(0, len(codes), chunk_size))
+    filename = f"campaign-{campaign.prefix or 'codes'}.{export_format}"
+    return StreamingResponse(
+        export_chunks(export_format, ("code",), chunks),
+        status_code=201,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/discount-codes")
 async def get_all_discount_codes(
     current_user: User = Depends(
@@ -58,10 +133,6 @@ async def get_all_discount_codes(
                             detail="No discount codes were found.")
     logger.info("Admin ID %s retrieved all discount codes",
                 current_user.id)
-    for discount_code in results:
-        locations = discount_code_model.get_all_locations_by_code(
-            discount_code["code"])
-        discount_code["locations"] = locations
     return {
         "message": retrieved_succesfully_message,
         "discount_code": results}
@@ -80,10 +151,6 @@ async def get_all_active_discount_codes(
                             detail="No active discount codes were found.")
     logger.info("Admin ID %s retrieved all active discount codes",
                 current_user.id)
-    for discount_code in results:
-        locations = discount_code_model.get_all_locations_by_code(
-            discount_code["code"])
-        discount_code["locations"] = locations
     return {
         "message": retrieved_succesfully_message,
         "discount_code": results}
@@ -103,8 +170,6 @@ async def get_discord_code_by_code(
                             detail="No discount code was found.")
     logger.info("Admin ID %s retrieved data for discount code %s",
                 current_user.id, code)
-    locations = discount_code_model.get_all_locations_by_code(code)
-    discount_code["locations"] = locations
     return {
         "message": retrieved_succesfully_message,
         "discount_code": discount_code}
@@ -136,8 +201,7 @@ async def deactive_discount_code(
                             detail="Update was unsuccesful")
     logger.info("Admin ID %s deactived discount code %s",
                 current_user.id, code)
-    locations = discount_code_model.get_all_locations_by_code(code)
-    discount_code["locations"] = locations
+    deactivated["locations"] = discount_code["locations"]
     return {
         "message": "Discount code deactivated successfully",
         "discount_code": deactivated}
@@ -194,7 +258,5 @@ async def update_discount_code(
                      current_user.id, code)
         raise HTTPException(status_code=500,
                             detail="Update has has failed")
-    locations = discount_code_model.get_all_locations_by_code(d.code)
-    update["locations"] = locations
     return {"message": "Discount code updated successfully",
             "discount_code": update}
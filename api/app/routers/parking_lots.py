@@ -2,15 +2,23 @@
 This file contains all endpoints related to parking lots.
 """
 
+import asyncio
 import logging
-from datetime import date
-from fastapi import APIRouter, HTTPException, status, Depends
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from api.models.availability_model import AvailabilityModel
 from api.models.parking_lot_model import ParkingLotModel
 from api.models.session_model import SessionModel
 from api.models.reservation_model import ReservationModel
-from api.datatypes.parking_lot import ParkingLot, ParkingLotCreate, ParkingLotFilter
+from api.datatypes.parking_lot import ParkingLot, ParkingLotCreate, ParkingLotFilter, TariffSimulation
+from api.datatypes.session import SessionFilter
 from api.datatypes.user import User, UserRole
 from api.auth_utils import get_current_user, require_role
+from api.session_calculator import simulate_revenue
+from api.utilities.availability import (SLOT_MINUTES, days_between, free_capacity,
+                                        is_valid_granularity)
+from api.utilities.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
 
 
 logger = logging.getLogger(__name__)
@@ -19,6 +27,10 @@ router = APIRouter(tags=["parking lot"])
 
 parking_lot_model: ParkingLotModel = ParkingLotModel()
 reservation_model: ReservationModel = ReservationModel()
+session_model: SessionModel = SessionModel()
+availability_model: AvailabilityModel = AvailabilityModel()
+
+MAX_AVAILABILITY_WINDOW = timedelta(days=31)
 
 def get_lot_if_exists(lid: int):
     """Gets a parking lot based on a specific lot id. 
@@ -157,24 +169,101 @@ async def get_parking_lot_by_lid(lid: int):
     return get_lot_if_exists(lid)
 
 
+@router.get("/parking-lots/{lid}/availability")
+async def get_parking_lot_availability(
+    lid: int,
+    start_time: Optional[datetime] = Query(None, alias="from"),
+    end_time: Optional[datetime] = Query(None, alias="to"),
+    granularity: int = Query(60, description="The size of a bucket in minutes"),
+):
+    """Gets the free spots of a parking lot per time bucket, based on its reservations.
+
+    The booked slots are read from the availability table and cached per
+    parking lot, so the reservations themselves are never queried.
+
+    Args:
+        lid (int): The id of the parking lot.
+        start_time (datetime | None): The start of the window, defaults to now.
+        end_time (datetime | None): The end of the window, defaults to one day after the start.
+        granularity (int): The size of a bucket in minutes. Must be a multiple of
+            15 minutes that divides a day.
+
+    Returns:
+        dict[str, Any]: The capacity of the parking lot and the free spots per bucket.
+
+    Raises:
+        HTTPException: Raises 404 if there are no parking lots with the specified id.
+        HTTPException: Raises 400 if the window or granularity is invalid.
+    """
+    parking_lot = get_lot_if_exists(lid)
+
+    if start_time is None:
+        start_time = datetime.now()
+    if end_time is None:
+        end_time = start_time + timedelta(days=1)
+
+    if not is_valid_granularity(granularity):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Bad Request",
+                "message": f"granularity must be a multiple of {SLOT_MINUTES} minutes that divides a day",
+                "code": "INVALID_GRANULARITY",
+            },
+        )
+    if start_time >= end_time or end_time - start_time > MAX_AVAILABILITY_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Bad Request",
+                "message": f"from must be before to and the window can be at most "
+                           f"{MAX_AVAILABILITY_WINDOW.days} days",
+                "code": "INVALID_DATE_RANGE",
+            },
+        )
+
+    slots_by_day = availability_model.get_slots(lid, days_between(start_time, end_time))
+    return {
+        "parking_lot_id": lid,
+        "capacity": parking_lot.capacity,
+        "granularity": granularity,
+        "buckets": free_capacity(slots_by_day, parking_lot.capacity,
+                                 start_time, end_time, granularity),
+    }
+
+
 
 
 @router.get("/parking-lots/{lid}/sessions")
 async def get_all_sessions_by_lid(
     lid: int,
+    response: Response,
+    start_from: Optional[datetime] = Query(None, alias="from"),
+    start_to: Optional[datetime] = Query(None, alias="to"),
+    active_only: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     _: User = Depends(require_role(UserRole.SUPERADMIN)),
 ):
-    """Gets all sessions of a specified parking lot. 
+    """Gets one page of sessions of a specified parking lot, ordered by start time.
+
+    The cursor of the next page is returned in the X-Next-Cursor header.
 
     Args:
         lid (int): The id of the parking lot.
+        start_from (datetime | None): Only sessions that started at or after this time.
+        start_to (datetime | None): Only sessions that started before this time.
+        active_only (bool): Only sessions that have not been stopped.
+        cursor (str | None): The cursor of the page to retrieve.
+        limit (int): The maximum number of sessions on the page.
         _ (User): Checks if the logged in user is a super admin
 
     Returns:
-        [Session]: Information about all the sessions of a specified parking lot.
+        [Session]: Information about the sessions of a specified parking lot.
 
     Raises:
         HTTPException: Raises 404 if there are no parking lots with the specified id.
+        HTTPException: Raises 400 if the cursor is invalid.
         HTTPException: Raises 403 if the logged in user is not a super admin.
         HTTPException: Raises 401 if there is no user logged in.
     """
@@ -182,8 +271,20 @@ async def get_all_sessions_by_lid(
 
     _ = get_lot_if_exists(lid)
 
-    logger.info("A superadmin retrieved all sessions for parking lot %s", lid)
-    sessions = parking_lot_model.get_all_sessions_by_lid(lid)
+    filters = SessionFilter(
+        parking_lot_id=lid,
+        start_from=start_from,
+        start_to=start_to,
+        active_only=active_only,
+        after=decode_cursor(cursor, (datetime.fromisoformat, int)),
+        limit=limit,
+    )
+    sessions, next_cursor = paginate(
+        session_model.find_sessions(filters), limit,
+        lambda s: (s.start_time, s.id))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
     logger.info(
         "Successfully retrieved %s sessions for parking lot %s",
         len(sessions),
@@ -439,6 +540,156 @@ async def update_parking_lot_status(
         "closed_date": closed_date,
     }
 
+@router.post("/parking-lots/{lid}/tariff-simulation")
+async def simulate_parking_lot_tariffs(
+    lid: int,
+    simulation: TariffSimulation,
+    _: User = Depends(require_role(UserRole.SUPERADMIN, UserRole.PAYMENTADMIN)),
+):
+    """Simulates the revenue of a parking lot with different tariffs.
+
+    All finished sessions of the parking lot are replayed with the current
+    and with the simulated tariffs, without discount codes.
+
+    Args:
+        lid (int): The id of the parking lot.
+        simulation (TariffSimulation): The tariffs and period to simulate.
+        _ (User): Checks if the logged in user is a super admin or payment admin.
+
+    Returns:
+        dict[str, Any]: The current and projected revenue in total and per day.
+
+    Raises:
+        HTTPException: Raises 404 if there are no parking lots with the specified id.
+        HTTPException: Raises 400 if the start date is after the end date.
+        HTTPException: Raises 403 if the logged in user is not allowed to simulate tariffs.
+        HTTPException: Raises 401 if there is no user logged in.
+    """
+    parking_lot = get_lot_if_exists(lid)
+
+    if (simulation.start_date and simulation.end_date
+            and simulation.start_date > simulation.end_date):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Bad Request",
+                "message": "start_date must be before end_date",
+                "code": "INVALID_DATE_RANGE",
+            },
+        )
+
+    new_tariff = parking_lot.tariff if simulation.tariff is None else simulation.tariff
+    new_daytariff = (parking_lot.daytariff if simulation.daytariff is None
+                     else simulation.daytariff)
+
+    logger.info(
+        "Simulating tariff %s and day tariff %s for parking lot %s",
+        new_tariff,
+        new_daytariff,
+        lid,
+    )
+    days = await asyncio.to_thread(
+        simulate_revenue,
+        parking_lot_model.iter_session_times(
+            lid, simulation.start_date, simulation.end_date
+        ),
+        parking_lot.tariff,
+        parking_lot.daytariff,
+        new_tariff,
+        new_daytariff,
+    )
+
+    current_revenue = round(sum(day["current_revenue"] for day in days), 2)
+    projected_revenue = round(sum(day["projected_revenue"] for day in days), 2)
+    return {
+        "parking_lot_id": lid,
+        "current_tariff": parking_lot.tariff,
+        "current_daytariff": parking_lot.daytariff,
+        "tariff": new_tariff,
+        "daytariff": new_daytariff,
+        "sessions": sum(day["sessions"] for day in days),
+        "current_revenue": current_revenue,
+        "projected_revenue": projected_revenue,
+        "difference": round(projected_revenue - current_revenue, 2),
+        "days": days,
+    }
+
+
+@router.post("/parking-lots/{lid}/close")
+async def close_parking_lot(
+    lid: int,
+    closed_reason: str,
+    closed_date: date = None,
+    current_user: User = Depends(require_role(UserRole.SUPERADMIN)),
+):
+    """Closes the specified parking lot and stops all of its active sessions.
+
+    All sessions are stopped in one transaction. Their costs are calculated
+    in one batch and a payment is created for every session that was not
+    started from a reservation.
+
+    Args:
+        lid (int): The id of the parking lot.
+        closed_reason (str): The reason why the parking lot is closed.
+        closed_date (date): The date of when the parking lot was closed.
+        current_user (User): Checks if the logged in user is a super admin.
+
+    Returns:
+        dict[str, Any]: The closed parking lot and the sessions that were stopped.
+
+    Raises:
+        HTTPException: Raises 404 if there are no parking lots with the specified id.
+        HTTPException: Raises 500 if there is an error when closing the parking lot.
+        HTTPException: Raises 403 if the logged in user is not a super admin.
+        HTTPException: Raises 401 if there is no user logged in.
+    """
+    logger.info(
+        "Superadmin %s attempting to close parking lot %s", current_user.id, lid
+    )
+    _ = get_lot_if_exists(lid)
+    closed_date = closed_date or date.today()
+
+    try:
+        stopped_sessions = parking_lot_model.close_parking_lot(
+            lid, closed_reason, closed_date
+        )
+    except Exception as e:
+        logger.error("Failed to close parking lot %s: %s", lid, str(e))
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Internal Server Error",
+                "message": "Failed to close parking lot",
+                "code": "CLOSE_FAILED",
+            },
+        )
+
+    if stopped_sessions is None:
+        logger.warning("Parking lot with id %s does not exist", lid)
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error": "Not Found",
+                "message": f"Parking lot with ID {lid} does not exist",
+                "code": "PARKING_LOT_NOT_FOUND",
+            },
+        )
+
+    logger.info(
+        "Closed parking lot %s and stopped %s active sessions",
+        lid,
+        len(stopped_sessions),
+    )
+    return {
+        "message": "Parking lot closed successfully",
+        "parking_lot_id": lid,
+        "closed_reason": closed_reason,
+        "closed_date": closed_date,
+        "stopped_sessions": len(stopped_sessions),
+        "total_cost": round(sum(s["cost"] for s in stopped_sessions), 2),
+        "sessions": stopped_sessions,
+    }
+
 @router.put("/parking-lots/{lid}/reserved")
 def update_parking_lot_reserved_count(lid: int, action: str) -> bool:
     """Updates the amount of people that currently have a reservation in a specific parking lot.
@@ -589,6 +840,10 @@ async def force_delete_parking_lot(
 
     # Delete dependent reservations
     cursor = reservation_model.connection.cursor()
+    cursor.execute("""
+        DELETE FROM payment_outbox
+        WHERE reservation_id IN (SELECT id FROM reservations WHERE parking_lot_id = %s);
+    """, (lid,))
     cursor.execute("DELETE FROM reservations WHERE parking_lot_id = %s;", (lid,))
     reservation_model.connection.commit()
 
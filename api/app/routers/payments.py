@@ -3,15 +3,21 @@ This file contains all endpoints related to payments.
 """
 
 import logging
+from datetime import datetime
+from typing import Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from api.datatypes.user import User, UserRole
-from api.datatypes.payment import PaymentCreate
-from api.models.payment_model import PaymentModel
+from api.datatypes.payment import (PaymentCreate, PaymentFilter,
+                                   PaymentSettlement, RefundApproval)
+from api.models.payment_model import EXPORT_COLUMNS, NULL_DATE_KEY, PaymentModel
 from api.models.user_model import UserModel
 from api.models.parking_lot_model import ParkingLotModel
 from api.auth_utils import get_current_user, require_role
 from api.auth_utils import user_can_manage_lot, get_current_user_optional
+from api.utilities.export import EXPORT_MEDIA_TYPES, export_chunks
+from api.utilities.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +28,77 @@ router = APIRouter(
 user_model: UserModel = UserModel()
 parking_lot_model: ParkingLotModel = ParkingLotModel()
 
+REFUND_CLAIM_BATCH_SIZE = 20
+MAX_REFUND_CLAIM_BATCH_SIZE = 100
+
+
+def payment_filters(
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    completed: Optional[bool] = None,
+    parking_lot_id: Optional[int] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> PaymentFilter:
+    """
+    Collect the filter and pagination query parameters of payment listings.
+
+    Args:
+        date_from (datetime | None): Only payments made at or after this time.
+        date_to (datetime | None): Only payments made before this time.
+        completed (bool | None): Only paid or only unpaid payments.
+        parking_lot_id (int | None): Only payments for this parking lot.
+        min_amount (float | None): Only payments of at least this amount.
+        max_amount (float | None): Only payments of at most this amount.
+        cursor (str | None): The cursor of the page to retrieve.
+        limit (int): The maximum number of payments on the page.
+
+    Raises:
+        HTTPException: If the cursor is invalid (400).
+
+    Returns:
+        PaymentFilter: The filters of the listing.
+    """
+    return PaymentFilter(
+        date_from=date_from,
+        date_to=date_to,
+        completed=completed,
+        parking_lot_id=parking_lot_id,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        after=decode_cursor(cursor, (datetime.fromisoformat, int)),
+        limit=limit,
+    )
+
+
+def get_payment_page(response: Response, filters: PaymentFilter,
+                     include_total: bool) -> list[dict]:
+    """
+    Retrieve one page of payments and set the pagination headers.
+
+    The cursor of the next page is set in the X-Next-Cursor header and,
+    when requested, the number of matching payments in X-Total-Count.
+
+    Args:
+        response (Response): The response to set the headers on.
+        filters (PaymentFilter): The filters and position of the page.
+        include_total (bool): Whether to count all matching payments.
+
+    Returns:
+        list[dict]: The payments on the page.
+    """
+    payments_list, next_cursor = paginate(
+        PaymentModel.find_payments(filters), filters.limit,
+        lambda payment: (payment["date"] or NULL_DATE_KEY, payment["id"]))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_total:
+        response.headers["X-Total-Count"] = str(
+            PaymentModel.count_payments(filters))
+    return payments_list
+
 
 @router.post("/payments", status_code=201)
 async def create_payment(
@@ -70,11 +147,17 @@ async def create_payment(
 
 
 @router.get("/payments/me")
-async def get_my_payments(current_user: User = Depends(get_current_user)):
+async def get_my_payments(response: Response,
+                          filters: PaymentFilter = Depends(payment_filters),
+                          include_total: bool = False,
+                          current_user: User = Depends(get_current_user)):
     """
-    Retrieve all payments belonging to the current authenticated user.
+    Retrieve one page of payments belonging to the current authenticated user.
 
     Args:
+        response (Response): The response to set the pagination headers on.
+        filters (PaymentFilter): The filters and position of the page.
+        include_total (bool): Whether to return the total in X-Total-Count.
         current_user (User): The currently authenticated user.
 
     Raises:
@@ -83,7 +166,8 @@ async def get_my_payments(current_user: User = Depends(get_current_user)):
     Returns:
         list[dict]: List of payments for the current user.
     """
-    payments_list = PaymentModel.get_payments_by_user(current_user.id)
+    filters.user_id = current_user.id
+    payments_list = get_payment_page(response, filters, include_total)
     if not payments_list:
         logger.warning("User ID %s tried retrieving their own payments, "
                        "but none were found",
@@ -96,11 +180,17 @@ async def get_my_payments(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/payments/me/open")
-async def get_my_open_payments(current_user: User = Depends(get_current_user)):
+async def get_my_open_payments(response: Response,
+                               filters: PaymentFilter = Depends(payment_filters),
+                               include_total: bool = False,
+                               current_user: User = Depends(get_current_user)):
     """
-    Retrieve all open (unpaid) payments for the current authenticated user.
+    Retrieve one page of open (unpaid) payments for the current authenticated user.
 
     Args:
+        response (Response): The response to set the pagination headers on.
+        filters (PaymentFilter): The filters and position of the page.
+        include_total (bool): Whether to return the total in X-Total-Count.
         current_user (User): The currently authenticated user.
 
     Raises:
@@ -109,7 +199,9 @@ async def get_my_open_payments(current_user: User = Depends(get_current_user)):
     Returns:
         list[dict]: List of open payments for the current user.
     """
-    payments_list = PaymentModel.get_open_payments_by_user(current_user.id)
+    filters.user_id = current_user.id
+    filters.completed = False
+    payments_list = get_payment_page(response, filters, include_total)
     if not payments_list:
         logger.warning("User ID %s tried retrieving their own payments"
                        ", but none were found", current_user.id)
@@ -121,13 +213,19 @@ async def get_my_open_payments(current_user: User = Depends(get_current_user)):
 
 @router.get("/payments/user/{user_id}")
 async def get_payments_by_user(user_id: int,
+                               response: Response,
+                               filters: PaymentFilter = Depends(payment_filters),
+                               include_total: bool = False,
                                current_user: User = Depends(require_role(
                                 UserRole.PAYMENTADMIN, UserRole.SUPERADMIN))):
     """
-    Retrieve all payments for a specific user.
+    Retrieve one page of payments for a specific user.
 
     Args:
         user_id (int): The ID of the user whose payments are requested.
+        response (Response): The response to set the pagination headers on.
+        filters (PaymentFilter): The filters and position of the page.
+        include_total (bool): Whether to return the total in X-Total-Count.
         current_user (User): The currently authenticated admin user.
 
     Raises:
@@ -141,7 +239,8 @@ async def get_payments_by_user(user_id: int,
         logger.warning("Admin ID %s tried searching for nonexistent User %s",
                        current_user.id, user_id)
         raise HTTPException(status_code=404, detail="No user not found")
-    payments_list = PaymentModel.get_payments_by_user(user_id)
+    filters.user_id = user_id
+    payments_list = get_payment_page(response, filters, include_total)
     if not payments_list:
         logger.warning("Admin ID %s tried retrieving payments from User %s, "
                        "but none were found",
@@ -155,14 +254,20 @@ async def get_payments_by_user(user_id: int,
 @router.get("/payments/user/{user_id}/open")
 async def get_open_payments_by_user(
     user_id: int,
+    response: Response,
+    filters: PaymentFilter = Depends(payment_filters),
+    include_total: bool = False,
     current_user: User = Depends(require_role(
         UserRole.SUPERADMIN, UserRole.PAYMENTADMIN))
 ):
     """
-    Retrieve all open (unpaid) payments for a specific user.
+    Retrieve one page of open (unpaid) payments for a specific user.
 
     Args:
         user_id (int): The ID of the user whose open payments are requested.
+        response (Response): The response to set the pagination headers on.
+        filters (PaymentFilter): The filters and position of the page.
+        include_total (bool): Whether to return the total in X-Total-Count.
         current_user (User): The currently authenticated admin user.
 
     Raises:
@@ -176,7 +281,9 @@ async def get_open_payments_by_user(
         logger.warning("Admin ID %s tried searching for nonexistent User %s",
                        current_user.id, user_id)
         raise HTTPException(status_code=404, detail="No user not found")
-    payments_list = PaymentModel.get_open_payments_by_user(user_id)
+    filters.user_id = user_id
+    filters.completed = False
+    payments_list = get_payment_page(response, filters, include_total)
     if not payments_list:
         logger.warning("Admin ID %s tried retrieving payments from User %s, "
                        "but none were found", current_user.id, user_id)
@@ -187,6 +294,171 @@ async def get_open_payments_by_user(
     return payments_list
 
 
+def export_filters(
+    lot: Optional[int] = None,
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+) -> PaymentFilter:
+    """
+    Collect the query parameters of the payment export endpoints and check
+    that the requested parking lot exists.
+
+    Args:
+        lot (int | None): Only payments for this parking lot.
+        date_from (datetime | None): Only payments made at or after this time.
+        date_to (datetime | None): Only payments made before this time.
+
+    Raises:
+        HTTPException: If the parking lot does not exist (404).
+
+    Returns:
+        PaymentFilter: The filters of the export.
+    """
+    if lot is not None and not parking_lot_model.get_parking_lot_by_lid(lot):
+        raise HTTPException(status_code=404, detail="No parking lot not found")
+    return PaymentFilter(parking_lot_id=lot, date_from=date_from,
+                         date_to=date_to)
+
+
+@router.get("/payments/export")
+async def export_payments(
+    filters: PaymentFilter = Depends(export_filters),
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    current_user: User = Depends(require_role(
+        UserRole.PAYMENTADMIN, UserRole.SUPERADMIN))
+):
+    """
+    Export all payments of a parking lot and period for reconciliation.
+
+    The payments are streamed from a server-side cursor, so the memory use
+    of the worker stays the same for exports of any size.
+
+    Args:
+        filters (PaymentFilter): The parking lot and period to export.
+        export_format (str): Either "csv" or "ndjson".
+        current_user (User): The currently authenticated admin user.
+
+    Raises:
+        HTTPException: If the parking lot does not exist (404).
+
+    Returns:
+        StreamingResponse: The payments ordered by date and id.
+    """
+    logger.info("Admin ID %s exported payments of Lot %s as %s",
+                current_user.id, filters.parking_lot_id or "all",
+                export_format)
+    filename = f"payments-{filters.parking_lot_id or 'all'}.{export_format}"
+    return StreamingResponse(
+        export_chunks(export_format, EXPORT_COLUMNS,
+                      PaymentModel.iter_export_rows(filters)),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/payments/export/summary")
+async def export_payments_summary(
+    filters: PaymentFilter = Depends(export_filters),
+    current_user: User = Depends(require_role(
+        UserRole.PAYMENTADMIN, UserRole.SUPERADMIN))
+):
+    """
+    Retrieve the payment totals per parking lot, day, method and completed
+    state for the same filters as the export.
+
+    Args:
+        filters (PaymentFilter): The parking lot and period to summarize.
+        current_user (User): The currently authenticated admin user.
+
+    Raises:
+        HTTPException: If the parking lot does not exist (404).
+
+    Returns:
+        list[dict]: The number of payments and total amount per group.
+    """
+    summary = PaymentModel.get_export_summary(filters)
+    logger.info("Admin ID %s retrieved the payment summary of Lot %s",
+                current_user.id, filters.parking_lot_id or "all")
+    return summary
+
+
+@router.get("/payments/transaction/{transaction}")
+async def get_payments_by_transaction(
+    transaction: str,
+    current_user: User = Depends(require_role(
+        UserRole.LOTADMIN, UserRole.PAYMENTADMIN, UserRole.SUPERADMIN))
+):
+    """
+    Retrieve the payments of a transaction together with the paid and
+    outstanding totals, so a gate can check that a session has been paid.
+
+    Args:
+        transaction (str): The transaction hash of the payments.
+        current_user (User): The currently authenticated admin user.
+
+    Raises:
+        HTTPException:
+            404 if no payments belong to the transaction.
+            403 if the user cannot manage the lot of the payments.
+
+    Returns:
+        dict: The payments and the totals of the transaction.
+    """
+    payments_list = PaymentModel.get_payments_by_transaction(transaction)
+    if not payments_list:
+        logger.warning("Admin ID %s searched for Transaction %s, "
+                       "but nothing was found", current_user.id, transaction)
+        raise HTTPException(status_code=404,
+                            detail="No payments found for this transaction")
+    lot_ids = {payment["parking_lot_id"] for payment in payments_list}
+    if not all(user_can_manage_lot(current_user, lot_id, for_payments=True)
+               for lot_id in lot_ids):
+        raise HTTPException(status_code=403,
+                            detail="Not enough permissions for this lot")
+    totals = PaymentModel.get_total_by_transaction(transaction)
+    logger.info("Admin ID %s retrieved Transaction %s",
+                current_user.id, transaction)
+    return {"transaction": transaction, **totals, "payments": payments_list}
+
+
+@router.post("/payments/pay")
+async def pay_payments(settlement: PaymentSettlement,
+                       current_user: User | None = Depends(get_current_user_optional)):
+    """
+    Mark several payments as completed (paid) by the current user at once.
+
+    Every payment gets its own result instead of failing the whole request,
+    so a user can settle all open payments in one call.
+
+    Args:
+        settlement (PaymentSettlement): The IDs of the payments to pay.
+        current_user (User): The currently authenticated user.
+
+    Raises:
+        HTTPException: 500 if marking the payments as completed fails.
+
+    Returns:
+        dict: The number of paid payments and the result per payment.
+    """
+    user_id = current_user.id if current_user is not None else None
+    payment_ids = list(dict.fromkeys(settlement.payment_ids))
+    try:
+        results = PaymentModel.mark_payments_completed(payment_ids, user_id)
+    except Exception:
+        logger.error("Settling Payment IDs %s failed for User ID %s",
+                     payment_ids, user_id or "Guest")
+        raise HTTPException(status_code=500,
+                            detail="Payment has failed")
+    paid = sum(1 for status in results.values() if status == "paid")
+    logger.info("User ID %s paid %s of %s payments",
+                user_id or "Guest", paid, len(payment_ids))
+    return {
+        "paid": paid,
+        "results": [{"payment_id": payment_id, "status": status}
+                    for payment_id, status in results.items()],
+    }
+
+
 @router.post("/payments/{payment_id}/pay")
 async def pay_payment(payment_id: int,
                       current_user: User | None = Depends(get_current_user_optional)):
@@ -328,6 +600,79 @@ async def get_refund_requests(user_id: int | None = None,
     return refunds
 
 
+@router.post("/payments/refunds/claim")
+async def claim_refund_requests(
+    limit: int = Query(REFUND_CLAIM_BATCH_SIZE, ge=1, le=MAX_REFUND_CLAIM_BATCH_SIZE),
+    current_user: User = Depends(require_role(
+        UserRole.PAYMENTADMIN, UserRole.SUPERADMIN))
+):
+    """
+    Claim a batch of open refund requests for the current admin.
+
+    Claimed requests are not handed out to other admins until they are
+    refunded or the claim expires, so admins do not handle the same request.
+
+    Args:
+        limit (int): The maximum number of refund requests to claim.
+        current_user (User): The currently authenticated admin user.
+
+    Raises:
+        HTTPException: 500 if claiming the refund requests fails.
+
+    Returns:
+        list[dict]: The claimed refund requests.
+    """
+    try:
+        claimed = PaymentModel.claim_refund_requests(current_user.id, limit)
+    except Exception:
+        logger.error("Admin ID %s failed claiming refund requests",
+                     current_user.id)
+        raise HTTPException(status_code=500,
+                            detail="Claiming refunds has failed")
+    logger.info("Admin ID %s claimed %s refund requests",
+                current_user.id, len(claimed))
+    return claimed
+
+
+@router.post("/payments/refunds/approve")
+async def approve_refunds(
+    approval: RefundApproval,
+    current_user: User = Depends(require_role(
+        UserRole.PAYMENTADMIN, UserRole.SUPERADMIN))
+):
+    """
+    Give the refunds of several payments at once.
+
+    Every payment gets its own result instead of failing the whole request.
+
+    Args:
+        approval (RefundApproval): The IDs of the payments to refund.
+        current_user (User): The currently authenticated admin user.
+
+    Raises:
+        HTTPException: 500 if giving the refunds fails.
+
+    Returns:
+        dict: The number of refunded payments and the result per payment.
+    """
+    payment_ids = list(dict.fromkeys(approval.payment_ids))
+    try:
+        results = PaymentModel.approve_refunds(payment_ids, current_user.id)
+    except Exception:
+        logger.error("Admin ID %s failed refunding Payment IDs %s",
+                     current_user.id, payment_ids)
+        raise HTTPException(status_code=500,
+                            detail="Refund has failed")
+    refunded = sum(1 for status in results.values() if status == "refunded")
+    logger.info("Admin ID %s refunded %s of %s payments",
+                current_user.id, refunded, len(payment_ids))
+    return {
+        "refunded": refunded,
+        "results": [{"payment_id": payment_id, "status": status}
+                    for payment_id, status in results.items()],
+    }
+
+
 @router.post("/payments/{payment_id}/request_refund")
 async def request_refund(payment_id: int,
                          current_user: User = Depends(get_current_user)):
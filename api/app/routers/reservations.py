@@ -7,16 +7,16 @@ from datetime import datetime
 from fastapi import Depends, APIRouter, HTTPException
 from api.auth_utils import get_current_user
 from api.datatypes.user import User
-from api.datatypes.payment import PaymentCreate
-from api.datatypes.reservation import Reservation, ReservationCreate
-from api.models.parking_lot_model import ParkingLotModel
-from api.models.reservation_model import ReservationModel
+from api.datatypes.reservation import BulkReservationCreate, Reservation, ReservationCreate
+from api.models.parking_lot_model import ParkingLotFullError, ParkingLotModel
+from api.models.reservation_model import ReservationModel, ReservationOverlapError
 from api.models.discount_code_model import DiscountCodeModel
 from api.models.vehicle_model import VehicleModel
 from api.models.session_model import SessionModel
-from api.models.payment_model import PaymentModel
-from api.session_calculator import generate_payment_hash, generate_transaction_validation_hash, calculate_price
+from api.session_calculator import calculate_price, calculate_prices
 from api.utilities.discount_code_validation import use_discount_code_validation
+from api.utilities.prefetch import gather_queries, query
+from api.utilities.recurrence import expand_recurrence, find_overlap
 
 
 logger = logging.getLogger(__name__)
@@ -29,9 +29,30 @@ reservation_model: ReservationModel = ReservationModel()
 parking_lot_model: ParkingLotModel = ParkingLotModel()
 vehicle_model: VehicleModel = VehicleModel()
 session_model: SessionModel = SessionModel()
-payment_model: PaymentModel = PaymentModel()
 discount_code_model: DiscountCodeModel = DiscountCodeModel()
 
+MAX_BULK_RESERVATIONS = 500
+
+
+def raise_reservation_overlap(current_user: User, vehicle_id: int):
+    """Raises the error for a reservation that overlaps another reservation.
+
+    Args:
+        current_user (User): The user creating the reservation.
+        vehicle_id (int): The id of the vehicle.
+
+    Raises:
+        HTTPException: Raises 409 because the vehicle is already reserved.
+    """
+    logger.warning(
+        "User %s tried to create overlapping reservation for vehicle %s",
+        current_user.id, vehicle_id
+    )
+    raise HTTPException(
+        status_code=409,
+        detail={"message": "Requested date has an overlap with another reservation for this vehicle"}
+    )
+
 
 @router.get("/reservations/vehicle/{vehicle_id}")
 async def reservations(vehicle_id: int, current_user: User = Depends(get_current_user)):
@@ -66,38 +87,37 @@ async def create_reservation(
         HTTPException: 401 if the date overlaps with another reservation for the same vehicle.
         HTTPException: 403 if the start date is earlier than the current date.
         HTTPException: 403 if the start_date >= end_date
+        HTTPException: 409 if the parking lot is fully booked during the reservation.
 
     Returns:
         dict: Confirmation message indicating the reservation was successfully created.
     """
+    # The lookups do not depend on each other, so they run concurrently
+    valid_period = reservation.start_time < reservation.end_time
+    queries = [
+        query(parking_lot_model.get_parking_lot_by_lid, reservation.parking_lot_id),
+        query(vehicle_model.get_one_vehicle, reservation.vehicle_id),
+    ]
+    if valid_period:
+        queries.append(query(reservation_model.has_overlapping_reservation,
+                             reservation.vehicle_id, reservation.start_time, reservation.end_time))
+    if reservation.discount_code:
+        queries.append(query(discount_code_model.get_discount_code_by_code, reservation.discount_code))
+    results = await gather_queries(*queries)
+    parking_lot, vehicle = results[0], results[1]
+    has_overlap = results[2] if valid_period else False
+    discount_code = results[-1] if reservation.discount_code else None
+
     # Check if parking lot exists
-    parking_lot = parking_lot_model.get_parking_lot_by_lid(reservation.parking_lot_id)
     if parking_lot is None:
         logger.warning("Parking lot %s does not exist", reservation.parking_lot_id)
         raise HTTPException(status_code=404, detail={"message": "Parking lot does not exist"})
 
     # Check if vehicle exists
-    vehicle = vehicle_model.get_one_vehicle(reservation.vehicle_id)
     if vehicle == None:
         logger.warning("Vehicle %s does not exist", reservation.vehicle_id)
         raise HTTPException(status_code=404, detail={"message": "Vehicle does not exist"})
 
-    # Check for overlapping reservations for this vehicle
-    vehicle_reservations = reservation_model.get_reservations_by_vehicle(reservation.vehicle_id)
-    for r in vehicle_reservations:
-        if (
-            reservation.start_time < r["end_time"] and
-            reservation.end_time > r["start_time"]
-        ):
-            logger.warning(
-                "User %s tried to create overlapping reservation for vehicle %s",
-                current_user.id, reservation.vehicle_id
-            )
-            raise HTTPException(
-                status_code=409,
-                detail={"message": "Requested date has an overlap with another reservation for this vehicle"}
-            )
-
     # Validate start and end times
     
     now = datetime.now()
@@ -110,7 +130,7 @@ async def create_reservation(
             status_code=400,
             detail={"message": f"Invalid start date. The start date cannot be earlier than the current date. current date: {now}, received date: {reservation.start_time}"}
         )
-    if reservation.start_time >= reservation.end_time:
+    if not valid_period:
         logger.warning(
             "User %s tried to create reservation with start_time >= end_time: %s >= %s",
             current_user.id, reservation.start_time, reservation.end_time
@@ -120,47 +140,156 @@ async def create_reservation(
             detail={"message": f"Invalid start date. The start date cannot be later than or equal to the end date. start date: {reservation.start_time}, end date: {reservation.end_time}"}
         )
 
+    # Check for overlapping reservations for this vehicle, the database
+    # constraint catches requests that overlap after this check
+    if has_overlap:
+        raise_reservation_overlap(current_user, reservation.vehicle_id)
+
     # Discount code validation
-    discount_code = None
     if reservation.discount_code:
-        discount_code = discount_code_model.get_discount_code_by_code(reservation.discount_code)
         if not discount_code:
             logger.error(
                 "User ID %s tried to use discount code %s, but it was not found",
                 current_user.id, reservation.discount_code
             )
             raise HTTPException(status_code=404, detail="No discount code was found.")
-        use_discount_code_validation(discount_code, reservation, current_user, parking_lot)
+        discount_code = use_discount_code_validation(discount_code, reservation, current_user, parking_lot)
 
-    # Calculate cost
-    cost = calculate_price(parking_lot, reservation, discount_code)
+    reservation_id = None
+    try:
+        # Calculate cost
+        cost = calculate_price(parking_lot, reservation, discount_code)
 
-    # Create reservation
-    reservation.user_id = current_user.id
-    reservation.cost = cost
-    reservation_id = reservation_model.create_reservation(reservation)
+        # Create reservation, the payment is created from the outbox
+        reservation.user_id = current_user.id
+        reservation_id = reservation_model.create_reservation(reservation, float(cost))
+    except ReservationOverlapError:
+        raise_reservation_overlap(current_user, reservation.vehicle_id)
+    except ParkingLotFullError:
+        logger.warning("Parking lot %s is fully booked between %s and %s",
+                       reservation.parking_lot_id, reservation.start_time, reservation.end_time)
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error": "Parking lot full",
+                "message": f"Parking lot {reservation.parking_lot_id} has no free spots in the requested period",
+                "code": "PARKING_LOT_FULL",
+            },
+        )
+    finally:
+        if reservation_id is None and discount_code is not None:
+            # The code was redeemed above, give the use back as no reservation was created
+            discount_code_model.release_discount_code(discount_code["code"])
     logger.info(
         "User %s created reservation %s for vehicle %s at parking lot %s",
         current_user.id, reservation_id, reservation.vehicle_id, reservation.parking_lot_id
     )
 
-    transaction = generate_payment_hash(
-        str(reservation_id), vehicle["license_plate"])
-    payment_hash = generate_transaction_validation_hash()
-    payment = PaymentCreate(
-        parking_lot_id=reservation.parking_lot_id,
-        user_id=current_user.id,
-        amount=cost,
-        transaction=transaction,
-        hash=payment_hash,
-        reservation_id=reservation_id
-    )
-    payment_model.create_payment(payment)
+    return {"message": "Reservation created successfully"}
+
+
+@router.post("/reservations/bulk")
+async def create_reservations_bulk(
+    bulk: BulkReservationCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create many reservations for one vehicle at one parking lot at once.
+
+    The reservations are given as a list of windows, a weekly recurrence or
+    both. All of them are checked and created in one transaction, so either
+    every reservation is created or none is. Discount codes are not
+    supported for bulk reservations.
+
+    Args:
+        bulk (BulkReservationCreate): The vehicle, parking lot and windows.
+        current_user (User): The currently authenticated user.
+
+    Raises:
+        HTTPException: 404 if the parking lot or vehicle does not exist.
+        HTTPException: 403 if the vehicle does not belong to the user.
+        HTTPException: 400 if there are no windows, too many windows or an invalid window.
+        HTTPException: 409 if a window overlaps another reservation of the vehicle.
+        HTTPException: 409 if the parking lot is fully booked during a window.
+
+    Returns:
+        dict: The IDs of the created reservations and their total cost.
+    """
+    parking_lot = parking_lot_model.get_parking_lot_by_lid(bulk.parking_lot_id)
+    if parking_lot is None:
+        logger.warning("Parking lot %s does not exist", bulk.parking_lot_id)
+        raise HTTPException(status_code=404, detail={"message": "Parking lot does not exist"})
+
+    vehicle = vehicle_model.get_one_vehicle(bulk.vehicle_id)
+    if vehicle is None:
+        logger.warning("Vehicle %s does not exist", bulk.vehicle_id)
+        raise HTTPException(status_code=404, detail={"message": "Vehicle does not exist"})
+    if vehicle["user_id"] != current_user.id:
+        raise HTTPException(
+            status_code=403, detail="This vehicle does not belong to the logged in user")
+
+    windows = [(w.start_time, w.end_time) for w in bulk.windows]
+    if bulk.recurrence is not None:
+        windows += expand_recurrence(bulk.recurrence, MAX_BULK_RESERVATIONS - len(windows))
+    windows.sort()
+
+    if not windows or len(windows) > MAX_BULK_RESERVATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": f"A bulk reservation needs between 1 and {MAX_BULK_RESERVATIONS} windows"}
+        )
+
+    now = datetime.now()
+    for start_time, end_time in windows:
+        if start_time < now or start_time >= end_time:
+            logger.warning(
+                "User %s tried to create bulk reservation with invalid window %s - %s",
+                current_user.id, start_time, end_time
+            )
+            raise HTTPException(
+                status_code=400,
+                detail={"message": f"Invalid window {start_time} - {end_time}. "
+                                   "A window must start in the future and end after its start."}
+            )
+
+    overlap = find_overlap(windows)
+    if overlap is not None:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": f"Requested windows overlap each other: {overlap[0][0]} and {overlap[1][0]}"}
+        )
+    if reservation_model.get_overlapping_windows(bulk.vehicle_id, windows):
+        raise_reservation_overlap(current_user, bulk.vehicle_id)
+
+    costs = calculate_prices([start for start, _ in windows], [end for _, end in windows],
+                             parking_lot.tariff, parking_lot.daytariff).tolist()
+
+    try:
+        reservation_ids = reservation_model.create_reservations(
+            current_user.id, bulk.vehicle_id, bulk.parking_lot_id, windows, costs)
+    except ReservationOverlapError:
+        raise_reservation_overlap(current_user, bulk.vehicle_id)
+    except ParkingLotFullError:
+        logger.warning("Parking lot %s is fully booked for bulk reservation of user %s",
+                       bulk.parking_lot_id, current_user.id)
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error": "Parking lot full",
+                "message": f"Parking lot {bulk.parking_lot_id} has no free spots in one of the requested periods",
+                "code": "PARKING_LOT_FULL",
+            },
+        )
+
     logger.info(
-        "Payment created for reservation %s by user %s", reservation_id, current_user.id
+        "User %s created %s reservations for vehicle %s at parking lot %s",
+        current_user.id, len(reservation_ids), bulk.vehicle_id, bulk.parking_lot_id
     )
-
-    return {"message": "Reservation created successfully"}
+    return {
+        "message": "Reservations created successfully",
+        "reservation_ids": reservation_ids,
+        "total_cost": round(sum(costs), 2),
+    }
 
 
 @router.delete("/reservations/delete/{reservation_id}")
@@ -175,7 +304,7 @@ async def delete_reservation(reservation_id: int, current_user: User = Depends(g
                             "message": "Reservation not found"})
 
     # Controleer of de reservatie toebehoort aan de ingelogde gebruiker
-    if reservation.user_id != current_user.id:
+    if reservation["user_id"] != current_user.id:
         logging.warning("User with id %s tried to delete a reservation that does not belong to them: %s",
                         current_user.id, reservation_id)
         raise HTTPException(status_code=403, detail={
@@ -1,15 +1,22 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from starlette.responses import JSONResponse
 from api.auth_utils import get_current_user
-from api.datatypes.payment import PaymentCreate, PaymentUpdate
+from api.datatypes.payment import PaymentCreate
+from api.datatypes.session import SessionFilter
 from api.datatypes.user import User
-from api.models.parking_lot_model import ParkingLotModel
+from api.models.parking_lot_model import ParkingLotFullError, ParkingLotModel
 from api.models.payment_model import PaymentModel
+from api.models.payment_outbox_model import PaymentOutboxModel
 from api.models.session_model import SessionModel
 from api.models.vehicle_model import VehicleModel
 from api.models.reservation_model import ReservationModel
+from api.models.reservation_sweep_model import OPEN_STATUSES
 from api.session_calculator import generate_payment_hash, generate_transaction_validation_hash, calculate_price
+from api.utilities.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
+from api.utilities.prefetch import gather_queries, query
 
 logger = logging.getLogger(__name__)
 
@@ -19,9 +26,30 @@ session_model: SessionModel = SessionModel()
 parking_lot_model: ParkingLotModel = ParkingLotModel()
 vehicle_model: VehicleModel = VehicleModel()
 payment_model: PaymentModel = PaymentModel()
+payment_outbox_model: PaymentOutboxModel = PaymentOutboxModel()
 reservation_model: ReservationModel = ReservationModel()
 
 
+def raise_parking_lot_full(lid: int):
+    """Raises the error for a parking lot without free spots.
+
+    Args:
+        lid (int): The id of the parking lot.
+
+    Raises:
+        HTTPException: Raises 409 because the parking lot is full.
+    """
+    logger.warning("Parking lot %s is full", lid)
+    raise HTTPException(
+        status_code=409,
+        detail={
+            "error": "Parking lot full",
+            "message": f"Parking lot {lid} has no free spots",
+            "code": "PARKING_LOT_FULL",
+        },
+    )
+
+
 @router.post("/parking-lots/{lid}/sessions/start/{vehicle_id}", status_code=status.HTTP_201_CREATED)
 async def start_parking_session(
     lid: int, vehicle_id: int, current_user: User = Depends(get_current_user)
@@ -32,8 +60,14 @@ async def start_parking_session(
         lid,
     )
 
+    # The lookups do not depend on each other, so they run concurrently
+    parking_lot, vehicle, vehicle_session = await gather_queries(
+        query(parking_lot_model.get_parking_lot_by_lid, lid),
+        query(vehicle_model.get_one_vehicle, vehicle_id),
+        query(session_model.get_all_sessions_by_id, lid, vehicle_id),
+    )
+
     # parking lot check
-    parking_lot = parking_lot_model.get_parking_lot_by_lid(lid)
     if not parking_lot:
         logger.warning("Parking lot %s does not exist", lid)
         raise HTTPException(
@@ -44,8 +78,11 @@ async def start_parking_session(
             },
         )
 
+    # capaciteit check, zonder capaciteit is er geen limiet
+    if parking_lot.capacity is not None and parking_lot.occupied >= parking_lot.capacity:
+        raise_parking_lot_full(lid)
+
     # vehicle en user check
-    vehicle = vehicle_model.get_one_vehicle(vehicle_id)
     if not vehicle or vehicle["user_id"] != current_user.id:
         if not vehicle:
             logger.warning("Vehicle with id %s does not exist", vehicle_id)
@@ -71,7 +108,7 @@ async def start_parking_session(
             )
 
     # active session check voor vehicle
-    existing_sessions = session_model.get_all_sessions_by_id(lid, vehicle_id) == None
+    existing_sessions = vehicle_session == None
 
     if existing_sessions:
         logger.warning(
@@ -90,8 +127,11 @@ async def start_parking_session(
     # create new session
 
     # Save session
-    session = session_model.create_session(
-        lid, current_user.id, vehicle_id, None)
+    try:
+        session = session_model.create_session(
+            lid, current_user.id, vehicle_id, None)
+    except ParkingLotFullError:
+        raise_parking_lot_full(lid)
     if session is None:
         logger.warning("Vehcile %s already has a session", vehicle_id)
         return JSONResponse(content={"message": "This vehicle already has a session"}, status_code=209)
@@ -140,21 +180,14 @@ async def stop_parking_session(
         session.parking_lot_id)
     cost = calculate_price(parking_lot, session, None)
 
-    session = session_model.stop_session(session, cost)
-
-    vehicle = vehicle_model.get_one_vehicle(vehicle_id)
-    transaction = generate_payment_hash(
-        str(session.id), vehicle["license_plate"])
-    payment_hash = generate_transaction_validation_hash()
+    # De betaling wordt via de outbox aangemaakt
     payment = PaymentCreate(
         parking_lot_id=session.parking_lot_id,
         user_id=current_user.id,
         amount=cost,
-        transaction=transaction,
-        hash=payment_hash,
         session_id=session.id
     )
-    payment_model.create_payment(payment)
+    session = session_model.stop_session(session, cost, payment)
     logger.info("Session of vehicle %s successfully stopped", vehicle_id)
     return JSONResponse(
         content={"message": "Session stopped successfully"},
@@ -163,12 +196,32 @@ async def stop_parking_session(
 
 
 @router.get("/sessions/active")
-async def get_active_sessions():
+async def get_active_sessions(
+    response: Response,
+    start_from: Optional[datetime] = Query(None, alias="from"),
+    start_to: Optional[datetime] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
     """
-    Geeft een lijst van alle actieve sessies.
+    Geeft een pagina van alle actieve sessies, gesorteerd op starttijd.
+
+    De cursor van de volgende pagina staat in next_cursor en in de
+    X-Next-Cursor header.
     """
-    sessions = session_model.get_active_sessions()
-    return {"active_sessions": sessions}
+    filters = SessionFilter(
+        start_from=start_from,
+        start_to=start_to,
+        active_only=True,
+        after=decode_cursor(cursor, (datetime.fromisoformat, int)),
+        limit=limit,
+    )
+    sessions, next_cursor = paginate(
+        session_model.find_sessions(filters), limit,
+        lambda s: (s.start_time, s.id))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {"active_sessions": sessions, "next_cursor": next_cursor}
 
 
 @router.get("/sessions/vehicle/{vehicle_id}")
@@ -197,6 +250,9 @@ async def start_session_from_reservation(
     if reservation.user_id != current_user.id:
         raise HTTPException(
             status_code=403, detail="Reservation does not belong to current user")
+    if reservation.status not in OPEN_STATUSES:
+        raise HTTPException(
+            status_code=409, detail=f"Reservation is {reservation.status} and can no longer be started")
 
     # Check if session already exists for this vehicle and parking lot
     existing_session = session_model.get_vehicle_session(
@@ -206,12 +262,15 @@ async def start_session_from_reservation(
             status_code=409, detail="Session already exists for this reservation")
 
     # Start session
-    session = session_model.create_session(
-        reservation["parking_lot_id"],
-        reservation["user_id"],
-        reservation["vehicle_id"],
-        reservation["id"]
-    )
+    try:
+        session = session_model.create_session(
+            reservation["parking_lot_id"],
+            reservation["user_id"],
+            reservation["vehicle_id"],
+            reservation["id"]
+        )
+    except ParkingLotFullError:
+        raise_parking_lot_full(reservation["parking_lot_id"])
     if not session:
         raise HTTPException(status_code=500, detail="Failed to start session")
 
@@ -248,26 +307,17 @@ async def stop_session_from_reservation(
         overtime_session.end_time = overtime_end
         extra_cost = calculate_price(parking_lot, overtime_session, None)
 
-        # Find the original payment for this reservation
-        original_payment = payment_model.get_payment_by_reservation_id(
-            reservation_id)
-        if not original_payment:
-            raise HTTPException(
-                status_code=404, detail="Original payment not found")
-
-        if not original_payment["completed"]:
-            # Add extra cost to the original payment
-            updated_payment = PaymentUpdate(
-                amount=original_payment["amount"] + float(extra_cost))
-            update_fields = updated_payment.dict(exclude_unset=True)
-            payment_model.update_payment(original_payment["id"], update_fields)
+        # Add extra cost to the original payment, also while it is still in the outbox
+        updated_amount = payment_outbox_model.add_to_pending_payment(
+            reservation_id, float(extra_cost))
+        if updated_amount is not None:
             return {
                 "message": "Reservation session stopped. Extra cost added to original payment=.",
                 "session": session,
-                "updated_payment": updated_payment.amount
+                "updated_payment": updated_amount
             }
         else:
-            # Create a new payment for the extra cost
+            # The original payment is completed or missing, create a new payment for the extra cost
             vehicle = vehicle_model.get_one_vehicle(session.vehicle_id)
             transaction = generate_payment_hash(
                 str(session.id), vehicle["license_plate"])
@@ -1,12 +1,21 @@
-from datetime import datetime
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import partial
+from itertools import chain, islice
+import hashlib
+import io
 import os
+import time
 
+import ijson
 import psycopg2
 import json
 import logging
 
-from psycopg2.extras import execute_values
 
+from api.models.availability_model import invalidate_availability, rebuild_availability
 from api.utilities.hasher import hash_string
 
 logging.basicConfig(
@@ -15,8 +24,261 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
+SESSION_FILES = 1500
+COPY_BATCH_SIZE = 10000
+SESSION_COLUMNS = ("parking_lot_id", "user_id", "vehicle_id", "reservation_id", "start_time", "end_time", "cost")
+SESSION_KEY = ("parking_lot_id", "start_time")
+SESSION_NULLABLE_KEY = ("user_id", "vehicle_id")
+
+
+def peek(records):
+    """
+    Returns the records unchanged, or None if there are no records.
+    Only the first record is read, so a generator stays lazy.
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return None
+    return chain([first], records)
+
+
+def first_char(f):
+    """
+    Returns the first non-whitespace byte of a binary file and moves back to it.
+    """
+    char = f.read(1)
+    while char.isspace():
+        char = f.read(1)
+    if char:
+        f.seek(f.tell() - 1)
+    return char
+
+
+def as_items(data):
+    """
+    Returns the (key, value) pairs of a dict, or the pairs themselves when
+    they are streamed.
+    """
+    return data.items() if isinstance(data, dict) else data
+
+
+def copy_value(value):
+    """
+    Formats a value for the text format of COPY. None becomes NULL and the
+    characters COPY uses as separators are escaped.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return (value.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+    return str(value)
+
+
+def copy_rows(cursor, target, rows, batch_size=COPY_BATCH_SIZE):
+    """
+    Loads rows into a table with COPY FROM STDIN, batch_size rows at a time,
+    and returns the number of rows sent. target is the table with its
+    column list, e.g. "users (username, password)".
+    """
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return count
+        buffer = io.StringIO()
+        for row in batch:
+            buffer.write("\t".join(copy_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {target} FROM STDIN", buffer)
+        count += len(batch)
+
+
+def copy_new_rows(cursor, table, columns, rows, key, nullable_key=(), batch_size=COPY_BATCH_SIZE):
+    """
+    Loads rows like copy_rows, but skips the rows whose natural key is already
+    in the table, so loading the same data again does not duplicate it.
+    key lists the key columns that are compared with =. A row with NULL in
+    one of them could never match on a rerun, so it is skipped with a warning.
+    nullable_key lists the key columns where NULL matches NULL.
+    Returns the number of rows inserted.
+    """
+    staging = f"{table}_staging"
+    column_list = ", ".join(columns)
+    cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                   f"SELECT {column_list} FROM {table} WITH NO DATA")
+    # row_no keeps the order of the file, so the ids are handed out in that order
+    cursor.execute(f"ALTER TABLE {staging} ADD COLUMN row_no BIGSERIAL")
+    copy_rows(cursor, f"{staging} ({column_list})", rows, batch_size)
+
+    missing_key = " OR ".join(f"s.{column} IS NULL" for column in key)
+    cursor.execute(f"SELECT COUNT(*) FROM {staging} s WHERE {missing_key}")
+    missing = cursor.fetchone()[0]
+    if missing:
+        logging.warning(f"Skipped {missing} rows of {table} without a {', '.join(key)}")
+
+    match = [f"t.{column} = s.{column}" for column in key]
+    match += [f"t.{column} IS NOT DISTINCT FROM s.{column}" for column in nullable_key]
+    cursor.execute(f"""
+                   INSERT INTO {table} ({column_list})
+                   SELECT {", ".join(f"s.{column}" for column in columns)}
+                   FROM {staging} s
+                   WHERE {" AND ".join(f"s.{column} IS NOT NULL" for column in key)}
+                     AND NOT EXISTS (SELECT 1 FROM {table} t WHERE {" AND ".join(match)})
+                   ORDER BY s.row_no
+                   """)
+    return cursor.rowcount
+
+
+def file_hash(filepath):
+    """
+    Returns the SHA-256 of a file, or None if the file does not exist.
+    """
+    if not os.path.exists(filepath):
+        return None
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RecordLog:
+    """
+    Counts and hashes the records of a file while they are read. The hash of
+    the records of the last import tells whether a changed file still starts
+    with them, so only the records after them have to be loaded.
+    """
+
+    def __init__(self, records=()):
+        self.records = iter(records)
+        self.count = 0
+        self.digest = hashlib.sha256()
+
+    def __iter__(self):
+        for record in self.records:
+            self.digest.update(json.dumps(record, sort_keys=True, default=str).encode())
+            self.digest.update(b"\n")
+            self.count += 1
+            yield record
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+
+def loaded_prefix(records, checkpoint):
+    """
+    Returns how many records at the start of records were loaded by the
+    import that wrote checkpoint, a (records, records_hash) pair, or 0 if
+    the records no longer start with them.
+    Only the records up to that offset are read.
+    """
+    if not checkpoint or not checkpoint[0] or checkpoint[1] is None:
+        return 0
+    count, records_hash = checkpoint
+    log = RecordLog(islice(records, count))
+    for _ in log:
+        pass
+    return count if log.count == count and log.hexdigest() == records_hash else 0
+
+
+def normalize_session(session_id, session, user_counts, vehicle_map):
+    """
+    Turns a session record into a row for the sessions table, resolving the
+    username and license plate to ids. Returns None if the record is invalid.
+    """
+    try:
+        # Parse timestamps
+        started = datetime.strptime(session.get("started"), "%Y-%m-%dT%H:%M:%SZ") if session.get(
+            "started") else None
+        stopped = datetime.strptime(session.get("stopped"), "%Y-%m-%dT%H:%M:%SZ") if session.get(
+            "stopped") else None
+
+        # Resolve user_id
+        username = session.get("user")
+        user_ids = user_counts.get(username, [])
+        if len(user_ids) == 1:
+            user_id = user_ids[0]
+        else:
+            user_id = None
+            if len(user_ids) > 1:
+                logging.warning(f"Multiple users found for username '{username}', leaving user_id NULL")
+            elif len(user_ids) == 0:
+                logging.warning(f"No user found for username '{username}'")
+
+        # Resolve vehicle_id from the license plate
+        plate = session.get("licenseplate")
+        vehicle_id = vehicle_map.get(plate.strip().upper()) if plate else None
+
+        return (
+            session.get("parking_lot_id"),
+            user_id,
+            vehicle_id,
+            None,
+            started,
+            stopped,
+            session.get("cost")
+        )
+
+    except Exception as e:
+        logging.error(f"Failed to insert session {session_id}: {e}")
+        return None
+
+
+# The user and vehicle lookups of a session worker process, set once by
+# init_session_worker so they are not sent along with every file
+_session_lookups = None
+
+
+def init_session_worker(user_counts, vehicle_map):
+    global _session_lookups
+    _session_lookups = (user_counts, vehicle_map)
+
+
+def normalize_session_file(filepath, checkpoint=None):
+    """
+    Parses a session file in a worker process and returns its sessions as
+    rows for the sessions table, with the number of records in the file and
+    their hash.
+    checkpoint: the (records, records_hash) of the last import of the file,
+    the records it loaded are left out when the file still starts with them
+    """
+    with open(filepath, 'rb') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        logging.error(f"Unexpected data type in {filepath}: {type(data).__name__}, skipping")
+        return [], 0, None
+
+    skip = loaded_prefix(data.items(), checkpoint)
+    if skip:
+        logging.info(f"Sessions: skipping the first {skip} records of {filepath}, they were loaded before")
+    user_counts, vehicle_map = _session_lookups
+    log = RecordLog(data.items())
+    rows = (normalize_session(session_id, session, user_counts, vehicle_map)
+            for session_id, session in islice(log, skip, None))
+    return [row for row in rows if row is not None], log.count, log.hexdigest()
+
+
 class DataConverter:
-    def __init__(self):
+    def __init__(self, streaming=False, workers=0, resume=False):
+        """
+        streaming: parse the JSON files incrementally instead of loading
+        whole files, so the memory use does not grow with the input size
+        workers: the number of processes that parse the session files in
+        parallel, 0 parses them one after another
+        resume: skip the files that are unchanged since they were last imported
+        """
+        self.streaming = streaming
+        self.workers = workers
+        self.resume = resume
+        self.checkpoints = {}
         self.connection = psycopg2.connect(
             host="db",
             port=5432,
@@ -39,13 +301,72 @@ class DataConverter:
             logging.info("No data found")
             return None
 
-    def read_session_data(self):
-        pdata = {}
-        for i in range(1, 1500):
+    def iter_data(self, filename):
+        """
+        Streams the records of a JSON file one at a time.
+        Arrays yield their items, objects yield (key, value) pairs.
+        Returns None if the file has no records.
+        """
+        filepath = os.path.join(self.script_dir, 'data', f'{filename}.json')
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"File not found: {filepath}")
+        records = peek(self._iter_file(filepath))
+        if records is None:
+            logging.info("No data found")
+        return records
+
+    def _iter_file(self, filepath):
+        with open(filepath, 'rb') as f:
+            first = first_char(f)
+            if first == b'[':
+                yield from ijson.items(f, 'item', use_float=True)
+            elif first == b'{':
+                yield from ijson.kvitems(f, '', use_float=True)
+            else:
+                logging.error(f"Unexpected data in {filepath}, skipping")
+
+    def iter_session_data(self, files=None):
+        """
+        Streams the (session_id, session) pairs of the session files, one file
+        after the other. Returns None if there are no sessions.
+        files: the session files to read, all session files if None
+        """
+        return peek(self._iter_session_files(self.session_files() if files is None else files))
+
+    def _iter_session_files(self, files):
+        for filepath in files:
+            with open(filepath, 'rb') as f:
+                if first_char(f) != b'{':
+                    logging.error(f"Unexpected data type in {filepath}, skipping")
+                    continue
+                yield from ijson.kvitems(f, '', use_float=True)
+
+    def session_files(self):
+        """
+        Returns the paths of the session files that exist.
+        """
+        files = []
+        for i in range(1, SESSION_FILES):
             filepath = os.path.join(self.script_dir, 'data/pdata', f'p{i}-sessions.json')
             if not os.path.exists(filepath):
                 logging.warning(f"File not found: {filepath}")
                 continue
+            files.append(filepath)
+        return files
+
+    def load_data(self, filename):
+        if self.streaming:
+            return self.iter_data(filename)
+        return self.read_data(filename)
+
+    def load_session_data(self, files=None):
+        if self.streaming:
+            return self.iter_session_data(files)
+        return self.read_session_data(files)
+
+    def read_session_data(self, files=None):
+        pdata = {}
+        for filepath in self.session_files() if files is None else files:
             with open(filepath, 'r') as f:
                 data = json.load(f)
 
@@ -56,30 +377,34 @@ class DataConverter:
                 continue
         return pdata
 
-    def insert_user(self, data):
+    def insert_user(self, data, batch_size=COPY_BATCH_SIZE):
         cursor = self.connection.cursor()
-        for user in data:
-            # Count existing users with the same username
-            cursor.execute("SELECT COUNT(*) FROM users WHERE username = %s", (user["username"],))
-            count = cursor.fetchone()[0]
-
-            is_active = count == 0
-
-            cursor.execute("""
-                           INSERT INTO users (username, password, name, email, phone, birth_year, active, old_hash)
-                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                           """, (
-                               user["username"],
-                               user["password"],
-                               user["name"],
-                               user["email"],
-                               user["phone"],
-                               user["birth_year"],
-                               is_active,
-                               True
-                           ))
+
+        # Only the first user with a username is active, also across imports
+        cursor.execute("SELECT username FROM users")
+        seen_usernames = {username for (username,) in cursor.fetchall()}
+
+        def rows():
+            for user in data:
+                is_active = user["username"] not in seen_usernames
+                seen_usernames.add(user["username"])
+                yield (
+                    user["username"],
+                    user["password"],
+                    user["name"],
+                    user["email"],
+                    user["phone"],
+                    user["birth_year"],
+                    is_active,
+                    True
+                )
+
+        count = copy_new_rows(cursor, "users",
+                              ("username", "password", "name", "email", "phone", "birth_year", "active", "old_hash"),
+                              rows(), key=("username",), nullable_key=("email",), batch_size=batch_size)
         self.connection.commit()
         cursor.close()
+        return count
 
     def add_super_admin(self):
         # Check for superadmin
@@ -105,175 +430,234 @@ class DataConverter:
         else:
             print("Superadmin already exists.")
 
-    def insert_vehicle(self, data):
+    def insert_vehicle(self, data, batch_size=COPY_BATCH_SIZE):
         cursor = self.connection.cursor()
 
-        for vehicle in data:
-            try:
-                created_at = datetime.strptime(vehicle["created_at"], "%Y-%m-%d").date()
-                user_id = vehicle.get("user_id")
-                cursor.execute("""
-                               INSERT INTO vehicles (user_id, license_plate, make, model, color, year, created_at)
-                               VALUES (%s, %s, %s, %s, %s, %s, %s)
-                               """, (
-                                   user_id,
-                                   vehicle["license_plate"],
-                                   vehicle["make"],
-                                   vehicle["model"],
-                                   vehicle["color"],
-                                   vehicle["year"],
-                                   created_at
-                               ))
-            except Exception as e:
-                logging.error(f"Failed to insert vehicle {vehicle}: {e}")
+        def rows():
+            for vehicle in data:
+                try:
+                    created_at = datetime.strptime(vehicle["created_at"], "%Y-%m-%d").date()
+                    yield (
+                        vehicle.get("user_id"),
+                        vehicle["license_plate"],
+                        vehicle["make"],
+                        vehicle["model"],
+                        vehicle["color"],
+                        vehicle["year"],
+                        created_at
+                    )
+                except Exception as e:
+                    logging.error(f"Failed to insert vehicle {vehicle}: {e}")
+
+        count = copy_new_rows(cursor, "vehicles",
+                              ("user_id", "license_plate", "make", "model", "color", "year", "created_at"),
+                              rows(), key=("license_plate",), nullable_key=("user_id",), batch_size=batch_size)
         self.connection.commit()
         cursor.close()
+        return count
 
-    def insert_parking_lots(self, data):
+    def insert_parking_lots(self, data, batch_size=COPY_BATCH_SIZE):
         cursor = self.connection.cursor()
 
-        for key, lot in data.items():
-            try:
-                created_at = datetime.strptime(lot["created_at"], "%Y-%m-%d").date()
-
-                lat = lot.get("coordinates", {}).get("lat")
-                lng = lot.get("coordinates", {}).get("lng")
-
-                cursor.execute("""
-                               INSERT INTO parking_lots
-                               (name, location, address, capacity, reserved, tariff, daytariff, created_at, lat,
-                                lng)
-                               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                               """, (
-                                   lot["name"],
-                                   lot["location"],
-                                   lot["address"],
-                                   lot["capacity"],
-                                   lot["reserved"],
-                                   lot["tariff"],
-                                   lot["daytariff"],
-                                   created_at,
-                                   lat,
-                                   lng
-                               ))
-
-            except Exception as e:
-                logging.error(f"Failed to insert parking lot {lot}: {e}")
+        def rows():
+            for key, lot in as_items(data):
+                try:
+                    created_at = datetime.strptime(lot["created_at"], "%Y-%m-%d").date()
+
+                    lat = lot.get("coordinates", {}).get("lat")
+                    lng = lot.get("coordinates", {}).get("lng")
+
+                    yield (
+                        lot["name"],
+                        lot["location"],
+                        lot["address"],
+                        lot["capacity"],
+                        lot["reserved"],
+                        lot["tariff"],
+                        lot["daytariff"],
+                        created_at,
+                        lat,
+                        lng
+                    )
+                except Exception as e:
+                    logging.error(f"Failed to insert parking lot {lot}: {e}")
 
+        count = copy_new_rows(cursor, "parking_lots",
+                              ("name", "location", "address", "capacity", "reserved", "tariff", "daytariff",
+                               "created_at", "lat", "lng"),
+                              rows(), key=("name",), nullable_key=("address",), batch_size=batch_size)
         self.connection.commit()
         cursor.close()
+        return count
 
-    def insert_payment(self, data, batch_size=10000):
+    def insert_payment(self, data, batch_size=COPY_BATCH_SIZE):
         cursor = self.connection.cursor()
 
         # Preload users into a dictionary
         cursor.execute("SELECT id, username FROM users")
         user_map = {username: user_id for user_id, username in cursor.fetchall()}
 
-        insert_sql = """
-                     INSERT INTO payments (user_id, transaction, amount, completed, hash, method, issuer, bank, date) \
-                     VALUES %s \
-                     """
-
-        batch = []
-
-        for payment in data:
-            try:
-                username = payment.get("initiator")
-                user_id = user_map.get(username)
-
-                if username and user_id is None:
-                    logging.warning(
-                        f"Payment for username '{username}' could not be uniquely matched. Assigning user_id=NULL."
-                    )
-
-                t_data = payment.get("t_data", {})
-                method = t_data.get("method")
-                issuer = t_data.get("issuer")
-                bank = t_data.get("bank")
-                amount = float(payment.get("amount", 0))
-                completed = payment.get("completed") not in [None, "", False]
-
-                # Parse the date from t_data["date"]
-                date_str = t_data.get("date")
-                if date_str:
-                    try:
-                        date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        logging.warning(f"Invalid date format for payment {payment.get('transaction')}, using NOW()")
+        def rows():
+            for payment in data:
+                try:
+                    username = payment.get("initiator")
+                    user_id = user_map.get(username)
+
+                    if username and user_id is None:
+                        logging.warning(
+                            f"Payment for username '{username}' could not be uniquely matched. Assigning user_id=NULL."
+                        )
+
+                    t_data = payment.get("t_data", {})
+                    method = t_data.get("method")
+                    issuer = t_data.get("issuer")
+                    bank = t_data.get("bank")
+                    amount = float(payment.get("amount", 0))
+                    completed = payment.get("completed") not in [None, "", False]
+
+                    # Parse the date from t_data["date"]
+                    date_str = t_data.get("date")
+                    if date_str:
+                        try:
+                            date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+                        except ValueError:
+                            logging.warning(f"Invalid date format for payment {payment.get('transaction')}, using NOW()")
+                            date = datetime.now()
+                    else:
                         date = datetime.now()
-                else:
-                    date = datetime.now()
-
-                batch.append((
-                    user_id,
-                    payment.get("transaction"),
-                    amount,
-                    completed,
-                    payment.get("hash"),
-                    method,
-                    issuer,
-                    bank,
-                    date
-                ))
-
-                # Insert in batches
-                if len(batch) >= batch_size:
-                    execute_values(cursor, insert_sql, batch)
-                    batch.clear()
 
-            except Exception as e:
-                logging.error(f"Failed to process payment {payment}: {e}")
+                    yield (
+                        user_id,
+                        payment.get("transaction"),
+                        amount,
+                        completed,
+                        payment.get("hash"),
+                        method,
+                        issuer,
+                        bank,
+                        date
+                    )
 
-        # Insert remaining records
-        if batch:
-            execute_values(cursor, insert_sql, batch)
+                except Exception as e:
+                    logging.error(f"Failed to process payment {payment}: {e}")
 
+        count = copy_new_rows(cursor, "payments",
+                              ("user_id", "transaction", "amount", "completed", "hash", "method", "issuer", "bank",
+                               "date"),
+                              rows(), key=("transaction",), batch_size=batch_size)
         self.connection.commit()
         cursor.close()
         logging.info("Payments successfully inserted")
+        return count
 
-    def insert_reservations(self, data):
+    def insert_reservations(self, data, batch_size=COPY_BATCH_SIZE):
         cursor = self.connection.cursor()
 
-        for res in data:
-            try:
-                start_time = datetime.strptime(res.get("start_time"), "%Y-%m-%dT%H:%M:%SZ")
-                end_time = datetime.strptime(res.get("end_time"), "%Y-%m-%dT%H:%M:%SZ")
-                created_at = datetime.strptime(res.get("created_at"), "%Y-%m-%dT%H:%M:%SZ")
-
-                cursor.execute("""
-                               INSERT INTO reservations (vehicle_id,
-                                                         user_id,
-                                                         parking_lot_id,
-                                                         start_time,
-                                                         end_time,
-                                                         status,
-                                                         created_at,
-                                                         cost)
-                               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                               """, (
-                                   res.get("vehicle_id"),
-                                   res.get("user_id"),
-                                   res.get("parking_lot_id"),
-                                   start_time,
-                                   end_time,
-                                   res.get("status"),
-                                   created_at,
-                                   res.get("cost")
-                               ))
-
-            except Exception as e:
-                logging.error(f"Failed to insert reservation {res}: {e}")
+        cursor.execute("""
+                       CREATE TEMP TABLE reservation_staging (
+                           row_no BIGINT,
+                           vehicle_id INTEGER,
+                           user_id INTEGER,
+                           parking_lot_id INTEGER,
+                           start_time TIMESTAMP,
+                           end_time TIMESTAMP,
+                           status VARCHAR,
+                           created_at TIMESTAMP,
+                           cost FLOAT
+                       ) ON COMMIT DROP
+                       """)
+
+        def rows():
+            for row_no, res in enumerate(data):
+                try:
+                    start_time = datetime.strptime(res.get("start_time"), "%Y-%m-%dT%H:%M:%SZ")
+                    end_time = datetime.strptime(res.get("end_time"), "%Y-%m-%dT%H:%M:%SZ")
+                    created_at = datetime.strptime(res.get("created_at"), "%Y-%m-%dT%H:%M:%SZ")
+                    yield (
+                        row_no,
+                        res.get("vehicle_id"),
+                        res.get("user_id"),
+                        res.get("parking_lot_id"),
+                        start_time,
+                        end_time,
+                        res.get("status"),
+                        created_at,
+                        res.get("cost")
+                    )
+                except Exception as e:
+                    logging.error(f"Failed to insert reservation {res}: {e}")
+
+        staged = copy_rows(cursor, "reservation_staging (row_no, vehicle_id, user_id, parking_lot_id, start_time, "
+                                   "end_time, status, created_at, cost)",
+                           rows(), batch_size)
+        cursor.execute("CREATE INDEX ON reservation_staging (vehicle_id, row_no)")
+
+        # Reservations that reference a vehicle, user or parking lot that was
+        # not imported would violate a foreign key and abort the whole stage
+        cursor.execute("""
+                       DELETE FROM reservation_staging s
+                       WHERE (s.vehicle_id IS NOT NULL
+                              AND NOT EXISTS (SELECT 1 FROM vehicles v WHERE v.id = s.vehicle_id))
+                          OR (s.user_id IS NOT NULL
+                              AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id))
+                          OR (s.parking_lot_id IS NOT NULL
+                              AND NOT EXISTS (SELECT 1 FROM parking_lots p WHERE p.id = s.parking_lot_id))
+                       """)
+        orphaned = cursor.rowcount
+        if orphaned > 0:
+            logging.warning(f"Skipped {orphaned} reservations referencing a missing vehicle, user or parking lot")
+
+        # A reservation that overlaps an existing reservation or an earlier
+        # reservation of the same vehicle in the file is skipped, so the
+        # reservations_vehicle_no_overlap constraint cannot abort the load
+        cursor.execute("""
+                       INSERT INTO reservations (vehicle_id, user_id, parking_lot_id, start_time, end_time,
+                                                 status, created_at, cost)
+                       SELECT s.vehicle_id, s.user_id, s.parking_lot_id, s.start_time, s.end_time,
+                              s.status, s.created_at, s.cost
+                       FROM reservation_staging s
+                       WHERE NOT EXISTS (SELECT 1 FROM reservations r
+                                         WHERE r.vehicle_id IS NOT DISTINCT FROM s.vehicle_id
+                                           AND r.start_time = s.start_time
+                                           AND r.end_time = s.end_time)
+                         AND (s.start_time >= s.end_time
+                          OR s.vehicle_id IS NULL
+                          OR s.status IS NOT DISTINCT FROM 'No Show'
+                          OR (NOT EXISTS (SELECT 1 FROM reservations r
+                                          WHERE r.vehicle_id = s.vehicle_id
+                                            AND r.start_time < r.end_time
+                                            AND r.status IS DISTINCT FROM 'No Show'
+                                            AND tsrange(r.start_time, r.end_time)
+                                                && tsrange(s.start_time, s.end_time))
+                              AND NOT EXISTS (SELECT 1 FROM reservation_staging e
+                                              WHERE e.vehicle_id = s.vehicle_id
+                                                AND e.row_no < s.row_no
+                                                AND e.start_time < e.end_time
+                                                AND e.status IS DISTINCT FROM 'No Show'
+                                                AND e.start_time < s.end_time
+                                                AND s.start_time < e.end_time)))
+                       ORDER BY s.row_no
+                       """)
+        count = cursor.rowcount
+        if count < staged - orphaned:
+            logging.warning(f"Skipped {staged - orphaned - count} overlapping reservations")
+
+        # The imported reservations have not booked their slots yet
+        cursor.execute("SELECT DISTINCT parking_lot_id FROM reservation_staging WHERE parking_lot_id IS NOT NULL")
+        lot_ids = [lot_id for (lot_id,) in cursor.fetchall()]
+        rebuild_availability(cursor, lot_ids)
 
         self.connection.commit()
         cursor.close()
-
-
-    def insert_sessions(self, data):
+        for lot_id in lot_ids:
+            invalidate_availability(lot_id)
+        return count
+
+    def load_session_lookups(self):
+        """
+        Returns the user ids per username and the vehicle id per license plate.
+        """
         cursor = self.connection.cursor()
-
-        # Preload users and vehicles
         cursor.execute("SELECT id, username FROM users")
         users = cursor.fetchall()
         user_counts = {}
@@ -284,95 +668,216 @@ class DataConverter:
                 user_counts[username] = [user_id]
 
         cursor.execute("SELECT id, license_plate FROM vehicles")
-        vehicle_map = {licence_plate.strip().upper(): vehicle_id for vehicle_id, licence_plate in cursor.fetchall()}
+        vehicle_map = {licence_plate.strip().upper(): vehicle_id
+                       for vehicle_id, licence_plate in cursor.fetchall() if licence_plate}
+        cursor.close()
+        return user_counts, vehicle_map
 
-        for session_id, session in data.items():
-            try:
-                # Parse timestamps
-                started = datetime.strptime(session.get("started"), "%Y-%m-%dT%H:%M:%SZ") if session.get(
-                    "started") else None
-                stopped = datetime.strptime(session.get("stopped"), "%Y-%m-%dT%H:%M:%SZ") if session.get(
-                    "stopped") else None
-
-                # Resolve user_id
-                username = session.get("user")
-                user_ids = user_counts.get(username, [])
-                if len(user_ids) == 1:
-                    user_id = user_ids[0]
-                else:
-                    user_id = None
-                    if len(user_ids) > 1:
-                        logging.warning(f"Multiple users found for username '{username}', leaving user_id NULL")
-                    elif len(user_ids) == 0:
-                        logging.warning(f"No user found for username '{username}'")
-
-                cursor.execute("""
-                               INSERT INTO sessions (parking_lot_id,
-                                                     user_id,
-                                                     license_plate,
-                                                     reservation_id,
-                                                     start_time,
-                                                     end_time,
-                                                     cost)
-                               VALUES (%s, %s, %s, %s, %s, %s, %s)
-                               """, (
-                                   session.get("parking_lot_id"),
-                                   user_id,
-                                   session.get("licenseplate"),
-                                   None,
-                                   started,
-                                   stopped,
-                                   session.get("cost")
-                               ))
+    def insert_sessions(self, data, batch_size=COPY_BATCH_SIZE, lookups=None):
+        """
+        lookups: the result of load_session_lookups, loaded here if None
+        """
+        # Preload users and vehicles
+        user_counts, vehicle_map = self.load_session_lookups() if lookups is None else lookups
+        cursor = self.connection.cursor()
 
-            except Exception as e:
-                logging.error(f"Failed to insert session {session_id}: {e}")
+        rows = (normalize_session(session_id, session, user_counts, vehicle_map)
+                for session_id, session in as_items(data))
+        count = copy_new_rows(cursor, "sessions", SESSION_COLUMNS, (row for row in rows if row is not None),
+                              key=SESSION_KEY, nullable_key=SESSION_NULLABLE_KEY, batch_size=batch_size)
+        self.connection.commit()
+        cursor.close()
+        logging.info("Sessions successfully inserted")
+        return count
+
+    def insert_sessions_parallel(self, files, batch_size=COPY_BATCH_SIZE, file_records=None):
+        """
+        Parses and normalizes the session files in a pool of worker processes
+        while this process writes their rows with COPY.
+        file_records: a dict that gets the number of records and their hash
+        per file, for the checkpoints
+        """
+        user_counts, vehicle_map = self.load_session_lookups()
+        cursor = self.connection.cursor()
 
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_session_worker,
+                                 initargs=(user_counts, vehicle_map)) as executor:
+            rows = self._parallel_session_rows(executor, files, {} if file_records is None else file_records)
+            count = copy_new_rows(cursor, "sessions", SESSION_COLUMNS, rows,
+                                  key=SESSION_KEY, nullable_key=SESSION_NULLABLE_KEY, batch_size=batch_size)
         self.connection.commit()
         cursor.close()
         logging.info("Sessions successfully inserted")
+        return count
+
+    def _parallel_session_rows(self, executor, files, file_records):
+        # At most two files per worker are parsed ahead of the writer, so the
+        # parsed rows waiting in memory stay bounded
+        def submit(filepath):
+            return executor.submit(normalize_session_file, filepath, self.checkpoint("Sessions", filepath))
+
+        files = iter(files)
+        pending = deque((filepath, submit(filepath)) for filepath in islice(files, self.workers * 2))
+        while pending:
+            filepath, future = pending.popleft()
+            rows, records, records_hash = future.result()
+            file_records[filepath] = (records, records_hash)
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append((next_file, submit(next_file)))
+            yield from rows
+
+    def run_stage(self, name, insert, data):
+        """
+        Runs one insert stage and logs how many rows it loaded per second.
+        """
+        start = time.perf_counter()
+        count = insert(data) or 0
+        seconds = time.perf_counter() - start
+        rate = count / seconds if seconds > 0 else 0
+        logging.info(f"{name}: {count} rows in {seconds:.2f}s ({rate:.0f} rows/s)")
+        return count
+
+    def insert_session_files(self, files, lookups=None):
+        """
+        Imports the session files one at a time, so an interrupted import can
+        resume at the first file that was not finished.
+        files: (filepath, content_hash) pairs
+        lookups: the result of load_session_lookups, shared by all files
+        """
+        if lookups is None:
+            lookups = self.load_session_lookups()
+        count = 0
+        for filepath, content_hash in files:
+            session_data = self.load_session_data([filepath])
+            log = RecordLog(as_items(session_data) if session_data else ())
+            if session_data:
+                skip = self.loaded_records("Sessions", filepath, partial(self.load_session_data, [filepath]))
+                count += self.insert_sessions(islice(log, skip, None), lookups=lookups)
+            self.save_checkpoint("Sessions", filepath, content_hash, log.count, log.hexdigest())
+        return count
+
+    def load_checkpoints(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT stage, source_file, content_hash, records, records_hash FROM import_checkpoints")
+        checkpoints = {(stage, source_file): (content_hash, records, records_hash)
+                       for stage, source_file, content_hash, records, records_hash in cursor.fetchall()}
+        cursor.close()
+        return checkpoints
+
+    def save_checkpoint(self, stage, filepath, content_hash, records, records_hash):
+        """
+        records: the number of records in the file, records_hash their hash
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("""
+                       INSERT INTO import_checkpoints (stage, source_file, content_hash, records, records_hash,
+                                                       completed_at)
+                       VALUES (%s, %s, %s, %s, %s, NOW())
+                       ON CONFLICT (stage, source_file) DO UPDATE
+                           SET content_hash = EXCLUDED.content_hash,
+                               records = EXCLUDED.records,
+                               records_hash = EXCLUDED.records_hash,
+                               completed_at = EXCLUDED.completed_at
+                       """, (stage, os.path.relpath(filepath, self.script_dir), content_hash, records, records_hash))
+        self.connection.commit()
+        cursor.close()
+
+    def checkpoint(self, stage, filepath):
+        """
+        Returns the (records, records_hash) of the last import of a file, or
+        None if it was not imported before or resume is off.
+        """
+        checkpoint = self.checkpoints.get((stage, os.path.relpath(filepath, self.script_dir)))
+        return checkpoint[1:] if checkpoint else None
+
+    def is_unchanged(self, stage, filepath, content_hash):
+        """
+        Returns True if the file was imported before with the same content.
+        """
+        source_file = os.path.relpath(filepath, self.script_dir)
+        checkpoint = self.checkpoints.get((stage, source_file))
+        return content_hash is not None and checkpoint is not None and checkpoint[0] == content_hash
+
+    def loaded_records(self, stage, filepath, load):
+        """
+        Returns how many records at the start of a changed file were loaded
+        by the last import, so an append-only file only loads its new records.
+        load: returns the records of the file again, it is only called when
+        the file was imported before
+        """
+        checkpoint = self.checkpoint(stage, filepath)
+        if not checkpoint or not checkpoint[0]:
+            return 0
+        records = load()
+        skip = loaded_prefix(as_items(records), checkpoint) if records else 0
+        if skip:
+            logging.info(f"{stage}: skipping the first {skip} records of {filepath}, they were loaded before")
+        return skip
 
     def convert(self):
-        user_data = self.read_data('users')
-        if not user_data:
-            logging.info("No users data found, aborting conversion")
-            return
-        logging.info("Read the user data from json")
-        self.insert_user(user_data)
-        logging.info("Users successfully inserted")
+        if self.resume:
+            self.checkpoints = self.load_checkpoints()
+
+        stages = [
+            ("Users", "users", self.insert_user, "No users data found, aborting conversion"),
+            ("Vehicles", "vehicles", self.insert_vehicle, "No vehicle data found, aborting conversion"),
+            ("Parking lots", "parking-lots", self.insert_parking_lots,
+             "No parking lots data found, aborting conversion"),
+            ("Payments", "payments", self.insert_payment, "No payments data found, aborting conversion"),
+            ("Reservations", "reservations", self.insert_reservations,
+             "No reservations data found, aborting conversion"),
+        ]
+        for stage, filename, insert, missing_message in stages:
+            filepath = os.path.join(self.script_dir, 'data', f'{filename}.json')
+            content_hash = file_hash(filepath)
+            if self.is_unchanged(stage, filepath, content_hash):
+                logging.info(f"{stage}: {filename}.json is unchanged, skipping")
+                continue
 
-        vehicle_data = self.read_data('vehicles')
-        if not vehicle_data:
-            logging.info("No vehicle data found, aborting conversion")
+            data = self.load_data(filename)
+            if not data:
+                logging.info(missing_message)
+                return
+            skip = self.loaded_records(stage, filepath, partial(self.load_data, filename))
+            log = RecordLog(as_items(data))
+            self.run_stage(stage, insert, islice(log, skip, None))
+            self.save_checkpoint(stage, filepath, content_hash, log.count, log.hexdigest())
+            logging.info(f"{stage} successfully inserted")
+
+        session_files = self.session_files()
+        if not session_files:
+            logging.info("No session data found, aborting conversion")
             return
-        self.insert_vehicle(vehicle_data)
-        logging.info("Vehicles successfully inserted")
-
-        parking_lot_data = self.read_data('parking-lots')
-        if not parking_lot_data:
-            logging.info("No parking lots data found, aborting conversion")
+        pending = [(filepath, file_hash(filepath)) for filepath in session_files]
+        pending = [(filepath, content_hash) for filepath, content_hash in pending
+                   if not self.is_unchanged("Sessions", filepath, content_hash)]
+        logging.info(f"Sessions: {len(session_files) - len(pending)} of {len(session_files)} files are unchanged")
+
+        if self.workers:
+            file_records = {}
+            self.run_stage("Sessions", partial(self.insert_sessions_parallel, file_records=file_records),
+                           [filepath for filepath, _ in pending])
+            for filepath, content_hash in pending:
+                self.save_checkpoint("Sessions", filepath, content_hash, *file_records.get(filepath, (0, None)))
             return
-        self.insert_parking_lots(parking_lot_data)
-        logging.info("Parking lots successfully inserted")
 
-        payment_data = self.read_data('payments')
-        if not payment_data:
-            logging.info("No payments data found, aborting conversion")
-            return
-        self.insert_payment(payment_data)
-        logging.info("Payments successfully inserted")
+        # The users and vehicles do not change while the session files are imported
+        lookups = self.load_session_lookups()
+        self.run_stage("Sessions", partial(self.insert_session_files, lookups=lookups), pending)
 
-        reservation_data = self.read_data('reservations')
-        if not reservation_data:
-            logging.info("No reservations data found, aborting conversion")
-            return
-        self.insert_reservations(reservation_data)
-        logging.info("Reservations successfully inserted")
 
-        session_data = self.read_session_data()
-        if not session_data:
-            logging.info("No session data found, aborting conversion")
-            return
-        self.insert_sessions(session_data)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Imports the JSON data files into the database.")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip the files that are unchanged since they were last imported")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="the number of processes that parse the session files, 0 parses them one by one")
+    parser.add_argument("--no-streaming", action="store_true",
+                        help="load whole JSON files instead of parsing them incrementally")
+    args = parser.parse_args(argv)
+    DataConverter(streaming=not args.no_streaming, workers=args.workers, resume=args.resume).convert()
 
 
+if __name__ == "__main__":
+    main()
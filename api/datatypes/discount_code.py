@@ -3,8 +3,7 @@ from pydantic import BaseModel
 from typing import Optional, List
 
 
-class DiscountCodeCreate(BaseModel):
-    code: str
+class DiscountCodeRules(BaseModel):
     user_id: Optional[int] = None
     discount_type: str
     discount_value: float
@@ -17,6 +16,22 @@ class DiscountCodeCreate(BaseModel):
     locations: Optional[List[str]] = []
 
 
+class DiscountCodeCreate(DiscountCodeRules):
+    code: str
+
+
+class DiscountCampaignCreate(DiscountCodeRules):
+    """
+    A campaign of generated codes that share the same rules.
+    Every code is "<prefix><code_length random characters>".
+    Campaign codes can be used once unless use_amount is given.
+    """
+    prefix: str
+    count: int
+    code_length: int = 10
+    use_amount: Optional[int] = 1
+
+
 class DiscountCode(DiscountCodeCreate):
     used_count: int
     active: bool
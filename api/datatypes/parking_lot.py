@@ -3,7 +3,7 @@ This file contains all dataclasses related to parking lots.
 """
 
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
 
 
@@ -14,6 +14,7 @@ class ParkingLot(BaseModel):
     address: str
     capacity: int
     reserved: int
+    occupied: int = 0
     tariff: float
     daytariff: float
     created_at: Optional[date] = None
@@ -50,3 +51,15 @@ class ParkingLotFilter(BaseModel):
     min_tariff: Optional[float] = None
     max_tariff: Optional[float] = None
     has_availability: Optional[bool] = None
+
+
+class TariffSimulation(BaseModel):
+    """
+    The tariffs to simulate for a parking lot. Tariffs that are not given
+    keep their current value. Sessions are limited to those that ended
+    between start_date and end_date, both inclusive.
+    """
+    tariff: Optional[float] = Field(default=None, ge=0)
+    daytariff: Optional[float] = Field(default=None, ge=0)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
@@ -2,9 +2,9 @@
 This file contains all dataclasses related to payments.
 """
 
-from datetime import date
-from pydantic import BaseModel
-from typing import Optional
+from datetime import date, datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
 
 
 class PaymentCreate(BaseModel):
@@ -40,3 +40,26 @@ class PaymentUpdate(BaseModel):
     bank: Optional[str] = None
     completed: Optional[bool] = None
     refund_requested: Optional[bool] = None
+
+
+class PaymentFilter(BaseModel):
+    """
+    Filter options for the find_payments() method in the payment model.
+    """
+    user_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    completed: Optional[bool] = None
+    parking_lot_id: Optional[int] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    after: Optional[Tuple[datetime, int]] = None
+    limit: int = 100
+
+
+class PaymentSettlement(BaseModel):
+    payment_ids: List[int] = Field(min_length=1, max_length=500)
+
+
+class RefundApproval(BaseModel):
+    payment_ids: List[int] = Field(min_length=1, max_length=500)
@@ -1,6 +1,6 @@
-from datetime import datetime
-from pydantic import BaseModel
-from typing import Optional
+from datetime import date, datetime, timedelta
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, List, Optional
 
 
 class ReservationCreate(BaseModel):
@@ -17,3 +17,36 @@ class Reservation(ReservationCreate):
     created_at: datetime
     cost: int
     status: str
+
+
+class ReservationWindow(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+
+# The furthest until can be after the day of start_time
+MAX_RECURRENCE_PERIOD = timedelta(days=366)
+
+
+class ReservationRecurrence(BaseModel):
+    """
+    A reservation that repeats every week on the given weekdays, from the
+    day of start_time up to and including until. Monday is 0.
+    """
+    start_time: datetime
+    end_time: datetime
+    until: date
+    weekdays: List[Annotated[int, Field(ge=0, le=6)]] = Field(default=[0, 1, 2, 3, 4], min_length=1)
+
+    @model_validator(mode="after")
+    def check_until(self):
+        if self.until - self.start_time.date() > MAX_RECURRENCE_PERIOD:
+            raise ValueError(f"until can be at most {MAX_RECURRENCE_PERIOD.days} days after start_time")
+        return self
+
+
+class BulkReservationCreate(BaseModel):
+    vehicle_id: int
+    parking_lot_id: int
+    windows: List[ReservationWindow] = []
+    recurrence: Optional[ReservationRecurrence] = None
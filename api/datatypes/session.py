@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 
 
 class SessionCreate(BaseModel):
@@ -15,3 +15,15 @@ class Session(SessionCreate):
     start_time: datetime
     end_time: Optional[datetime] = None
     cost: Optional[float] = None
+
+
+class SessionFilter(BaseModel):
+    """
+    Filter options for the find_sessions() method in the session model.
+    """
+    parking_lot_id: Optional[int] = None
+    start_from: Optional[datetime] = None
+    start_to: Optional[datetime] = None
+    active_only: bool = False
+    after: Optional[Tuple[datetime, int]] = None
+    limit: int = 100
@@ -0,0 +1,125 @@
+"""
+This file contains the background jobs that run periodically next to the API.
+
+The interval of every job is read from the environment, in seconds.
+An interval of 0 disables the job.
+"""
+
+import logging
+import os
+import time
+from typing import List
+from api.models.idempotency_model import IdempotencyModel
+from api.models.parking_lot_model import ParkingLotModel
+from api.models.payment_outbox_model import PaymentOutboxModel
+from api.models.reservation_sweep_model import ReservationSweepModel
+from api.utilities.scheduler import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+OCCUPANCY_RECONCILE_INTERVAL = float(os.getenv("OCCUPANCY_RECONCILE_INTERVAL", "300"))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+PAYMENT_OUTBOX_INTERVAL = float(os.getenv("PAYMENT_OUTBOX_INTERVAL", "5"))
+PAYMENT_OUTBOX_BATCH_SIZE = int(os.getenv("PAYMENT_OUTBOX_BATCH_SIZE", "500"))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "60"))
+RESERVATION_SWEEP_BATCH_SIZE = int(os.getenv("RESERVATION_SWEEP_BATCH_SIZE", "500"))
+RESERVATION_SWEEP_MAX_BATCHES = int(os.getenv("RESERVATION_SWEEP_MAX_BATCHES", "20"))
+# Minutes after the start of a reservation in which a session must be started
+RESERVATION_NO_SHOW_GRACE = int(os.getenv("RESERVATION_NO_SHOW_GRACE", "30"))
+
+
+def reconcile_occupancy() -> int:
+    """
+    Recompute the occupied counter of every parking lot from its active sessions.
+
+    Returns:
+        int: The number of parking lots whose counter was corrected.
+    """
+    model = ParkingLotModel()
+    try:
+        corrected = model.reconcile_occupancy()
+    finally:
+        model.connection.close()
+    if corrected:
+        logger.warning("Corrected the occupancy of %s parking lots", corrected)
+    return corrected
+
+
+def purge_idempotency_keys() -> int:
+    """
+    Delete all expired idempotency keys.
+
+    Returns:
+        int: The number of deleted keys.
+    """
+    model = IdempotencyModel()
+    try:
+        return model.purge_expired()
+    finally:
+        model.connection.close()
+
+
+def process_payment_outbox() -> int:
+    """
+    Create the payments that are waiting in the payment outbox.
+
+    Returns:
+        int: The number of payments that were created.
+    """
+    model = PaymentOutboxModel()
+    try:
+        return model.drain(PAYMENT_OUTBOX_BATCH_SIZE)
+    finally:
+        model.connection.close()
+
+
+def sweep_reservations() -> dict:
+    """
+    Expire the reservations that were not used, release their capacity and
+    recompute the reserved counter of every parking lot.
+
+    Only one API worker sweeps at a time. The other workers skip the run.
+
+    Returns:
+        dict: The number of expired reservations, the number of corrected
+            parking lots and the duration of the run in seconds.
+    """
+    started = time.monotonic()
+    model = ReservationSweepModel()
+    try:
+        if not model.try_lock():
+            return {"expired": 0, "corrected_lots": 0, "seconds": 0.0}
+        try:
+            expired = 0
+            for _ in range(RESERVATION_SWEEP_MAX_BATCHES):
+                batch = model.expire_no_shows(RESERVATION_SWEEP_BATCH_SIZE,
+                                              RESERVATION_NO_SHOW_GRACE)
+                expired += batch
+                if batch < RESERVATION_SWEEP_BATCH_SIZE:
+                    break
+            corrected = model.reconcile_reserved()
+        finally:
+            model.unlock()
+    finally:
+        model.connection.close()
+    seconds = round(time.monotonic() - started, 3)
+    if expired or corrected:
+        logger.info("Expired %s reservations and corrected the reserved count of "
+                    "%s parking lots in %ss", expired, corrected, seconds)
+    return {"expired": expired, "corrected_lots": corrected, "seconds": seconds}
+
+
+def create_jobs() -> List[PeriodicJob]:
+    """
+    Create all enabled background jobs.
+
+    Returns:
+        list[PeriodicJob]: The jobs that should be started with the API.
+    """
+    jobs = [
+        PeriodicJob("reconcile_occupancy", OCCUPANCY_RECONCILE_INTERVAL, reconcile_occupancy),
+        PeriodicJob("purge_idempotency_keys", IDEMPOTENCY_PURGE_INTERVAL, purge_idempotency_keys),
+        PeriodicJob("process_payment_outbox", PAYMENT_OUTBOX_INTERVAL, process_payment_outbox),
+        PeriodicJob("sweep_reservations", RESERVATION_SWEEP_INTERVAL, sweep_reservations),
+    ]
+    return [job for job in jobs if job.interval > 0]
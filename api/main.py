@@ -2,6 +2,7 @@
 Main file of the API.
 """
 import os
+from contextlib import asynccontextmanager
 import api.logging_config # Needs to be imported for logging to be configured.
 from fastapi import FastAPI
 from api.app.routers import (parking_lots,
@@ -12,11 +13,31 @@ from api.app.routers import (parking_lots,
                              vehicles,
                              discount_codes)
 from api.data_converter import DataConverter
+from api.jobs import create_jobs
+from api.utilities.idempotency import IdempotencyMiddleware
 if os.getenv("MIGRATE_JSON", "false").lower() == "true":
-    data_converter: DataConverter = DataConverter()
+    data_converter: DataConverter = DataConverter(
+        streaming=os.getenv("MIGRATE_JSON_STREAMING", "true").lower() == "true",
+        workers=int(os.getenv("MIGRATE_JSON_WORKERS", "0")),
+        resume=os.getenv("MIGRATE_JSON_RESUME", "false").lower() == "true")
     data_converter.convert()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Starts the background jobs when the API starts and stops them on shutdown.
+    """
+    jobs = create_jobs()
+    for job in jobs:
+        job.start()
+    yield
+    for job in jobs:
+        await job.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(IdempotencyMiddleware)
 
 app.include_router(reservations.router)
 app.include_router(profile.router)
@@ -0,0 +1,243 @@
+"""
+This file contains all queries related to the availability of parking lots.
+"""
+
+import os
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+from psycopg2.extras import execute_values
+from api.models.connection import get_connection
+from api.models.parking_lot_model import ParkingLotFullError
+from api.utilities.availability import SlotRange, add_booking, has_room, slot_ranges
+from api.utilities.cache import TTLCache
+
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "30"))
+
+# Booked slots per (parking_lot_id, first day, last day)
+availability_cache = TTLCache(AVAILABILITY_CACHE_TTL)
+
+# Reservations with these statuses had their slots released by the sweep
+RELEASED_STATUSES = ["No Show"]
+
+
+def invalidate_availability(lot_id: int) -> None:
+    """
+    Remove the cached availability of a parking lot. Must be called after the
+    transaction that changed its reservations has been committed.
+
+    Args:
+        lot_id (int): The ID of the parking lot.
+    """
+    availability_cache.invalidate(lambda key: key[0] == lot_id)
+
+
+def _lock_days(cursor, lot_id: int, ranges: List[SlotRange]) -> Dict[date, List[int]]:
+    """
+    Create the missing days of a parking lot and lock the slots of all days
+    in the ranges, in order of day so concurrent bookings cannot deadlock.
+    """
+    days = sorted({day for day, _, _ in ranges})
+    cursor.execute("""
+        INSERT INTO parking_lot_availability (parking_lot_id, day)
+        SELECT %s, unnest(%s::date[])
+        ON CONFLICT DO NOTHING;
+    """, (lot_id, days))
+    cursor.execute("""
+        SELECT day, slots
+        FROM parking_lot_availability
+        WHERE parking_lot_id = %s AND day = ANY(%s::date[])
+        ORDER BY day
+        FOR UPDATE;
+    """, (lot_id, days))
+    return {row[0]: list(row[1]) for row in cursor.fetchall()}
+
+
+def _store_days(cursor, lot_id: int, slots_by_day: Dict[date, List[int]]) -> None:
+    execute_values(
+        cursor,
+        """
+        UPDATE parking_lot_availability AS a
+        SET slots = v.slots
+        FROM (VALUES %s) AS v(parking_lot_id, day, slots)
+        WHERE a.parking_lot_id = v.parking_lot_id AND a.day = v.day;
+    """,
+        [(lot_id, day, slots) for day, slots in slots_by_day.items()],
+        template="(%s, %s::date, %s::integer[])",
+    )
+
+
+def book_slots(cursor, lot_id: int, start_time: datetime, end_time: datetime) -> None:
+    """
+    Book the slots of a reservation, without committing.
+
+    Must be called with the cursor of the transaction that creates the
+    reservation, so the booking is rolled back together with it.
+
+    Args:
+        cursor: The cursor of the open transaction.
+        lot_id (int): The ID of the parking lot.
+        start_time (datetime): The start of the reservation.
+        end_time (datetime): The end of the reservation.
+
+    Raises:
+        ParkingLotFullError: If a slot in the window is fully booked.
+    """
+    book_windows(cursor, lot_id, [(start_time, end_time)])
+
+
+def book_windows(cursor, lot_id: int,
+                 windows: List[Tuple[datetime, datetime]]) -> None:
+    """
+    Book the slots of several reservations of one parking lot, without
+    committing. All days are locked and written once, however many
+    reservations there are.
+
+    Args:
+        cursor: The cursor of the open transaction.
+        lot_id (int): The ID of the parking lot.
+        windows (list[tuple[datetime, datetime]]): The start and end of
+            every reservation.
+
+    Raises:
+        ParkingLotFullError: If a slot in any of the windows is fully booked.
+    """
+    ranges_per_window = [slot_ranges(start, end) for start, end in windows]
+    all_ranges = [r for ranges in ranges_per_window for r in ranges]
+    if not all_ranges:
+        return
+    slots_by_day = _lock_days(cursor, lot_id, all_ranges)
+    cursor.execute("SELECT capacity FROM parking_lots WHERE id = %s;", (lot_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ParkingLotFullError(lot_id)
+    updated = {}
+    for ranges in ranges_per_window:
+        if not has_room(slots_by_day, ranges, row[0]):
+            raise ParkingLotFullError(lot_id)
+        updated.update(add_booking(slots_by_day, ranges, 1))
+    _store_days(cursor, lot_id, updated)
+
+
+def release_slots(cursor, lot_id: int, start_time: datetime, end_time: datetime) -> None:
+    """
+    Release the slots of a reservation, without committing.
+
+    Args:
+        cursor: The cursor of the open transaction.
+        lot_id (int): The ID of the parking lot.
+        start_time (datetime): The start of the reservation.
+        end_time (datetime): The end of the reservation.
+    """
+    release_windows(cursor, lot_id, [(start_time, end_time)])
+
+
+def release_windows(cursor, lot_id: int,
+                    windows: List[Tuple[datetime, datetime]]) -> None:
+    """
+    Release the slots of several reservations of one parking lot, without
+    committing. All days are locked and written once.
+
+    Args:
+        cursor: The cursor of the open transaction.
+        lot_id (int): The ID of the parking lot.
+        windows (list[tuple[datetime, datetime]]): The start and end of
+            every reservation.
+    """
+    ranges_per_window = [slot_ranges(start, end) for start, end in windows]
+    all_ranges = [r for ranges in ranges_per_window for r in ranges]
+    if not all_ranges:
+        return
+    slots_by_day = _lock_days(cursor, lot_id, all_ranges)
+    updated = {}
+    for ranges in ranges_per_window:
+        updated.update(add_booking(slots_by_day, ranges, -1))
+    _store_days(cursor, lot_id, updated)
+
+
+def rebuild_availability(cursor, lot_ids: List[int]) -> None:
+    """
+    Recompute the booked slots of parking lots from today on from their
+    reservations, without committing. Used after reservations were added
+    without booking their slots, such as by the JSON import.
+
+    Args:
+        cursor: The cursor of the open transaction.
+        lot_ids (list[int]): The IDs of the parking lots.
+    """
+    if not lot_ids:
+        return
+    params = {"lots": list(lot_ids), "released": RELEASED_STATUSES}
+    cursor.execute("""
+        UPDATE parking_lot_availability
+        SET slots = array_fill(0, ARRAY[96])
+        WHERE parking_lot_id = ANY(%(lots)s) AND day >= CURRENT_DATE;
+    """, params)
+    cursor.execute("""
+        WITH booked AS (
+            SELECT r.parking_lot_id,
+                   t::date AS day,
+                   (EXTRACT(HOUR FROM t) * 4 + EXTRACT(MINUTE FROM t) / 15)::int AS slot,
+                   COUNT(*) AS booked
+            FROM reservations r,
+                 generate_series(
+                     date_bin('15 minutes', r.start_time, TIMESTAMP '2000-01-01'),
+                     r.end_time - INTERVAL '1 microsecond',
+                     INTERVAL '15 minutes') AS t
+            WHERE r.parking_lot_id = ANY(%(lots)s)
+              AND r.start_time < r.end_time
+              AND r.end_time > NOW()
+              AND (r.status IS NULL OR r.status <> ALL(%(released)s))
+              AND t >= CURRENT_DATE
+            GROUP BY 1, 2, 3
+        )
+        INSERT INTO parking_lot_availability (parking_lot_id, day, slots)
+        SELECT d.parking_lot_id, d.day,
+               array_agg(COALESCE(b.booked, 0)::int ORDER BY s.slot)
+        FROM (SELECT DISTINCT parking_lot_id, day FROM booked) AS d
+        CROSS JOIN generate_series(0, 95) AS s(slot)
+        LEFT JOIN booked b
+               ON b.parking_lot_id = d.parking_lot_id
+              AND b.day = d.day
+              AND b.slot = s.slot
+        GROUP BY d.parking_lot_id, d.day
+        ON CONFLICT (parking_lot_id, day) DO UPDATE SET slots = EXCLUDED.slots;
+    """, params)
+
+
+class AvailabilityModel:
+    """
+    Handles reading the booked slots of parking lots.
+    """
+    def __init__(self):
+        self.connection = get_connection()
+
+    def get_slots(self, lot_id: int, days: List[date]) -> Dict[date, List[int]]:
+        """
+        Retrieve the booked slots of a parking lot for a list of days.
+
+        The result is cached until a reservation of the parking lot changes
+        or AVAILABILITY_CACHE_TTL seconds have passed.
+
+        Args:
+            lot_id (int): The ID of the parking lot.
+            days (list[date]): The consecutive days to retrieve.
+
+        Returns:
+            dict[date, list[int]]: The booked slots per day. Days without any
+                reservation are left out.
+        """
+        if not days:
+            return {}
+        key = (lot_id, days[0], days[-1])
+        slots_by_day = availability_cache.get(key)
+        if slots_by_day is None:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT day, slots
+                FROM parking_lot_availability
+                WHERE parking_lot_id = %s AND day BETWEEN %s AND %s;
+            """, (lot_id, days[0], days[-1]))
+            slots_by_day = {row[0]: list(row[1]) for row in cursor.fetchall()}
+            self.connection.commit()
+            availability_cache.set(key, slots_by_day)
+        return slots_by_day
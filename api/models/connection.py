@@ -1,25 +1,75 @@
 """
 This file stores the connection information for the database.
 """
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 import os
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
 
-def get_connection():
-    """
-    Returns a new connection to the database.
-    Each call creates a fresh connection suitable for multithreaded use.
-    """
+_pool = None
+_pool_lock = threading.Lock()
+# The pool raises instead of waiting when it is exhausted, so callers wait here
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+
+
+def _connection_settings() -> dict:
     if os.environ.get("TESTING") == "1":
         host = "test_db"
         database = "test_database"
     else:
         host = "db"
         database = "database"
-    return psycopg2.connect(
-        host=host,
-        port=5432,
-        database=database,
-        user="user",
-        password="password",
-    )
\ No newline at end of file
+    return {
+        "host": host,
+        "port": 5432,
+        "database": database,
+        "user": "user",
+        "password": "password",
+    }
+
+
+def get_connection():
+    """
+    Returns a new connection to the database.
+    Each call creates a fresh connection suitable for multithreaded use.
+    """
+    return psycopg2.connect(**_connection_settings())
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """
+    Returns the connection pool of this process, created on first use.
+    The pool keeps at most DB_POOL_MAX_SIZE connections open.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, **_connection_settings())
+        return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrows a connection from the pool for the duration of a with block.
+    Waits when all connections are borrowed. The transaction is committed
+    when the block succeeds and rolled back when it raises, before the
+    connection is returned to the pool.
+    """
+    pool = get_pool()
+    with _pool_slots:
+        connection = pool.getconn()
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            if not connection.closed:
+                connection.rollback()
+            raise
+        finally:
+            pool.putconn(connection, close=bool(connection.closed))
\ No newline at end of file
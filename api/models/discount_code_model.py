@@ -1,6 +1,43 @@
+import io
 import psycopg2
 import os
-from api.datatypes.discount_code import DiscountCodeCreate
+from datetime import datetime
+from typing import Callable, List, Optional
+from api.datatypes.discount_code import DiscountCampaignCreate, DiscountCodeCreate
+from api.utilities.cache import TTLCache
+
+DISCOUNT_CODE_CACHE_TTL = float(os.getenv("DISCOUNT_CODE_CACHE_TTL", "60"))
+
+# The full discount code table with locations, under a single key
+discount_code_cache = TTLCache(DISCOUNT_CODE_CACHE_TTL, max_size=1)
+ALL_CODES = "all"
+
+# Attempts to replace generated codes that already exist
+CAMPAIGN_MAX_ATTEMPTS = 5
+
+# Discount codes with their locations, one row per code
+SELECT_WITH_LOCATIONS = """
+    SELECT d.*,
+           COALESCE(array_agg(l.location ORDER BY l.location)
+                    FILTER (WHERE l.location IS NOT NULL), '{}') AS locations
+    FROM discount_codes d
+    LEFT JOIN discount_code_locations l ON l.discount_code = d.code
+"""
+
+
+def _copy_text(value: str) -> str:
+    """
+    Escape a value for the text format of COPY.
+    """
+    return (value.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def invalidate_discount_codes():
+    """
+    Remove the cached discount codes. Called after every change of a code.
+    """
+    discount_code_cache.invalidate()
 
 
 class DiscountCodeModel:
@@ -38,16 +75,94 @@ class DiscountCodeModel:
                             d.start_date, d.end_date
                            ))
             row = cursor.fetchone()
+            columns = [desc[0] for desc in cursor.description]
             self.add_discount_code_locations(d.code, d.locations or [])
-            if row:
-                columns = [desc[0] for desc in cursor.description]
-                self.connection.commit()
-                return dict(zip(columns, row))
             self.connection.commit()
-            return None
         except Exception:
             self.connection.rollback()
             raise
+        finally:
+            invalidate_discount_codes()
+        if row:
+            created = dict(zip(columns, row))
+            created["locations"] = sorted(set(d.locations or []))
+            return created
+        return None
+
+    def create_discount_campaign(self, campaign: DiscountCampaignCreate,
+                                 generate: Callable[[int], List[str]]) -> List[str]:
+        """
+        Create all codes of a campaign in one transaction.
+
+        The codes are copied into a temporary table and inserted from there
+        with the rules of the campaign. Generated codes that already exist are
+        skipped by ON CONFLICT and replaced by newly generated codes. The
+        location rows of all codes are loaded with one COPY as well.
+
+        Args:
+            campaign (DiscountCampaignCreate): The shared rules of the codes.
+            generate (Callable[[int], list[str]]): Generates a number of
+                distinct codes.
+
+        Raises:
+            RuntimeError: If not enough unique codes were generated after
+                CAMPAIGN_MAX_ATTEMPTS attempts.
+
+        Returns:
+            list[str]: The created codes.
+        """
+        cursor = self.connection.cursor()
+        created: List[str] = []
+        try:
+            cursor.execute("""
+                CREATE TEMP TABLE discount_code_staging (code VARCHAR)
+                ON COMMIT DROP;
+            """)
+            for _ in range(CAMPAIGN_MAX_ATTEMPTS):
+                missing = campaign.count - len(created)
+                if missing == 0:
+                    break
+                cursor.execute("TRUNCATE discount_code_staging;")
+                cursor.copy_expert(
+                    "COPY discount_code_staging (code) FROM STDIN;",
+                    io.StringIO("".join(f"{code}\n" for code in generate(missing))))
+                cursor.execute("""
+                    INSERT INTO discount_codes
+                    (code, user_id, discount_type, discount_value,
+                     use_amount, minimum_price,
+                     start_applicable_time, end_applicable_time,
+                     start_date, end_date)
+                    SELECT code, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                    FROM discount_code_staging
+                    ON CONFLICT (code) DO NOTHING
+                    RETURNING code;
+                """, (
+                    campaign.user_id, campaign.discount_type,
+                    campaign.discount_value, campaign.use_amount,
+                    campaign.minimum_price, campaign.start_applicable_time,
+                    campaign.end_applicable_time, campaign.start_date,
+                    campaign.end_date,
+                ))
+                created.extend(row[0] for row in cursor.fetchall())
+            if len(created) < campaign.count:
+                raise RuntimeError(
+                    f"Only {len(created)} of {campaign.count} campaign codes were unique")
+
+            locations = [_copy_text(location)
+                         for location in sorted(set(campaign.locations or []))]
+            if locations:
+                cursor.copy_expert(
+                    "COPY discount_code_locations (discount_code, location) FROM STDIN;",
+                    io.StringIO("".join(f"{code}\t{location}\n"
+                                        for code in created
+                                        for location in locations)))
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            invalidate_discount_codes()
+        return created
 
     def add_discount_code_locations(self, discount_code: str,
                                     locations: list[str]):
@@ -62,31 +177,37 @@ class DiscountCodeModel:
                 ON CONFLICT (discount_code, location) DO NOTHING;
             """, (discount_code, loc))
         self.connection.commit()
+        invalidate_discount_codes()
+
+    def _get_cached_discount_codes(self):
+        codes = discount_code_cache.get(ALL_CODES)
+        if codes is None:
+            cursor = self.connection.cursor()
+            cursor.execute(SELECT_WITH_LOCATIONS + """
+                GROUP BY d.code
+                ORDER BY d.code;
+            """)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            self.connection.commit()
+            codes = [dict(zip(columns, row)) for row in rows]
+            discount_code_cache.set(ALL_CODES, codes)
+        # Copies, so callers can change the codes without changing the cache
+        return [dict(code) for code in codes]
 
     def get_all_discount_codes(self):
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT * FROM discount_codes;
-                       """)
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        result = [dict(zip(columns, row)) for row in rows]
-        return result
+        return self._get_cached_discount_codes()
 
     def get_all_active_discount_codes(self):
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT * FROM discount_codes WHERE active IS TRUE;
-                       """)
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        result = [dict(zip(columns, row)) for row in rows]
-        return result
+        return [code for code in self._get_cached_discount_codes()
+                if code["active"] is True]
 
     def get_discount_code_by_code(self, code):
+        # Not cached, redeeming a code needs its current used_count
         cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT * FROM discount_codes WHERE code = %s;
+        cursor.execute(SELECT_WITH_LOCATIONS + """
+            WHERE d.code = %s
+            GROUP BY d.code;
                     """, (code,))
         row = cursor.fetchone()
         if row:
@@ -113,6 +234,7 @@ class DiscountCodeModel:
         """, (code,))
         row = cursor.fetchone()
         self.connection.commit()
+        invalidate_discount_codes()
         if row:
             columns = [desc[0] for desc in cursor.description]
             return dict(zip(columns, row))
@@ -127,6 +249,7 @@ class DiscountCodeModel:
         """, (code,))
         row = cursor.fetchone()
         self.connection.commit()
+        invalidate_discount_codes()
         if row:
             columns = [desc[0] for desc in cursor.description]
             return dict(zip(columns, row))
@@ -143,21 +266,103 @@ class DiscountCodeModel:
         )
         values = list(update_data.values()) + [code]
         try:
+            # The locations are read from the snapshot before the update, so
+            # they are found under the old code even when the code changes
             cursor.execute(f"""
-                UPDATE discount_codes
-                SET {set_clauses}
-                WHERE code = %s
-                RETURNING *;
-            """, values)
+                WITH updated AS (
+                    UPDATE discount_codes
+                    SET {set_clauses}
+                    WHERE code = %s
+                    RETURNING *
+                )
+                SELECT updated.*,
+                       ARRAY(SELECT location FROM discount_code_locations
+                             WHERE discount_code = %s
+                             ORDER BY location) AS locations
+                FROM updated;
+            """, values + [code])
             row = cursor.fetchone()
             self.connection.commit()
             if row:
                 columns = [desc[0] for desc in cursor.description]
-                self.connection.commit()
                 return dict(zip(columns, row))
         except Exception:
             self.connection.rollback()
             raise
+        finally:
+            invalidate_discount_codes()
+
+    def redeem_discount_code(self, code: str, user_id: int, location: str,
+                             now: datetime) -> Optional[dict]:
+        """
+        Validate and use a discount code in one statement.
+
+        The code is only used when it is active, may be used by the user, has
+        uses left, has not expired, is applicable at this time of day and is
+        valid at the location. The row lock of the update makes concurrent
+        redemptions wait for each other, so use_amount cannot be exceeded.
+
+        Args:
+            code (str): The discount code.
+            user_id (int): The ID of the user redeeming the code.
+            location (str): The location of the parking lot.
+            now (datetime): The time of the redemption.
+
+        Returns:
+            dict | None: The code after its use, or None if it can not be used.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            UPDATE discount_codes d
+            SET used_count = d.used_count + 1
+            WHERE d.code = %(code)s
+              AND d.active IS TRUE
+              AND (d.user_id IS NULL OR d.user_id = %(user_id)s)
+              AND (d.use_amount IS NULL OR d.used_count < d.use_amount)
+              AND (d.end_date IS NULL OR %(now)s < d.end_date)
+              AND (d.start_applicable_time IS NULL
+                   OR d.end_applicable_time IS NULL
+                   OR %(now)s::time BETWEEN d.start_applicable_time
+                                        AND d.end_applicable_time)
+              AND (NOT EXISTS (SELECT 1 FROM discount_code_locations l
+                               WHERE l.discount_code = d.code)
+                   OR EXISTS (SELECT 1 FROM discount_code_locations l
+                              WHERE l.discount_code = d.code
+                                AND l.location = %(location)s))
+            RETURNING *;
+        """, {"code": code, "user_id": user_id, "location": location, "now": now})
+        row = cursor.fetchone()
+        self.connection.commit()
+        if row is None:
+            return None
+        invalidate_discount_codes()
+        columns = [desc[0] for desc in cursor.description]
+        return dict(zip(columns, row))
+
+    def release_discount_code(self, code: str) -> bool:
+        """
+        Give back a use of a discount code that was redeemed for a
+        reservation that could not be created.
+
+        Args:
+            code (str): The discount code.
+
+        Returns:
+            bool: True if a use was given back, otherwise False.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            UPDATE discount_codes
+            SET used_count = used_count - 1
+            WHERE code = %s AND used_count > 0
+            RETURNING code;
+        """, (code,))
+        row = cursor.fetchone()
+        self.connection.commit()
+        if row is None:
+            return False
+        invalidate_discount_codes()
+        return True
 
     def increment_used_count(self, code):
         cursor = self.connection.cursor()
@@ -169,6 +374,7 @@ class DiscountCodeModel:
         """, (code,))
         row = cursor.fetchone()
         self.connection.commit()
+        invalidate_discount_codes()
         if row:
             columns = [desc[0] for desc in cursor.description]
             return dict(zip(columns, row))
@@ -0,0 +1,141 @@
+"""
+This file contains all queries related to idempotency keys.
+"""
+
+import logging
+import psycopg2
+from api.models.connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+# A request that has not completed after this many seconds is treated as
+# abandoned, so a crashed request does not block its key until it expires.
+PENDING_TIMEOUT = 60
+
+
+class IdempotencyModel:
+    """
+    Handles all database operations related to idempotency keys.
+
+    Every key stores the fingerprint of the request that first used it and,
+    once that request completed, the response that was sent.
+    """
+
+    def __init__(self):
+        """
+        Initialize a new IdempotencyModel instance and connect to the database.
+        """
+        self.connection = get_connection()
+
+    def reserve(self, scope: str, key: str, fingerprint: str,
+                ttl: int) -> dict | None:
+        """
+        Claim an idempotency key for a new request.
+
+        Args:
+            scope (str): Hash of the caller the key belongs to.
+            key (str): The idempotency key sent by the client.
+            fingerprint (str): Hash of the method, path and body of the request.
+            ttl (int): The number of seconds the key is remembered.
+
+        Returns:
+            dict | None: None if the key was claimed for this request, otherwise
+                the stored fingerprint, status_code, body and content_type.
+                status_code is None while the first request is still running.
+        """
+        cursor = self.connection.cursor()
+        try:
+            for _ in range(2):
+                cursor.execute("""
+                    INSERT INTO idempotency_keys (scope, key, fingerprint, expires_at)
+                    VALUES (%s, %s, %s, NOW() + %s * INTERVAL '1 second')
+                    ON CONFLICT (scope, key) DO UPDATE
+                    SET fingerprint = EXCLUDED.fingerprint,
+                        status_code = NULL,
+                        response_body = NULL,
+                        content_type = NULL,
+                        created_at = NOW(),
+                        expires_at = EXCLUDED.expires_at
+                    WHERE idempotency_keys.expires_at < NOW()
+                       OR (idempotency_keys.status_code IS NULL
+                           AND idempotency_keys.created_at
+                               < NOW() - %s * INTERVAL '1 second')
+                    RETURNING key;
+                """, (scope, key, fingerprint, ttl, PENDING_TIMEOUT))
+                if cursor.fetchone():
+                    self.connection.commit()
+                    return None
+
+                cursor.execute("""
+                    SELECT fingerprint, status_code, response_body, content_type
+                    FROM idempotency_keys
+                    WHERE scope = %s AND key = %s;
+                """, (scope, key))
+                row = cursor.fetchone()
+                self.connection.commit()
+                if row:
+                    return {
+                        "fingerprint": row[0],
+                        "status_code": row[1],
+                        "body": bytes(row[2]) if row[2] is not None else b"",
+                        "content_type": row[3],
+                    }
+            return None
+        except psycopg2.DatabaseError:
+            self.connection.rollback()
+            raise
+
+    def complete(self, scope: str, key: str, status_code: int,
+                 body: bytes, content_type: str | None) -> None:
+        """
+        Store the response of the request that claimed a key.
+
+        Args:
+            scope (str): Hash of the caller the key belongs to.
+            key (str): The idempotency key sent by the client.
+            status_code (int): The status code of the response.
+            body (bytes): The body of the response.
+            content_type (str | None): The content type of the response.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET status_code = %s, response_body = %s, content_type = %s
+                WHERE scope = %s AND key = %s;
+            """, (status_code, psycopg2.Binary(body), content_type, scope, key))
+            self.connection.commit()
+        except psycopg2.DatabaseError:
+            self.connection.rollback()
+            raise
+
+    def release(self, scope: str, key: str) -> None:
+        """
+        Remove a claimed key, so the request can be retried.
+
+        Args:
+            scope (str): Hash of the caller the key belongs to.
+            key (str): The idempotency key sent by the client.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE scope = %s AND key = %s AND status_code IS NULL;
+            """, (scope, key))
+            self.connection.commit()
+        except psycopg2.DatabaseError:
+            self.connection.rollback()
+            raise
+
+    def purge_expired(self) -> int:
+        """
+        Delete all expired keys.
+
+        Returns:
+            int: The number of deleted keys.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW();")
+        self.connection.commit()
+        return cursor.rowcount
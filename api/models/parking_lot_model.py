@@ -2,11 +2,31 @@
 this file contains all queries related to parking lots.
 """
 
-from typing import List, Optional
-from pydantic_core import ValidationError
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
 from api.datatypes.parking_lot import ParkingLot, ParkingLotCreate, ParkingLotFilter
 from api.datatypes.session import Session
 from api.models.connection import get_connection
+from api.models.row_mapper import RowMapper
+from api.session_calculator import (calculate_prices,
+                                    generate_payment_hash,
+                                    generate_transaction_validation_hash)
+
+parking_lot_mapper: RowMapper[ParkingLot] = RowMapper(ParkingLot)
+session_mapper: RowMapper[Session] = RowMapper(Session)
+
+
+class ParkingLotFullError(Exception):
+    """
+    Raised when a parking lot has no free spots left.
+    """
+    def __init__(self, lot_id: int):
+        super().__init__(f"Parking lot {lot_id} is full")
+        self.lot_id = lot_id
+
 
 class ParkingLotModel:
     """
@@ -63,6 +83,58 @@ class ParkingLotModel:
         sessions = self.map_to_session(cursor)
         return sessions[0] if sessions else None
 
+    @staticmethod
+    def iter_session_times(
+        lot_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        chunk_size: int = 100_000,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Streams the start and end times of all finished sessions of a parking lot
+        through a server-side cursor on a dedicated connection, so the sessions are
+        never loaded into memory at once. Times are selected as epoch microseconds
+        so every chunk converts to NumPy without creating datetime objects.
+        @param: lot_id
+        @param: start_date: only sessions that ended on or after this date
+        @param: end_date: only sessions that ended on or before this date
+        @param: chunk_size: the number of sessions per chunk
+        @return: iterator of (starts, ends) datetime64 arrays
+        """
+        connection = get_connection()
+        try:
+            cursor = connection.cursor(name="session_times")
+            cursor.itersize = chunk_size
+
+            query = """
+                SELECT (EXTRACT(EPOCH FROM start_time) * 1000000)::bigint,
+                       (EXTRACT(EPOCH FROM end_time) * 1000000)::bigint
+                FROM sessions
+                WHERE parking_lot_id = %s
+                  AND start_time IS NOT NULL AND end_time IS NOT NULL
+            """
+            params = [lot_id]
+
+            if start_date is not None:
+                query += " AND end_time >= %s"
+                params.append(start_date)
+
+            if end_date is not None:
+                query += " AND end_time < %s::date + 1"
+                params.append(end_date)
+
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                times = np.array(rows, dtype=np.int64)
+                yield (times[:, 0].astype("datetime64[us]"),
+                       times[:, 1].astype("datetime64[us]"))
+            cursor.close()
+        finally:
+            connection.close()
+
     @staticmethod
     def map_to_session(cursor) -> List[Session]:
         """
@@ -70,16 +142,7 @@ class ParkingLotModel:
         @param: cursor
         @return: session object
         """
-        columns = [desc[0] for desc in cursor.description]
-        sessions = []
-        for row in cursor.fetchall():
-            row_dict = dict(zip(columns, row))
-            try:
-                session = Session.model_validate(row_dict)
-                sessions.append(session)
-            except ValidationError  as e:
-                print("Failed to map row to Session:", row_dict, e)
-        return sessions
+        return session_mapper.map_rows(cursor)
 
     def find_parking_lots(
         self,
@@ -246,6 +309,133 @@ class ParkingLotModel:
         self.connection.commit()
         return cursor.rowcount > 0
 
+    def close_parking_lot(
+        self, lot_id: int, closed_reason: str, closed_date: date
+    ) -> Optional[List[dict]]:
+        """
+        Closes a parking lot and stops all of its active sessions in one transaction.
+        The costs of all sessions are calculated in one batch and the payments of
+        sessions without a reservation are inserted in bulk.
+        @param: lot_id
+        @param: closed_reason
+        @param: closed_date
+        @return: list with the id, user, vehicle and cost of every stopped session,
+            or None if the parking lot does not exist
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(
+                "SELECT * FROM parking_lots WHERE id = %s FOR UPDATE;", (lot_id,)
+            )
+            lots = self.map_to_parking_lot(cursor)
+            if not lots:
+                self.connection.rollback()
+                return None
+            lot = lots[0]
+
+            cursor.execute(
+                """
+                SELECT s.id, s.user_id, s.vehicle_id, s.reservation_id,
+                       s.start_time, v.license_plate
+                FROM sessions s
+                LEFT JOIN vehicles v ON v.id = s.vehicle_id
+                WHERE s.parking_lot_id = %s AND s.end_time IS NULL
+                FOR UPDATE OF s;
+            """,
+                (lot_id,),
+            )
+            rows = cursor.fetchall()
+
+            end_time = datetime.now()
+            costs = calculate_prices(
+                [row[4] for row in rows], end_time, lot.tariff, lot.daytariff
+            ).tolist()
+
+            execute_values(
+                cursor,
+                """
+                UPDATE sessions AS s
+                SET end_time = v.end_time, cost = v.cost
+                FROM (VALUES %s) AS v(id, end_time, cost)
+                WHERE s.id = v.id;
+            """,
+                [(row[0], end_time, cost) for row, cost in zip(rows, costs)],
+                template="(%s, %s::timestamp, %s::float)",
+                page_size=1000,
+            )
+
+            # Sessions of a reservation are paid through the reservation
+            execute_values(
+                cursor,
+                """
+                INSERT INTO payments
+                (user_id, parking_lot_id, session_id, transaction, amount, hash)
+                VALUES %s;
+            """,
+                [
+                    (
+                        row[1],
+                        lot_id,
+                        row[0],
+                        generate_payment_hash(str(row[0]), row[5] or ""),
+                        cost,
+                        generate_transaction_validation_hash(),
+                    )
+                    for row, cost in zip(rows, costs)
+                    if row[3] is None
+                ],
+                page_size=1000,
+            )
+
+            cursor.execute(
+                """
+                UPDATE parking_lots
+                SET status = 'closed', closed_reason = %s, closed_date = %s,
+                    occupied = 0
+                WHERE id = %s;
+            """,
+                (closed_reason, closed_date, lot_id),
+            )
+            self.connection.commit()
+        except psycopg2.DatabaseError:
+            self.connection.rollback()
+            raise
+
+        return [
+            {
+                "session_id": row[0],
+                "user_id": row[1],
+                "vehicle_id": row[2],
+                "reservation_id": row[3],
+                "cost": cost,
+            }
+            for row, cost in zip(rows, costs)
+        ]
+
+    def reconcile_occupancy(self) -> int:
+        """
+        Recomputes the occupied counter of every parking lot from its active sessions
+        in one aggregate query. Only lots whose counter drifted are written.
+        @return: the number of parking lots that were corrected
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(
+            """
+            UPDATE parking_lots p
+            SET occupied = counts.active
+            FROM (
+                SELECT l.id, COUNT(s.id) AS active
+                FROM parking_lots l
+                LEFT JOIN sessions s
+                    ON s.parking_lot_id = l.id AND s.end_time IS NULL
+                GROUP BY l.id
+            ) counts
+            WHERE p.id = counts.id AND p.occupied <> counts.active;
+        """
+        )
+        self.connection.commit()
+        return cursor.rowcount
+
     # region delete
     def delete_parking_lot(self, lot_id: int) -> bool:
         """
@@ -265,13 +455,4 @@ class ParkingLotModel:
         @param: cursor
         @return: list of ParkingLot objects
         """
-        columns = [desc[0] for desc in cursor.description]
-        parking_lots = []
-        for row in cursor.fetchall():
-            row_dict = dict(zip(columns, row))
-            try:
-                parking_lot = ParkingLot.model_validate(row_dict)
-                parking_lots.append(parking_lot)
-            except ValidationError  as e:
-                print("Failed to map row to parking_lot:", row_dict, e)
-        return parking_lots
+        return parking_lot_mapper.map_rows(cursor)
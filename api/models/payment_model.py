@@ -5,12 +5,26 @@ This file contains all queries related to payments.
 import logging
 import psycopg2
 import os
-from api.datatypes.payment import PaymentCreate
+from datetime import datetime
+from typing import Iterator
+from api.datatypes.payment import PaymentCreate, PaymentFilter
 from api.models.connection import get_connection
 from api.session_calculator import generate_transaction_validation_hash
 
 logger = logging.getLogger(__name__)
 
+# The columns of a payment export, in the order they are written.
+EXPORT_COLUMNS = ("id", "parking_lot_id", "user_id", "session_id",
+                  "reservation_id", "transaction", "amount", "method",
+                  "issuer", "bank", "date", "completed",
+                  "refund_requested", "refund_accepted")
+EXPORT_CHUNK_SIZE = 5000
+# The number of seconds a claimed refund request stays leased to one admin.
+REFUND_CLAIM_TIMEOUT = 300
+# Payments without a date are listed first, as if made at '-infinity'. A
+# pagination cursor cannot hold that value, so it uses datetime.min instead.
+NULL_DATE_KEY = datetime.min
+
 class PaymentModel:
     """
     Handles all database operations related to payments.
@@ -74,43 +88,223 @@ class PaymentModel:
         return None
 
     @classmethod
-    def get_payments_by_user(cls, user_id: int) -> list[dict]:
+    def find_payments(cls, filters: PaymentFilter) -> list[dict]:
         """
-        Retrieve all payments for a specific user.
+        Retrieve one page of payments, ordered by date and id.
+
+        The page starts after the (date, id) key in filters.after, so the
+        query walks the (user_id, date, id) index instead of skipping rows
+        with OFFSET. Payments without a date sort first; their key uses
+        NULL_DATE_KEY. One row more than the limit is fetched so the caller
+        can tell whether there is a next page.
 
         Args:
-            user_id (int): The ID of the user.
+            filters (PaymentFilter): The filters and the position of the page.
 
         Returns:
-            list[dict]: List of payments as dictionaries. Empty list if none found.
+            list[dict]: At most filters.limit + 1 payments as dictionaries.
+        """
+        cursor = cls.connection.cursor()
+        conditions, params = cls._filter_conditions(filters)
+
+        if filters.after is not None:
+            after_date, after_id = filters.after
+            conditions += " AND (COALESCE(date, '-infinity'::timestamp), id) > (%s::timestamp, %s)"
+            params.extend(["-infinity" if after_date == NULL_DATE_KEY else after_date, after_id])
+
+        cursor.execute(f"""
+            SELECT * FROM payments
+            WHERE {conditions}
+            ORDER BY COALESCE(date, '-infinity'::timestamp), id
+            LIMIT %s;
+        """, params + [filters.limit + 1])
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    @classmethod
+    def count_payments(cls, filters: PaymentFilter) -> int:
+        """
+        Count all payments that match the filters, ignoring pagination.
+
+        Args:
+            filters (PaymentFilter): The filters to count payments for.
+
+        Returns:
+            int: The number of matching payments.
+        """
+        cursor = cls.connection.cursor()
+        conditions, params = cls._filter_conditions(filters)
+        cursor.execute(f"SELECT COUNT(*) FROM payments WHERE {conditions};",
+                       params)
+        return cursor.fetchone()[0]
+
+    @classmethod
+    def get_payments_by_transaction(cls, transaction: str) -> list[dict]:
+        """
+        Retrieve all payments that belong to a transaction.
+
+        Args:
+            transaction (str): The transaction hash of the payments.
+
+        Returns:
+            list[dict]: The payments of the transaction, ordered by date and id.
         """
         cursor = cls.connection.cursor()
         cursor.execute("""
-            SELECT * FROM payments WHERE user_id = %s;
-        """, (user_id,))
+            SELECT * FROM payments
+            WHERE transaction = %s
+            ORDER BY date, id;
+        """, (transaction,))
         rows = cursor.fetchall()
         columns = [desc[0] for desc in cursor.description]
         return [dict(zip(columns, row)) for row in rows]
 
     @classmethod
-    def get_open_payments_by_user(cls, user_id: int) -> list[dict]:
+    def get_total_by_transaction(cls, transaction: str) -> dict:
         """
-        Retrieve all unpaid (open) payments for a specific user.
+        Sum the amounts of all payments that belong to a transaction.
 
         Args:
-            user_id (int): The ID of the user.
+            transaction (str): The transaction hash of the payments.
 
         Returns:
-            list[dict]: List of unpaid payments as dictionaries.
+            dict: The number of payments and the total, paid and outstanding
+                amount of the transaction.
         """
         cursor = cls.connection.cursor()
         cursor.execute("""
-            SELECT * FROM payments WHERE user_id = %s AND completed IS FALSE;
-        """, (user_id,))
+            SELECT COUNT(*),
+                   COALESCE(SUM(amount), 0),
+                   COALESCE(SUM(amount) FILTER (WHERE completed), 0),
+                   COALESCE(SUM(amount) FILTER (WHERE completed IS NOT TRUE), 0)
+            FROM payments
+            WHERE transaction = %s;
+        """, (transaction,))
+        row = cursor.fetchone()
+        return {
+            "count": row[0],
+            "total": row[1],
+            "paid": row[2],
+            "outstanding": row[3],
+        }
+
+    @classmethod
+    def iter_export_rows(cls, filters: PaymentFilter,
+                         chunk_size: int = EXPORT_CHUNK_SIZE
+                         ) -> Iterator[list[tuple]]:
+        """
+        Stream all payments that match the filters, ordered by date and id.
+
+        The rows are read through a server-side cursor on a dedicated
+        connection, so only one chunk is held in memory at a time and the
+        shared connection stays available for other requests.
+
+        Args:
+            filters (PaymentFilter): The filters of the export.
+            chunk_size (int): The number of payments per chunk.
+
+        Yields:
+            list[tuple]: The next chunk of payments, with the values in the
+                order of EXPORT_COLUMNS.
+        """
+        conditions, params = cls._filter_conditions(filters)
+        connection = get_connection()
+        try:
+            connection.set_session(readonly=True)
+            cursor = connection.cursor(name="payment_export")
+            cursor.itersize = chunk_size
+            cursor.execute(f"""
+                SELECT {", ".join(EXPORT_COLUMNS)}
+                FROM payments
+                WHERE {conditions}
+                ORDER BY date, id;
+            """, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            cursor.close()
+        finally:
+            connection.close()
+
+    @classmethod
+    def get_export_summary(cls, filters: PaymentFilter) -> list[dict]:
+        """
+        Retrieve the payment totals per parking lot, day, method and
+        completed state, computed by the database.
+
+        Args:
+            filters (PaymentFilter): The filters of the export.
+
+        Returns:
+            list[dict]: One row per group with the number of payments and
+                their total amount.
+        """
+        cursor = cls.connection.cursor()
+        conditions, params = cls._filter_conditions(filters)
+        cursor.execute(f"""
+            SELECT parking_lot_id,
+                   date::date AS day,
+                   method,
+                   completed,
+                   COUNT(*) AS payments,
+                   ROUND(SUM(amount)::numeric, 2)::float AS total_amount
+            FROM payments
+            WHERE {conditions}
+            GROUP BY parking_lot_id, day, method, completed
+            ORDER BY parking_lot_id, day, method, completed;
+        """, params)
         rows = cursor.fetchall()
         columns = [desc[0] for desc in cursor.description]
         return [dict(zip(columns, row)) for row in rows]
 
+    @staticmethod
+    def _filter_conditions(filters: PaymentFilter) -> tuple[str, list]:
+        """
+        Build the WHERE conditions for the filters of a payment listing.
+
+        Args:
+            filters (PaymentFilter): The filters to build conditions for.
+
+        Returns:
+            tuple[str, list]: The conditions and their parameters.
+        """
+        conditions = "TRUE"
+        params = []
+
+        if filters.user_id is not None:
+            conditions += " AND user_id = %s"
+            params.append(filters.user_id)
+
+        if filters.date_from is not None:
+            conditions += " AND date >= %s"
+            params.append(filters.date_from)
+
+        if filters.date_to is not None:
+            conditions += " AND date < %s"
+            params.append(filters.date_to)
+
+        if filters.completed is True:
+            conditions += " AND completed IS TRUE"
+        elif filters.completed is False:
+            conditions += " AND completed IS FALSE"
+
+        if filters.parking_lot_id is not None:
+            conditions += " AND parking_lot_id = %s"
+            params.append(filters.parking_lot_id)
+
+        if filters.min_amount is not None:
+            conditions += " AND amount >= %s"
+            params.append(filters.min_amount)
+
+        if filters.max_amount is not None:
+            conditions += " AND amount <= %s"
+            params.append(filters.max_amount)
+
+        return conditions, params
+
     @classmethod
     def update_payment(cls, payment_id: int, p) -> bool:
         """
@@ -159,6 +353,66 @@ class PaymentModel:
         cls.connection.commit()
         return updated is not None
 
+    @classmethod
+    def mark_payments_completed(cls, payment_ids: list[int],
+                                user_id: int | None) -> dict[int, str]:
+        """
+        Mark several payments as completed in one transaction.
+
+        The payments are checked with one locking query and the payable ones
+        are marked with one update, so checks and updates cannot interleave
+        with another settlement of the same payments.
+
+        Args:
+            payment_ids (list[int]): The IDs of the payments to mark as completed.
+            user_id (int | None): The ID of the paying user, or None for a guest.
+
+        Returns:
+            dict[int, str]: Per payment ID one of "paid", "not_found",
+                "forbidden" or "already_paid".
+        """
+        cursor = cls.connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT id, user_id, completed
+                FROM payments
+                WHERE id = ANY(%s)
+                FOR UPDATE;
+            """, (payment_ids,))
+            found = {row[0]: row for row in cursor.fetchall()}
+
+            results = {}
+            payable = []
+            for payment_id in payment_ids:
+                payment = found.get(payment_id)
+                if payment is None:
+                    results[payment_id] = "not_found"
+                elif payment[1] != user_id:
+                    results[payment_id] = "forbidden"
+                elif payment[2]:
+                    results[payment_id] = "already_paid"
+                else:
+                    payable.append(payment_id)
+
+            paid = set()
+            if payable:
+                cursor.execute("""
+                    UPDATE payments
+                    SET completed = TRUE
+                    WHERE id = ANY(%s)
+                    RETURNING id;
+                """, (payable,))
+                paid = {row[0] for row in cursor.fetchall()}
+            cls.connection.commit()
+        except psycopg2.DatabaseError as e:
+            logger.error("DB Error: %s", e)
+            cls.connection.rollback()
+            raise
+
+        for payment_id in payable:
+            results[payment_id] = "paid" if payment_id in paid else "not_found"
+        return {payment_id: results[payment_id] for payment_id in payment_ids}
+
     @classmethod
     def mark_refund_request(cls, payment_id: int) -> bool:
         """
@@ -186,7 +440,8 @@ class PaymentModel:
         cursor = cls.connection.cursor()
         cursor.execute("""
             UPDATE payments
-            SET refund_accepted = TRUE, admin_id = %s
+            SET refund_accepted = TRUE, admin_id = %s,
+                refund_claimed_by = NULL, refund_claimed_until = NULL
             WHERE id = %s
             RETURNING id;
         """, (user_id, id,))
@@ -194,6 +449,112 @@ class PaymentModel:
         cls.connection.commit()
         return updated is not None
 
+    @classmethod
+    def claim_refund_requests(cls, admin_id: int,
+                              batch_size: int) -> list[dict]:
+        """
+        Lease a batch of open refund requests to one admin.
+
+        The oldest requests that are not leased to another admin are locked
+        with SKIP LOCKED, so admins that claim at the same time each get a
+        different batch. A lease expires after REFUND_CLAIM_TIMEOUT seconds,
+        after which the requests can be claimed again.
+
+        Args:
+            admin_id (int): The ID of the admin claiming the requests.
+            batch_size (int): The maximum number of requests to claim.
+
+        Returns:
+            list[dict]: The claimed refund requests, ordered by date and id.
+        """
+        cursor = cls.connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE payments
+                SET refund_claimed_by = %s,
+                    refund_claimed_until = NOW() + %s * INTERVAL '1 second'
+                WHERE id IN (
+                    SELECT id FROM payments
+                    WHERE refund_requested = TRUE AND refund_accepted = FALSE
+                      AND (refund_claimed_until IS NULL
+                           OR refund_claimed_until < NOW()
+                           OR refund_claimed_by = %s)
+                    ORDER BY date, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *;
+            """, (admin_id, REFUND_CLAIM_TIMEOUT, admin_id, batch_size))
+            rows = cursor.fetchall()
+            cls.connection.commit()
+        except psycopg2.DatabaseError as e:
+            logger.error("DB Error: %s", e)
+            cls.connection.rollback()
+            raise
+        columns = [desc[0] for desc in cursor.description]
+        claimed = [dict(zip(columns, row)) for row in rows]
+        return sorted(claimed, key=lambda payment: (payment["date"], payment["id"]))
+
+    @classmethod
+    def approve_refunds(cls, payment_ids: list[int],
+                        admin_id: int) -> dict[int, str]:
+        """
+        Accept the refund requests of several payments in one transaction.
+
+        Args:
+            payment_ids (list[int]): The IDs of the payments to refund.
+            admin_id (int): The ID of the admin giving the refunds.
+
+        Returns:
+            dict[int, str]: Per payment ID one of "refunded", "not_found",
+                "not_requested", "already_refunded" or "claimed", the last
+                one when another admin holds an active lease on the request.
+        """
+        cursor = cls.connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT id, refund_requested, refund_accepted,
+                       refund_claimed_by IS NOT NULL
+                           AND refund_claimed_by <> %s
+                           AND refund_claimed_until > NOW()
+                FROM payments
+                WHERE id = ANY(%s)
+                FOR UPDATE;
+            """, (admin_id, payment_ids))
+            found = {row[0]: row for row in cursor.fetchall()}
+
+            results = {}
+            refundable = []
+            for payment_id in payment_ids:
+                payment = found.get(payment_id)
+                if payment is None:
+                    results[payment_id] = "not_found"
+                elif payment[2]:
+                    results[payment_id] = "already_refunded"
+                elif not payment[1]:
+                    results[payment_id] = "not_requested"
+                elif payment[3]:
+                    results[payment_id] = "claimed"
+                else:
+                    refundable.append(payment_id)
+
+            if refundable:
+                cursor.execute("""
+                    UPDATE payments
+                    SET refund_accepted = TRUE, admin_id = %s,
+                        refund_claimed_by = NULL, refund_claimed_until = NULL
+                    WHERE id = ANY(%s);
+                """, (admin_id, refundable))
+            cls.connection.commit()
+        except psycopg2.DatabaseError as e:
+            logger.error("DB Error: %s", e)
+            cls.connection.rollback()
+            raise
+
+        for payment_id in refundable:
+            results[payment_id] = "refunded"
+        return {payment_id: results[payment_id] for payment_id in payment_ids}
+
     @classmethod
     def get_refund_requests(cls, user_id: int | None = None):
         """
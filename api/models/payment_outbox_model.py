@@ -0,0 +1,232 @@
+"""
+This file contains all queries related to the payment outbox.
+
+Session stops and reservations add the payment they owe to the outbox in
+their own transaction. A background job turns the outbox rows into
+payments in batches. Rows whose payment cannot be created, for example
+because the reservation was deleted, are moved to payment_outbox_dead_letters.
+"""
+
+import logging
+import psycopg2
+from psycopg2.extras import execute_values
+from api.datatypes.payment import PaymentCreate
+from api.models.connection import get_connection
+from api.session_calculator import generate_payment_hash, generate_transaction_validation_hash
+
+logger = logging.getLogger(__name__)
+
+INSERT_PAYMENTS = """
+    INSERT INTO payments
+    (user_id, parking_lot_id, reservation_id, session_id,
+    transaction, amount, hash)
+    VALUES %s;
+"""
+
+
+def enqueue_payment(cursor, payment: PaymentCreate) -> None:
+    """
+    Add a payment to the outbox using the cursor of the caller.
+
+    Nothing is committed here, so the outbox row is committed or rolled
+    back together with the change that owes the payment.
+
+    Args:
+        cursor: A cursor on the connection of the caller's transaction.
+        payment (PaymentCreate): The payment to create.
+    """
+    cursor.execute("""
+        INSERT INTO payment_outbox
+        (user_id, parking_lot_id, session_id, reservation_id, amount)
+        VALUES (%s, %s, %s, %s, %s);
+    """, (payment.user_id, payment.parking_lot_id, payment.session_id,
+          payment.reservation_id, payment.amount))
+
+
+def enqueue_payments(cursor, payments: list[PaymentCreate]) -> None:
+    """
+    Add several payments to the outbox with one statement, using the cursor
+    of the caller. Nothing is committed here, see enqueue_payment().
+
+    Args:
+        cursor: A cursor on the connection of the caller's transaction.
+        payments (list[PaymentCreate]): The payments to create.
+    """
+    execute_values(
+        cursor,
+        """
+        INSERT INTO payment_outbox
+        (user_id, parking_lot_id, session_id, reservation_id, amount)
+        VALUES %s;
+    """,
+        [(payment.user_id, payment.parking_lot_id, payment.session_id,
+          payment.reservation_id, payment.amount) for payment in payments],
+        page_size=1000,
+    )
+
+
+class PaymentOutboxModel:
+    """
+    Handles turning outbox rows into payments.
+
+    Attributes:
+        connection (psycopg2.connection): PostgreSQL database connection.
+    """
+
+    def __init__(self):
+        """
+        Initialize a new PaymentOutboxModel instance and connect to the database.
+        """
+        self.connection = get_connection()
+
+    def add_to_pending_payment(self, reservation_id: int, amount: float) -> float | None:
+        """
+        Add an amount to the open payment of a reservation.
+
+        While the payment is still in the outbox the outbox row is updated,
+        otherwise the payment itself if it is not completed. If the outbox is
+        processing the row at the same time, the update waits for it and then
+        finds the payment.
+
+        Args:
+            reservation_id (int): The ID of the reservation.
+            amount (float): The amount to add.
+
+        Returns:
+            float | None: The new amount, or None if the reservation has no
+                open payment.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE payment_outbox
+                SET amount = amount + %s
+                WHERE id = (SELECT id FROM payment_outbox
+                            WHERE reservation_id = %s
+                            ORDER BY id LIMIT 1)
+                RETURNING amount;
+            """, (amount, reservation_id))
+            updated = cursor.fetchone()
+            if updated is None:
+                cursor.execute("""
+                    UPDATE payments
+                    SET amount = amount + %s
+                    WHERE id = (SELECT id FROM payments
+                                WHERE reservation_id = %s AND completed = FALSE
+                                ORDER BY id LIMIT 1)
+                    RETURNING amount;
+                """, (amount, reservation_id))
+                updated = cursor.fetchone()
+            self.connection.commit()
+        except psycopg2.DatabaseError as e:
+            logger.error("DB Error: %s", e)
+            self.connection.rollback()
+            raise
+        return updated[0] if updated else None
+
+    def process_batch(self, batch_size: int = 500) -> int:
+        """
+        Create the payments of one batch of outbox rows.
+
+        Rows are claimed with FOR UPDATE SKIP LOCKED, so several workers can
+        drain the outbox at the same time without creating a payment twice.
+        The payments are inserted with one statement and the processed rows
+        are removed in the same transaction. If that statement violates a
+        constraint, the rows are inserted one at a time and the failing rows
+        are moved to the dead letter table, so they cannot block the outbox.
+
+        Args:
+            batch_size (int): The maximum number of rows to process.
+
+        Returns:
+            int: The number of payments that were created.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT o.id, o.user_id, o.parking_lot_id, o.session_id,
+                       o.reservation_id, o.amount, v.license_plate
+                FROM payment_outbox o
+                LEFT JOIN sessions s ON s.id = o.session_id
+                LEFT JOIN reservations r ON r.id = o.reservation_id
+                LEFT JOIN vehicles v ON v.id = COALESCE(s.vehicle_id, r.vehicle_id)
+                ORDER BY o.id
+                LIMIT %s
+                FOR UPDATE OF o SKIP LOCKED;
+            """, (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                self.connection.rollback()
+                return 0
+
+            payments = []
+            for _, user_id, lot_id, session_id, reservation_id, amount, plate in rows:
+                source_id = session_id if session_id is not None else reservation_id
+                payments.append((
+                    user_id, lot_id, reservation_id, session_id,
+                    generate_payment_hash(str(source_id), plate or ""),
+                    amount, generate_transaction_validation_hash(),
+                ))
+
+            outbox_ids = [row[0] for row in rows]
+            cursor.execute("SAVEPOINT outbox_batch;")
+            try:
+                execute_values(cursor, INSERT_PAYMENTS, payments, page_size=batch_size)
+                created = len(rows)
+            except psycopg2.IntegrityError:
+                cursor.execute("ROLLBACK TO SAVEPOINT outbox_batch;")
+                created = self._insert_separately(cursor, outbox_ids, payments)
+            cursor.execute("DELETE FROM payment_outbox WHERE id = ANY(%s);",
+                           (outbox_ids,))
+            self.connection.commit()
+            return created
+        except psycopg2.DatabaseError as e:
+            logger.error("DB Error: %s", e)
+            self.connection.rollback()
+            raise
+
+    def _insert_separately(self, cursor, outbox_ids: list[int], payments: list[tuple]) -> int:
+        """
+        Insert the payments one at a time and move the outbox rows whose
+        payment fails to the dead letter table.
+
+        Returns:
+            int: The number of payments that were created.
+        """
+        created = 0
+        for outbox_id, payment in zip(outbox_ids, payments):
+            cursor.execute("SAVEPOINT outbox_row;")
+            try:
+                execute_values(cursor, INSERT_PAYMENTS, [payment])
+                created += 1
+            except psycopg2.IntegrityError as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT outbox_row;")
+                logger.error("Outbox row %s moved to dead letters: %s", outbox_id, e)
+                cursor.execute("""
+                    INSERT INTO payment_outbox_dead_letters
+                    (id, user_id, parking_lot_id, session_id, reservation_id,
+                    amount, created_at, error)
+                    SELECT id, user_id, parking_lot_id, session_id, reservation_id,
+                           amount, created_at, %s
+                    FROM payment_outbox WHERE id = %s;
+                """, (str(e), outbox_id))
+        return created
+
+    def drain(self, batch_size: int = 500, max_batches: int = 20) -> int:
+        """
+        Process batches until the outbox is empty or max_batches is reached.
+
+        Args:
+            batch_size (int): The maximum number of rows per batch.
+            max_batches (int): The maximum number of batches to process.
+
+        Returns:
+            int: The number of payments that were created.
+        """
+        created = 0
+        for _ in range(max_batches):
+            processed = self.process_batch(batch_size)
+            created += processed
+            if processed < batch_size:
+                break
+        return created
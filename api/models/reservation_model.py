@@ -1,12 +1,29 @@
 import psycopg2
+from datetime import datetime
+from typing import List, Tuple
 
+from api.datatypes.payment import PaymentCreate
 from api.datatypes.reservation import ReservationCreate, Reservation
+from api.models.availability_model import (book_slots, book_windows,
+                                           invalidate_availability, release_slots)
 from api.models.connection import get_connection
+from api.models.parking_lot_model import ParkingLotFullError
+from api.models.payment_outbox_model import enqueue_payment, enqueue_payments
 import psycopg2.extras
+from psycopg2.extras import execute_values
 
 
 # eventually the database queries / JSON write/read will be here.
 
+class ReservationOverlapError(Exception):
+    """
+    Raised when a reservation overlaps another reservation of the same vehicle.
+    """
+    def __init__(self, vehicle_id: int):
+        super().__init__(f"Vehicle {vehicle_id} already has a reservation in this period")
+        self.vehicle_id = vehicle_id
+
+
 class ReservationModel:
     def __init__(self):
         self.connection = psycopg2.connect(
@@ -36,23 +53,161 @@ class ReservationModel:
         cursor.execute("SELECT * FROM reservations WHERE id = %s", (reservation_id,))
         return cursor.fetchone()
 
-    def create_reservation(self, reservation: ReservationCreate):
+    def create_reservation(self, reservation: ReservationCreate, cost: float):
         """
         Create a new reservation in the database.
 
+        The slots of the reservation are booked and the payment for the
+        reservation is added to the payment outbox in the same transaction.
+
         Args:
             reservation (ReservationCreate): The reservation data to insert.
+            cost (float): The price of the reservation.
 
         Returns:
             int: The newly created reservation.
+
+        Raises:
+            ReservationOverlapError: If the vehicle already has a reservation
+                that overlaps this one.
+            ParkingLotFullError: If the parking lot is fully booked during
+                any part of the reservation.
         """
         cursor = self.connection.cursor()
-        cursor.execute("""
-            INSERT INTO reservations (vehicle_id, user_id, parking_lot_id, start_time, end_time, cost)
-            VALUES (%s, %s, %s, %s, %s, %s) RETURNING id;
-        """, (reservation.vehicle_id, user_id, reservation.parking_lot_id, reservation.start_time, reservation.end_time, cost))
-        self.connection.commit()
-        return cursor.fetchone()[0]
+        try:
+            if reservation.end_time is not None:
+                book_slots(cursor, reservation.parking_lot_id,
+                           reservation.start_time, reservation.end_time)
+            cursor.execute("""
+                INSERT INTO reservations (vehicle_id, user_id, parking_lot_id, start_time, end_time, cost)
+                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id;
+            """, (reservation.vehicle_id, reservation.user_id, reservation.parking_lot_id,
+                  reservation.start_time, reservation.end_time, cost))
+            reservation_id = cursor.fetchone()[0]
+            enqueue_payment(cursor, PaymentCreate(
+                parking_lot_id=reservation.parking_lot_id,
+                user_id=reservation.user_id,
+                amount=cost,
+                reservation_id=reservation_id,
+            ))
+            self.connection.commit()
+            invalidate_availability(reservation.parking_lot_id)
+        except psycopg2.errors.ExclusionViolation:
+            self.connection.rollback()
+            raise ReservationOverlapError(reservation.vehicle_id)
+        except (psycopg2.DatabaseError, ParkingLotFullError):
+            self.connection.rollback()
+            raise
+        return reservation_id
+
+    def create_reservations(self, user_id: int, vehicle_id: int, parking_lot_id: int,
+                            windows: List[Tuple[datetime, datetime]],
+                            costs: List[float]) -> List[int]:
+        """
+        Create several reservations of one vehicle in one transaction.
+
+        The slots of all reservations are booked at once, and the reservations
+        and their payments are each inserted with one batched statement.
+
+        Args:
+            user_id (int): The ID of the user making the reservations.
+            vehicle_id (int): The ID of the vehicle.
+            parking_lot_id (int): The ID of the parking lot.
+            windows (list[tuple[datetime, datetime]]): The start and end of every
+                reservation, ordered by start. The windows must not overlap
+                each other.
+            costs (list[float]): The price of every reservation.
+
+        Returns:
+            list[int]: The IDs of the reservations, in the order of the windows.
+
+        Raises:
+            ReservationOverlapError: If a reservation overlaps an existing
+                reservation of the vehicle.
+            ParkingLotFullError: If the parking lot is fully booked during
+                any part of the reservations.
+        """
+        cursor = self.connection.cursor()
+        try:
+            book_windows(cursor, parking_lot_id, windows)
+            rows = execute_values(cursor, """
+                INSERT INTO reservations (vehicle_id, user_id, parking_lot_id, start_time, end_time, cost)
+                VALUES %s RETURNING id, start_time;
+            """, [(vehicle_id, user_id, parking_lot_id, start, end, cost)
+                  for (start, end), cost in zip(windows, costs)],
+                page_size=1000, fetch=True)
+            reservation_ids = [row[0] for row in sorted(rows, key=lambda row: row[1])]
+            enqueue_payments(cursor, [
+                PaymentCreate(parking_lot_id=parking_lot_id, user_id=user_id,
+                              amount=cost, reservation_id=reservation_id)
+                for reservation_id, cost in zip(reservation_ids, costs)
+            ])
+            self.connection.commit()
+            invalidate_availability(parking_lot_id)
+        except psycopg2.errors.ExclusionViolation:
+            self.connection.rollback()
+            raise ReservationOverlapError(vehicle_id)
+        except (psycopg2.DatabaseError, ParkingLotFullError):
+            self.connection.rollback()
+            raise
+        return reservation_ids
+
+    def get_overlapping_windows(self, vehicle_id: int,
+                                windows: List[Tuple[datetime, datetime]]
+                                ) -> List[Tuple[datetime, datetime]]:
+        """
+        Find the windows that overlap an existing reservation of a vehicle,
+        checking all windows with one query.
+
+        Args:
+            vehicle_id (int): The ID of the vehicle.
+            windows (list[tuple[datetime, datetime]]): The windows to check.
+
+        Returns:
+            list[tuple[datetime, datetime]]: The windows that overlap.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT w.start_time, w.end_time
+                FROM unnest(%s::timestamp[], %s::timestamp[]) AS w(start_time, end_time)
+                WHERE EXISTS (
+                    SELECT 1 FROM reservations r
+                    WHERE r.vehicle_id = %s
+                      AND r.start_time < r.end_time
+                      AND r.status IS DISTINCT FROM 'No Show'
+                      AND tsrange(r.start_time, r.end_time) && tsrange(w.start_time, w.end_time)
+                )
+                ORDER BY w.start_time;
+            """, ([start for start, _ in windows], [end for _, end in windows], vehicle_id))
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def has_overlapping_reservation(self, vehicle_id: int,
+                                    start_time: datetime, end_time: datetime) -> bool:
+        """
+        Check whether a vehicle already has a reservation that overlaps a period.
+
+        The query matches the reservations_vehicle_no_overlap exclusion constraint,
+        so it is answered from its GiST index instead of the reservation history.
+
+        Args:
+            vehicle_id (int): The ID of the vehicle.
+            start_time (datetime): The start of the period.
+            end_time (datetime): The end of the period.
+
+        Returns:
+            bool: True if an overlapping reservation exists, otherwise False.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM reservations
+                    WHERE vehicle_id = %s
+                      AND start_time < end_time
+                      AND status IS DISTINCT FROM 'No Show'
+                      AND tsrange(start_time, end_time) && tsrange(%s, %s)
+                );
+            """, (vehicle_id, start_time, end_time))
+            return cursor.fetchone()[0]
 
     def get_reservations_by_vehicle(self, vehicle_id):
         """
@@ -69,9 +224,31 @@ class ReservationModel:
             return cursor.fetchall()
 
     def delete_reservation(self, reservation_id: int) -> bool:
+        """
+        Delete a reservation, its payment that is still in the outbox and
+        its booked slots in one transaction.
+
+        Args:
+            reservation_id (int): The ID of the reservation to delete.
+
+        Returns:
+            bool: True if the reservation was deleted, otherwise False.
+        """
         cursor = self.connection.cursor()
-        cursor.execute(
-            "DELETE FROM reservations WHERE id = %s RETURNING id;", (reservation_id,))
-        deleted = cursor.fetchone()
-        self.connection.commit()
-        return deleted is not None
\ No newline at end of file
+        try:
+            cursor.execute("DELETE FROM payment_outbox WHERE reservation_id = %s;",
+                           (reservation_id,))
+            cursor.execute("""
+                DELETE FROM reservations WHERE id = %s
+                RETURNING parking_lot_id, start_time, end_time;
+            """, (reservation_id,))
+            deleted = cursor.fetchone()
+            if deleted and deleted[0] is not None and deleted[2] is not None:
+                release_slots(cursor, deleted[0], deleted[1], deleted[2])
+            self.connection.commit()
+            if deleted:
+                invalidate_availability(deleted[0])
+        except psycopg2.DatabaseError:
+            self.connection.rollback()
+            raise
+        return deleted is not None
@@ -0,0 +1,148 @@
+"""
+This file contains all queries of the background job that expires reservations.
+
+Reservations of which no session was started within the grace period after
+their start are marked as no-show, and the capacity they still hold is
+released. Afterwards the reserved counter of every parking lot is recomputed
+from the reservations.
+"""
+
+import logging
+from collections import defaultdict
+import psycopg2
+from api.models.availability_model import invalidate_availability, release_windows
+from api.models.connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Statuses of reservations that still hold a spot. New reservations start as
+# 'Payment Pending', imported reservations use 'active'.
+OPEN_STATUSES = ["Payment Pending", "active"]
+NO_SHOW_STATUS = "No Show"
+
+# Key of the advisory lock that makes sure only one API worker sweeps at a time
+SWEEP_LOCK_KEY = 4_210_042
+
+
+class ReservationSweepModel:
+    """
+    Handles expiring no-show reservations and reconciling the reserved counters.
+
+    Attributes:
+        connection (psycopg2.connection): PostgreSQL database connection.
+    """
+
+    def __init__(self):
+        """
+        Initialize a new ReservationSweepModel instance and connect to the database.
+        """
+        self.connection = get_connection()
+
+    def try_lock(self) -> bool:
+        """
+        Take the sweep lock for this connection, without waiting.
+
+        Returns:
+            bool: True if the lock was taken, False if another worker holds it.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(%s);", (SWEEP_LOCK_KEY,))
+        locked = cursor.fetchone()[0]
+        self.connection.commit()
+        return locked
+
+    def unlock(self) -> None:
+        """
+        Release the sweep lock taken with try_lock().
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT pg_advisory_unlock(%s);", (SWEEP_LOCK_KEY,))
+        self.connection.commit()
+
+    def expire_no_shows(self, batch_size: int, grace_minutes: int) -> int:
+        """
+        Mark one batch of no-show reservations and release the capacity they
+        still hold, in one transaction.
+
+        Reservations locked by another transaction are skipped and picked up
+        by the next batch or run.
+
+        Args:
+            batch_size (int): The maximum number of reservations to expire.
+            grace_minutes (int): The number of minutes after the start of a
+                reservation in which a session must have been started.
+
+        Returns:
+            int: The number of expired reservations.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                WITH due AS (
+                    SELECT r.id
+                    FROM reservations r
+                    WHERE r.status = ANY(%s)
+                      AND r.start_time < NOW() - %s * INTERVAL '1 minute'
+                      AND NOT EXISTS (
+                          SELECT 1 FROM sessions s WHERE s.reservation_id = r.id
+                      )
+                    ORDER BY r.start_time, r.id
+                    LIMIT %s
+                    FOR UPDATE OF r SKIP LOCKED
+                )
+                UPDATE reservations r
+                SET status = %s
+                FROM due
+                WHERE r.id = due.id
+                RETURNING r.parking_lot_id,
+                          GREATEST(r.start_time, NOW()::timestamp),
+                          r.end_time;
+            """, (OPEN_STATUSES, grace_minutes, batch_size, NO_SHOW_STATUS))
+            rows = cursor.fetchall()
+
+            windows_per_lot = defaultdict(list)
+            for lot_id, release_from, end_time in rows:
+                if lot_id is not None and end_time is not None and release_from < end_time:
+                    windows_per_lot[lot_id].append((release_from, end_time))
+            for lot_id in sorted(windows_per_lot):
+                release_windows(cursor, lot_id, windows_per_lot[lot_id])
+            self.connection.commit()
+        except psycopg2.DatabaseError as e:
+            logger.error("DB Error: %s", e)
+            self.connection.rollback()
+            raise
+
+        for lot_id in windows_per_lot:
+            invalidate_availability(lot_id)
+        return len(rows)
+
+    def reconcile_reserved(self) -> int:
+        """
+        Recompute the reserved counter of every parking lot in one grouped
+        update. A spot counts as reserved while an open reservation is in
+        its window and its session has not been started yet.
+
+        Returns:
+            int: The number of parking lots whose counter was corrected.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            UPDATE parking_lots p
+            SET reserved = counts.reserved
+            FROM (
+                SELECT l.id, COUNT(r.id) AS reserved
+                FROM parking_lots l
+                LEFT JOIN reservations r
+                    ON r.parking_lot_id = l.id
+                   AND r.status = ANY(%s)
+                   AND r.start_time <= NOW()
+                   AND r.end_time > NOW()
+                   AND NOT EXISTS (
+                       SELECT 1 FROM sessions s WHERE s.reservation_id = r.id
+                   )
+                GROUP BY l.id
+            ) counts
+            WHERE p.id = counts.id AND p.reserved IS DISTINCT FROM counts.reserved;
+        """, (OPEN_STATUSES,))
+        self.connection.commit()
+        return cursor.rowcount
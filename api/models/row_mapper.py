@@ -0,0 +1,195 @@
+"""
+This file contains the shared mapper that turns database rows into datatype objects.
+"""
+
+import logging
+import os
+from enum import Enum
+from operator import itemgetter
+from typing import Generic, List, Optional, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+STRICT_BY_DEFAULT = os.getenv("STRICT_ROW_MAPPING", "false").lower() == "true"
+
+_IMMUTABLE = (type(None), bool, int, float, str, bytes, Enum)
+_new = object.__new__
+_setattr = object.__setattr__
+
+
+class RowMapper(Generic[T]):
+    """
+    Maps rows of a psycopg2 cursor to pydantic objects.
+
+    Rows coming from our own database are trusted by default and are built
+    the way model_construct builds objects, without validation. The column
+    layout of every cursor description, including the defaults of fields
+    that were not selected, is computed once and cached, so mapping a row
+    only costs a tuple lookup and filling in the instance.
+
+    Strict mode validates every row with model_validate and skips rows
+    that fail, which is useful when debugging schema changes.
+
+    Attributes:
+        model (Type[BaseModel]): The datatype rows are mapped to.
+        strict (bool): Whether rows are validated instead of trusted.
+    """
+
+    def __init__(self, model: Type[T], strict: Optional[bool] = None):
+        """
+        Initialize a new RowMapper for a datatype.
+
+        Args:
+            model (Type[BaseModel]): The datatype rows are mapped to.
+            strict (bool | None): Validate every row. Defaults to the
+                STRICT_ROW_MAPPING environment variable.
+        """
+        self.model = model
+        self.strict = STRICT_BY_DEFAULT if strict is None else strict
+        self._layouts = {}
+        self._enum_fields = {
+            name: field.annotation
+            for name, field in model.model_fields.items()
+            if isinstance(field.annotation, type)
+            and issubclass(field.annotation, Enum)
+        }
+
+    def map_rows(self, cursor, strict: Optional[bool] = None) -> List[T]:
+        """
+        Map all remaining rows of the cursor.
+
+        Args:
+            cursor: The database cursor after executing a query.
+            strict (bool | None): Overrides the strict setting of the mapper.
+
+        Returns:
+            list[BaseModel]: List of mapped objects.
+        """
+        if cursor.description is None:
+            return []
+        rows = cursor.fetchall()
+        if self.strict if strict is None else strict:
+            return self._validate_rows(cursor.description, rows)
+        names, getter, defaults, factories, fields_set = self._layout(cursor.description)
+        model = self.model
+        convert_enums = bool(self._enum_fields)
+        mapped = []
+        for row in rows:
+            values = dict(zip(names, getter(row)))
+            if defaults:
+                values = {**defaults, **values}
+            for name, field in factories:
+                values[name] = field.get_default(call_default_factory=True)
+            if convert_enums:
+                try:
+                    self._convert_enums(values)
+                except ValueError as e:
+                    logger.warning("Failed to map row to %s: %s %s",
+                                   model.__name__, values, e)
+                    continue
+            instance = _new(model)
+            _setattr(instance, "__dict__", values)
+            _setattr(instance, "__pydantic_fields_set__", set(fields_set))
+            _setattr(instance, "__pydantic_extra__", None)
+            _setattr(instance, "__pydantic_private__", None)
+            mapped.append(instance)
+        return mapped
+
+    def map_one(self, cursor, strict: Optional[bool] = None) -> Optional[T]:
+        """
+        Map the first row of the cursor.
+
+        Args:
+            cursor: The database cursor after executing a query.
+            strict (bool | None): Overrides the strict setting of the mapper.
+
+        Returns:
+            BaseModel | None: The mapped object, or None if there is no row.
+        """
+        mapped = self.map_rows(cursor, strict)
+        return mapped[0] if mapped else None
+
+    def _layout(self, description) -> tuple:
+        """
+        Return the cached layout for a cursor description.
+
+        The layout holds the names of the columns that are fields of the
+        datatype, a getter that picks those columns out of a row, and the
+        defaults of the fields the query did not select.
+
+        Args:
+            description: The description of the cursor.
+
+        Returns:
+            tuple: The field names, row getter, static defaults,
+                fields with copied defaults and the set of selected fields.
+        """
+        columns = tuple(desc[0] for desc in description)
+        layout = self._layouts.get(columns)
+        if layout is None:
+            fields = self.model.model_fields
+            indices = [i for i, column in enumerate(columns) if column in fields]
+            names = tuple(columns[i] for i in indices)
+            if len(indices) == 1:
+                index = indices[0]
+                getter = lambda row: (row[index],)
+            elif indices:
+                getter = itemgetter(*indices)
+            else:
+                getter = lambda row: ()
+            defaults = {}
+            factories = []
+            for name, field in fields.items():
+                if name in names or field.is_required():
+                    continue
+                if field.default_factory is None and isinstance(field.default, _IMMUTABLE):
+                    defaults[name] = field.default
+                else:
+                    factories.append((name, field))
+            layout = (names, getter, defaults, factories, frozenset(names))
+            self._layouts[columns] = layout
+        return layout
+
+    def _convert_enums(self, values: dict) -> dict:
+        """
+        Convert raw database values of enum fields to their enum members.
+
+        Args:
+            values (dict): The field values of one row.
+
+        Returns:
+            dict: The same values with enum fields converted.
+
+        Raises:
+            ValueError: If a value is not a member of its enum.
+        """
+        for name, enum in self._enum_fields.items():
+            value = values.get(name)
+            if value is not None and not isinstance(value, enum):
+                values[name] = enum(value)
+        return values
+
+    def _validate_rows(self, description, rows) -> List[T]:
+        """
+        Validate every row with the datatype, skipping invalid rows.
+
+        Args:
+            description: The description of the cursor.
+            rows: The rows fetched from the cursor.
+
+        Returns:
+            list[BaseModel]: List of validated objects.
+        """
+        columns = [desc[0] for desc in description]
+        mapped = []
+        for row in rows:
+            row_dict = dict(zip(columns, row))
+            try:
+                mapped.append(self.model.model_validate(row_dict))
+            except ValidationError as e:
+                logger.warning("Failed to map row to %s: %s %s",
+                               self.model.__name__, row_dict, e)
+        return mapped
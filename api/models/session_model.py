@@ -1,6 +1,12 @@
 import psycopg2
 from datetime import datetime
-from api.datatypes.session import Session
+from api.datatypes.payment import PaymentCreate
+from api.datatypes.session import Session, SessionFilter
+from api.models.parking_lot_model import ParkingLotFullError
+from api.models.payment_outbox_model import enqueue_payment
+from api.models.row_mapper import RowMapper
+
+session_mapper: RowMapper[Session] = RowMapper(Session)
 
 
 class SessionModel:
@@ -25,29 +31,54 @@ class SessionModel:
             print("Vehicle already has an active session.")
             return None
 
+        # Bezetting ophogen en sessie aanmaken in dezelfde statement, zodat
+        # twee gelijktijdige starts nooit samen de capaciteit overschrijden.
+        # Een parkeerplaats zonder capaciteit heeft geen limiet.
         cursor.execute("""
+            WITH lot AS (
+                UPDATE parking_lots
+                SET occupied = occupied + 1
+                WHERE id = %s AND (capacity IS NULL OR occupied < capacity)
+                RETURNING id
+            )
             INSERT INTO sessions (parking_lot_id, user_id, vehicle_id, reservation_id)
-            VALUES (%s, %s, %s, %s)
+            SELECT id, %s, %s, %s FROM lot
             RETURNING *;
         """, (parking_lot_id, user_id, vehicle_id, reservation_id))
 
+        session = self.map_to_session(cursor)
+        if not session:
+            self.connection.rollback()
+            raise ParkingLotFullError(parking_lot_id)
+
         self.connection.commit()
-        return self.map_to_session(cursor)[0]
+        return session[0]
 
-    # Sessie stoppen (wanneer voertuig vertrekt)
-    def stop_session(self, session: Session, cost: float) -> Session:
+    # Sessie stoppen (wanneer voertuig vertrekt). Een meegegeven betaling
+    # komt in dezelfde transactie in de outbox terecht.
+    def stop_session(self, session: Session, cost: float,
+                     payment: PaymentCreate | None = None) -> Session:
         end_time = datetime.now()
         cursor = self.connection.cursor()
         cursor.execute("""
-            UPDATE sessions
-            SET end_time = %s,
-                cost = %s
-            WHERE id = %s
-            RETURNING *;
+            WITH stopped AS (
+                UPDATE sessions
+                SET end_time = %s,
+                    cost = %s
+                WHERE id = %s AND end_time IS NULL
+                RETURNING *
+            ), lot AS (
+                UPDATE parking_lots
+                SET occupied = GREATEST(occupied - 1, 0)
+                WHERE id = (SELECT parking_lot_id FROM stopped)
+            )
+            SELECT * FROM stopped;
         """, (end_time, cost, session.id,))
 
-        self.connection.commit()
         session_list = self.map_to_session(cursor)
+        if session_list and payment is not None:
+            enqueue_payment(cursor, payment)
+        self.connection.commit()
         return session_list[0] if session_list else None
 
     # Alle sessies ophalen
@@ -56,14 +87,51 @@ class SessionModel:
         cursor.execute("SELECT * FROM sessions;")
         return self.map_to_session(cursor)
 
-    # Alleen actieve sessies ophalen
-    def get_active_sessions(self) -> list[Session]:
+    # Sessies ophalen per pagina, gesorteerd op (start_time, id)
+    def find_sessions(self, filters: SessionFilter) -> list[Session]:
+        """
+        Retrieve one page of sessions, ordered by start time and id.
+
+        The page starts after the (start_time, id) key in filters.after, so
+        the query walks the (parking_lot_id, start_time) index instead of
+        skipping rows with OFFSET. One row more than the limit is fetched so
+        the caller can tell whether there is a next page.
+
+        Args:
+            filters (SessionFilter): The filters and the position of the page.
+
+        Returns:
+            list[Session]: At most filters.limit + 1 sessions.
+        """
         cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM sessions WHERE end_time IS NULL;")
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        result = [dict(zip(columns, row)) for row in rows]
-        return result
+
+        query = "SELECT * FROM sessions WHERE 1=1"
+        params = []
+
+        if filters.parking_lot_id is not None:
+            query += " AND parking_lot_id = %s"
+            params.append(filters.parking_lot_id)
+
+        if filters.start_from is not None:
+            query += " AND start_time >= %s"
+            params.append(filters.start_from)
+
+        if filters.start_to is not None:
+            query += " AND start_time < %s"
+            params.append(filters.start_to)
+
+        if filters.active_only:
+            query += " AND end_time IS NULL"
+
+        if filters.after is not None:
+            query += " AND (start_time, id) > (%s, %s)"
+            params.extend(filters.after)
+
+        query += " ORDER BY start_time, id LIMIT %s;"
+        params.append(filters.limit + 1)
+
+        cursor.execute(query, params)
+        return self.map_to_session(cursor)
 
     # Sessie zoeken op ID
     def get_session_by_id(self, session_id: int) -> Session | None:
@@ -91,23 +159,8 @@ class SessionModel:
         cursor = self.connection.cursor()
         cursor.execute(
             "SELECT * FROM sessions WHERE reservation_id = %s AND end_time IS NULL;", (reservation_id,))
-        rows = cursor.fetchall()
-        if not rows:
-            return None
-        columns = [desc[0] for desc in cursor.description]
-        data = dict(zip(columns, rows[0]))
-        return Session(**data)
+        return session_mapper.map_one(cursor)
 
     # Helperfunctie om DB-rijen om te zetten naar Session objecten
     def map_to_session(self, cursor) -> list[Session]:
-        columns = [desc[0] for desc in cursor.description]
-        sessions = []
-        for row in cursor.fetchall():
-            print(row)
-            row_dict = dict(zip(columns, row))
-            try:
-                # aliases are respected
-                sessions.append(Session.parse_obj(row_dict))
-            except Exception as e:
-                print("Failed to map row to Session:", row_dict, e)
-        return sessions
+        return session_mapper.map_rows(cursor)
@@ -2,9 +2,11 @@
 This file contains all queries related to users.
 """
 
-from pydantic_core import ValidationError
 from api.datatypes.user import UserCreate, User, UserLogin
 from api.models.connection import get_connection
+from api.models.row_mapper import RowMapper
+
+user_mapper: RowMapper[User] = RowMapper(User)
 
 
 class UserModel:
@@ -165,16 +167,7 @@ class UserModel:
         Returns:
             list[User]: List of User objects.
         """
-        columns = [desc[0] for desc in cursor.description]
-        users = []
-        for row in cursor.fetchall():
-            row_dict = dict(zip(columns, row))
-            try:
-                user = User.parse_obj(row_dict)
-                users.append(user)
-            except ValidationError as e:
-                print("Failed to map row to User:", row_dict, e)
-        return users
+        return user_mapper.map_rows(cursor)
 
     def get_parking_lots_for_admin(self, user_id: int) -> list[int]:
         """
@@ -3,6 +3,7 @@ from hashlib import md5
 import math
 import uuid
 from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
 
 
 def calculate_price(parking_lot, session, discount_code):
@@ -32,19 +33,100 @@ def calculate_price(parking_lot, session, discount_code):
     return price
 
 
+def calculate_prices(starts, ends, tariffs, daytariffs):
+    """
+    Vectorized version of calculate_price without discount codes.
+
+    Computes the price of many sessions at once, giving the same result as
+    calculate_price for every session, including its rounding.
+
+    Args:
+        starts: The start times of the sessions.
+        ends: The end times of the sessions.
+        tariffs: The hourly tariff per session, or one tariff for all sessions.
+        daytariffs: The day tariff per session, or one day tariff for all sessions.
+
+    Returns:
+        np.ndarray: The price of every session, rounded to cents.
+    """
+    start = np.asarray(starts, dtype="datetime64[us]")
+    end = np.asarray(ends, dtype="datetime64[us]")
+    tariff = np.asarray(tariffs, dtype=np.float64)
+    daytariff = np.asarray(daytariffs, dtype=np.float64)
+
+    micros = (end - start).astype(np.int64)
+    seconds = micros / 1e6
+    hours = np.ceil(seconds / 3600)
+    days = np.floor_divide(micros, 86_400_000_000)
+
+    hourly = np.minimum(tariff * hours, daytariff)
+    daily = daytariff * (days + 1)
+    multi_day = end.astype("datetime64[D]") > start.astype("datetime64[D]")
+
+    price = np.where(seconds < 180, 0.0, np.where(multi_day, daily, hourly))
+    price = np.maximum(price, 0.0)
+
+    cents = price * 100
+    rounded = np.floor(cents + 0.5) / 100
+    # Prices close to half a cent depend on the decimal representation of
+    # the float, so those few are rounded the same way calculate_price does
+    ties = np.abs(cents - np.floor(cents) - 0.5) < 1e-6
+    for i in np.flatnonzero(ties):
+        rounded[i] = float(Decimal(str(float(price[i]))).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP))
+    return rounded
+
+
+def simulate_revenue(chunks, tariff, daytariff, new_tariff, new_daytariff):
+    """
+    Replays sessions with the current and with new tariffs and totals the
+    revenue per day on which the sessions ended.
+
+    Args:
+        chunks: Iterable of (starts, ends) datetime64 arrays.
+        tariff (float): The current hourly tariff.
+        daytariff (float): The current day tariff.
+        new_tariff (float): The simulated hourly tariff.
+        new_daytariff (float): The simulated day tariff.
+
+    Returns:
+        list[dict]: Per day the number of sessions, the current revenue and
+            the projected revenue, ordered by day.
+    """
+    totals = {}
+    for starts, ends in chunks:
+        current = calculate_prices(starts, ends, tariff, daytariff)
+        projected = calculate_prices(starts, ends, new_tariff, new_daytariff)
+
+        days, inverse = np.unique(
+            np.asarray(ends, dtype="datetime64[D]"), return_inverse=True
+        )
+        counts = np.bincount(inverse, minlength=len(days))
+        current_sums = np.bincount(inverse, weights=current, minlength=len(days))
+        projected_sums = np.bincount(inverse, weights=projected, minlength=len(days))
+
+        for day, count, current_sum, projected_sum in zip(
+            days.tolist(), counts.tolist(), current_sums.tolist(), projected_sums.tolist()
+        ):
+            total = totals.setdefault(day, [0, 0.0, 0.0])
+            total[0] += count
+            total[1] += current_sum
+            total[2] += projected_sum
+
+    return [
+        {
+            "date": day,
+            "sessions": count,
+            "current_revenue": round(current_sum, 2),
+            "projected_revenue": round(projected_sum, 2),
+        }
+        for day, (count, current_sum, projected_sum) in sorted(totals.items())
+    ]
+
+
 def generate_payment_hash(sid, licenseplate):
     return md5(str(sid + licenseplate).encode("utf-8")).hexdigest()
 
 
 def generate_transaction_validation_hash():
     return str(uuid.uuid4())
-
-
-# def check_payment_amount(hash):
-#     payments = load_payment_data()
-#     total = 0
-
-#     for payment in payments:
-#         if payment["transaction"] == hash:
-#             total += payment["amount"]
-#     return total
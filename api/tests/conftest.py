@@ -9,6 +9,7 @@ from fastapi.testclient import TestClient
 from api.main import app
 from api.auth_utils import create_access_token
 from api.models.user_model import UserModel
+from api.utilities.pagination import MAX_PAGE_SIZE
 
 PYTEST_PLUGINS = "pytest_benchmark"
 user_model: UserModel = UserModel()
@@ -334,6 +335,7 @@ def get_last_pid(client):
 def get_last_payment_id(client_with_token):
     """
     Returns the ID of the last payment for superadmin.
+    /payments/me is paginated, so every page is read.
     
     Args:
         client_with_token: Fixture that returns a client with JWT headers.
@@ -342,10 +344,15 @@ def get_last_payment_id(client_with_token):
         int: ID of the last payment.
     """
     client, headers = client_with_token("superadmin")
-    response = client.get("/payments/me", headers=headers)
-    data = response.json()
-    print(data)
-    return data[-1]["id"]
+    params = {"limit": MAX_PAGE_SIZE}
+    payment_ids = []
+    while True:
+        response = client.get("/payments/me", headers=headers, params=params)
+        payment_ids.extend(payment["id"] for payment in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            return max(payment_ids)
+        params["cursor"] = next_cursor
 
 
 def get_last_uid(client_with_token):
@@ -178,3 +178,67 @@ def test_create_discount_code_invalid_start_with_end_date(client_with_token):
     }
     response = client.post("/discount-codes", json=fake_code, headers=headers)
     assert response.status_code == 400
+
+
+# post discount-codes/campaigns
+def test_create_discount_campaign(client_with_token):
+    client, headers = client_with_token("superadmin")
+    campaign = {
+        "prefix": "SPRING-",
+        "count": 25,
+        "discount_type": "fixed",
+        "discount_value": 2.5,
+        "locations": ["Industrial Zone", "Event Center"]
+    }
+    response = client.post("/discount-codes/campaigns", json=campaign,
+                           headers=headers)
+    assert response.status_code == 201
+    lines = response.text.splitlines()
+    assert lines[0] == "code"
+    codes = lines[1:]
+    assert len(set(codes)) == 25
+    assert all(code.startswith("SPRING-") for code in codes)
+
+    response = client.get(f"/discount-codes/{codes[0]}", headers=headers)
+    assert response.json()["discount_code"]["use_amount"] == 1
+    assert sorted(response.json()["discount_code"]["locations"]) == [
+        "Event Center", "Industrial Zone"]
+
+
+def test_create_discount_campaign_invalid_count(client_with_token):
+    client, headers = client_with_token("superadmin")
+    campaign = {
+        "prefix": "SPRING-",
+        "count": 0,
+        "discount_type": "fixed",
+        "discount_value": 2.5
+    }
+    response = client.post("/discount-codes/campaigns", json=campaign,
+                           headers=headers)
+    assert response.status_code == 400
+
+
+def test_create_discount_campaign_invalid_prefix(client_with_token):
+    client, headers = client_with_token("superadmin")
+    campaign = {
+        "prefix": "SPRING 2026",
+        "count": 5,
+        "discount_type": "fixed",
+        "discount_value": 2.5
+    }
+    response = client.post("/discount-codes/campaigns", json=campaign,
+                           headers=headers)
+    assert response.status_code == 400
+
+
+def test_create_discount_campaign_without_authorisation(client_with_token):
+    client, headers = client_with_token("user")
+    campaign = {
+        "prefix": "SPRING-",
+        "count": 5,
+        "discount_type": "fixed",
+        "discount_value": 2.5
+    }
+    response = client.post("/discount-codes/campaigns", json=campaign,
+                           headers=headers)
+    assert response.status_code == 403
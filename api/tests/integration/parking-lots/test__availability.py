@@ -0,0 +1,88 @@
+"""
+this file contains all tests related to the parking lot availability endpoint.
+"""
+
+from api.tests.conftest import get_last_pid
+
+
+def test_availability_success(client_with_token):
+    """Tests retrieving the free spots of a parking lot per hour.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 200 or the buckets are incorrect.
+    """
+    client, _ = client_with_token("superadmin")
+    pid = get_last_pid(client)
+    response = client.get(
+        f"/parking-lots/{pid}/availability"
+        "?from=2030-01-01T08:00:00&to=2030-01-01T12:00:00&granularity=60"
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["buckets"]) == 4
+    assert data["buckets"][0]["start"] == "2030-01-01T08:00:00"
+    assert all(0 <= bucket["free"] <= data["capacity"] for bucket in data["buckets"])
+
+
+def test_availability_invalid_granularity(client_with_token):
+    """Tests retrieving the availability with a bucket size that is not a whole slot.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 400.
+    """
+    client, _ = client_with_token("superadmin")
+    pid = get_last_pid(client)
+    response = client.get(f"/parking-lots/{pid}/availability?granularity=20")
+    assert response.status_code == 400
+    assert response.json()["detail"]["code"] == "INVALID_GRANULARITY"
+
+
+def test_availability_invalid_period(client_with_token):
+    """Tests retrieving the availability of a window that ends before it starts.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 400.
+    """
+    client, _ = client_with_token("superadmin")
+    pid = get_last_pid(client)
+    response = client.get(
+        f"/parking-lots/{pid}/availability"
+        "?from=2030-01-02T00:00:00&to=2030-01-01T00:00:00"
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["code"] == "INVALID_DATE_RANGE"
+
+
+def test_availability_nonexistent_lot(client_with_token):
+    """Tests retrieving the availability of a parking lot that does not exist.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 404.
+    """
+    client, _ = client_with_token("superadmin")
+    response = client.get("/parking-lots/999999/availability")
+    assert response.status_code == 404
@@ -0,0 +1,84 @@
+"""
+this file contains all tests related to the close parking lot endpoint.
+"""
+
+from api.tests.conftest import get_last_pid
+
+
+def test_close_parking_lot_success(client_with_token):
+    """Tests closing a parking lot and stopping its active sessions.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 200 or the lot is not closed.
+    """
+    superadmin_client, headers = client_with_token("superadmin")
+    pid = get_last_pid(superadmin_client)
+    response = superadmin_client.post(
+        f"/parking-lots/{pid}/close",
+        headers=headers,
+        params={"closed_reason": "for testing"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["parking_lot_id"] == pid
+    assert data["stopped_sessions"] == len(data["sessions"])
+
+    lot = superadmin_client.get(f"/parking-lots/{pid}", headers=headers).json()
+    assert lot["status"] == "closed"
+    assert lot["occupied"] == 0
+
+    sessions = superadmin_client.get(
+        f"/parking-lots/{pid}/sessions",
+        headers=headers,
+        params={"active_only": True}
+    ).json()
+    assert len(sessions) == 0
+
+
+def test_close_parking_lot_not_found(client_with_token):
+    """Tests closing a parking lot that does not exist.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 404.
+    """
+    superadmin_client, headers = client_with_token("superadmin")
+    response = superadmin_client.post(
+        "/parking-lots/999999/close",
+        headers=headers,
+        params={"closed_reason": "for testing"}
+    )
+    assert response.status_code == 404
+
+
+def test_close_parking_lot_forbidden(client_with_token):
+    """Tests closing a parking lot with insufficient permissions.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 403.
+    """
+    user_client, headers = client_with_token("user")
+    pid = get_last_pid(user_client)
+    response = user_client.post(
+        f"/parking-lots/{pid}/close",
+        headers=headers,
+        params={"closed_reason": "for testing"}
+    )
+    assert response.status_code == 403
@@ -209,6 +209,51 @@ def test_get_parking_lots_sessions(client_with_token):
     assert len(data) == 0
 
 
+def test_get_parking_lots_sessions_invalid_cursor(client_with_token):
+    """Attempts to retrieve sessions of a parking lot with a malformed cursor.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 400.
+    """
+    superadmin_client, headers = client_with_token("superadmin")
+    parking_lot_id = get_last_pid(superadmin_client)
+    response = superadmin_client.get(
+        f"/parking-lots/{parking_lot_id}/sessions",
+        headers=headers,
+        params={"cursor": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["code"] == "INVALID_CURSOR"
+
+
+def test_get_parking_lots_sessions_limit_too_large(client_with_token):
+    """Attempts to retrieve more sessions per page than allowed.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 422.
+    """
+    superadmin_client, headers = client_with_token("superadmin")
+    parking_lot_id = get_last_pid(superadmin_client)
+    response = superadmin_client.get(
+        f"/parking-lots/{parking_lot_id}/sessions",
+        headers=headers,
+        params={"limit": 100000}
+    )
+    assert response.status_code == 422
+
+
 def test_get_parking_lots_sessions_by_id_no_session(client_with_token):
     """Attempts to retrieve a non-existing session for a parking lot.
 
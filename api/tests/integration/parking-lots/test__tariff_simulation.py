@@ -0,0 +1,75 @@
+"""
+this file contains all tests related to the tariff simulation endpoint.
+"""
+
+from api.tests.conftest import get_last_pid
+
+
+def test_tariff_simulation_success(client_with_token):
+    """Tests simulating new tariffs for a parking lot.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 200 or the totals are incorrect.
+    """
+    superadmin_client, headers = client_with_token("superadmin")
+    pid = get_last_pid(superadmin_client)
+    response = superadmin_client.post(
+        f"/parking-lots/{pid}/tariff-simulation",
+        headers=headers,
+        json={"tariff": 1.0, "daytariff": 12.0}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["tariff"] == 1.0
+    assert data["daytariff"] == 12.0
+    assert data["sessions"] == sum(day["sessions"] for day in data["days"])
+
+
+def test_tariff_simulation_invalid_period(client_with_token):
+    """Tests simulating tariffs with a start date after the end date.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 400.
+    """
+    superadmin_client, headers = client_with_token("superadmin")
+    pid = get_last_pid(superadmin_client)
+    response = superadmin_client.post(
+        f"/parking-lots/{pid}/tariff-simulation",
+        headers=headers,
+        json={"start_date": "2025-02-01", "end_date": "2025-01-01"}
+    )
+    assert response.status_code == 400
+
+
+def test_tariff_simulation_forbidden(client_with_token):
+    """Tests simulating tariffs with insufficient permissions.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 403.
+    """
+    user_client, headers = client_with_token("user")
+    pid = get_last_pid(user_client)
+    response = user_client.post(
+        f"/parking-lots/{pid}/tariff-simulation",
+        headers=headers,
+        json={"tariff": 1.0}
+    )
+    assert response.status_code == 403
@@ -1,6 +1,8 @@
 """
 this file contains all tests related to get payments endpoints.
 """
+import json
+import uuid
 from fastapi.testclient import TestClient
 from api.main import app
 from api.tests.conftest import get_last_payment_id, get_last_pid
@@ -155,6 +157,52 @@ def test_get_my_payments_no_header(client):
     assert response.status_code == 401
 
 
+def test_get_my_payments_paginated(client_with_token):
+    """Walks through the payments of the authenticated user one page at a time.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the pages do not add up to the total count.
+    """
+    client, headers = client_with_token("superadmin")
+    params = {"limit": 1, "include_total": True}
+    response = client.get("/payments/me", headers=headers, params=params)
+    assert response.status_code == 200
+    total = int(response.headers["X-Total-Count"])
+
+    ids = [payment["id"] for payment in response.json()]
+    while "X-Next-Cursor" in response.headers:
+        params["cursor"] = response.headers["X-Next-Cursor"]
+        response = client.get("/payments/me", headers=headers, params=params)
+        assert response.status_code == 200
+        ids += [payment["id"] for payment in response.json()]
+    assert len(ids) == total
+    assert len(set(ids)) == total
+
+
+def test_get_my_payments_invalid_cursor(client_with_token):
+    """Attempts to retrieve user payments with a malformed cursor.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 400.
+    """
+    client, headers = client_with_token("superadmin")
+    response = client.get("/payments/me", headers=headers,
+                          params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
 # /payments/me/open
 def test_get_my_open_payments(client_with_token):
     """Retrieves open payments for the authenticated user.
@@ -443,3 +491,201 @@ def test_get_refunds_empty_with_user(client_with_token):
     client, headers = client_with_token("superadmin")
     response = client.get("/payments/refunds?user_id=1", headers=headers)
     assert response.status_code == 404
+
+
+# /payments/export
+def test_export_payments_csv(client_with_token):
+    """Exports the payments of a parking lot as CSV.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the export is not a CSV with a header line.
+    """
+    client, headers = client_with_token("superadmin")
+    pid = get_last_pid(client)
+    client.post("/payments", json={"user_id": 1, "parking_lot_id": pid,
+                                   "amount": 12.5, "method": "ideal"},
+                headers=headers)
+    response = client.get(f"/payments/export?lot={pid}&format=csv",
+                          headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0].startswith("id,parking_lot_id,")
+    assert len(lines) >= 2
+
+
+def test_export_payments_ndjson(client_with_token):
+    """Exports the payments of a parking lot as NDJSON.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If a line is not a payment of the requested lot.
+    """
+    client, headers = client_with_token("superadmin")
+    pid = get_last_pid(client)
+    client.post("/payments", json={"user_id": 1, "parking_lot_id": pid,
+                                   "amount": 12.5, "method": "ideal"},
+                headers=headers)
+    response = client.get(f"/payments/export?lot={pid}&format=ndjson",
+                          headers=headers)
+    assert response.status_code == 200
+    payments = [json.loads(line) for line in response.text.splitlines()]
+    assert payments
+    assert all(payment["parking_lot_id"] == pid for payment in payments)
+
+
+def test_export_payments_invalid_format(client_with_token):
+    """Attempts to export payments in an unsupported format.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 422.
+    """
+    client, headers = client_with_token("superadmin")
+    response = client.get("/payments/export?format=xml", headers=headers)
+    assert response.status_code == 422
+
+
+def test_export_payments_nonexistent_lot(client_with_token):
+    """Attempts to export the payments of a nonexistent parking lot.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 404.
+    """
+    client, headers = client_with_token("superadmin")
+    response = client.get("/payments/export?lot=999999", headers=headers)
+    assert response.status_code == 404
+
+
+def test_export_payments_no_auth(client_with_token):
+    """Attempts to export payments as a regular user.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 403.
+    """
+    client, headers = client_with_token("user")
+    response = client.get("/payments/export", headers=headers)
+    assert response.status_code == 403
+
+
+# /payments/export/summary
+def test_export_payments_summary(client_with_token):
+    """Retrieves the payment totals of a parking lot.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the totals do not match the created payments.
+    """
+    client, headers = client_with_token("superadmin")
+    pid = get_last_pid(client)
+    client.post("/payments", json={"user_id": 1, "parking_lot_id": pid,
+                                   "amount": 12.5, "method": "summary"},
+                headers=headers)
+    response = client.get(f"/payments/export/summary?lot={pid}",
+                          headers=headers)
+    assert response.status_code == 200
+    groups = [group for group in response.json()
+              if group["method"] == "summary"]
+    assert groups
+    assert sum(group["payments"] for group in groups) >= 1
+    assert all(group["parking_lot_id"] == pid for group in groups)
+
+
+# /payments/transaction/{transaction}
+def test_get_payments_by_transaction(client_with_token):
+    """Retrieves the payments and totals of a transaction.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the totals do not match the created payments.
+    """
+    client, headers = client_with_token("superadmin")
+    pid = get_last_pid(client)
+    transaction = f"test-transaction-{uuid.uuid4()}"
+    for amount in (10, 2.5):
+        client.post("/payments", json={"user_id": 1, "parking_lot_id": pid,
+                                       "transaction": transaction,
+                                       "amount": amount},
+                    headers=headers)
+    response = client.get(f"/payments/transaction/{transaction}",
+                          headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 2
+    assert body["total"] == 12.5
+    assert body["paid"] == 0
+    assert body["outstanding"] == 12.5
+    assert len(body["payments"]) == 2
+
+
+def test_get_payments_by_nonexistent_transaction(client_with_token):
+    """Attempts to retrieve the payments of an unknown transaction.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 404.
+    """
+    client, headers = client_with_token("superadmin")
+    response = client.get(f"/payments/transaction/{uuid.uuid4()}",
+                          headers=headers)
+    assert response.status_code == 404
+
+
+def test_get_payments_by_transaction_no_auth(client_with_token):
+    """Attempts to retrieve the payments of a transaction as a regular user.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 403.
+    """
+    client, headers = client_with_token("user")
+    response = client.get("/payments/transaction/abc", headers=headers)
+    assert response.status_code == 403
@@ -299,6 +299,50 @@ def test_pay_payment_no_header(client):
     assert response.status_code == 401
 
 
+# payments/pay
+def test_pay_payments(client_with_token):
+    payment_id = get_last_payment_id(client_with_token)
+    client, headers = client_with_token("superadmin")
+    response = client.post("/payments/pay",
+                           json={"payment_ids": [payment_id, 43232]},
+                           headers=headers)
+    assert response.status_code == 200
+    results = {r["payment_id"]: r["status"] for r in response.json()["results"]}
+    assert results[payment_id] in ("paid", "already_paid")
+    assert results[43232] == "not_found"
+
+    response = client.get(f"/payments/{payment_id}", headers=headers)
+    assert response.json()["completed"] is True
+
+
+def test_pay_payments_already_paid(client_with_token):
+    payment_id = get_last_payment_id(client_with_token)
+    client, headers = client_with_token("superadmin")
+    client.post("/payments/pay", json={"payment_ids": [payment_id]},
+                headers=headers)
+    response = client.post("/payments/pay", json={"payment_ids": [payment_id]},
+                           headers=headers)
+    assert response.status_code == 200
+    assert response.json()["paid"] == 0
+    assert response.json()["results"][0]["status"] == "already_paid"
+
+
+def test_pay_payments_not_users_payment(client_with_token):
+    payment_id = get_last_payment_id(client_with_token)
+    client, headers = client_with_token("paymentadmin")
+    response = client.post("/payments/pay", json={"payment_ids": [payment_id]},
+                           headers=headers)
+    assert response.status_code == 200
+    assert response.json()["results"][0]["status"] == "forbidden"
+
+
+def test_pay_payments_empty_list(client_with_token):
+    client, headers = client_with_token("superadmin")
+    response = client.post("/payments/pay", json={"payment_ids": []},
+                           headers=headers)
+    assert response.status_code == 422
+
+
 # payments/{user_id}/request_refund
 @patch("api.models.payment_model.PaymentModel.mark_refund_request",
        return_value=False)
@@ -469,3 +513,74 @@ def test_get_refunds_no_authorization(client_with_token):
 def test_get_refunds_no_header(client):
     response = client.get("/payments/refunds")
     assert response.status_code == 401
+
+
+# POST payments/refunds/claim
+def test_claim_refund_requests(client_with_token):
+    client, headers = client_with_token("superadmin")
+    payment_id = get_last_payment_id(client_with_token)
+    client.post(f"/payments/{payment_id}/pay", json={}, headers=headers)
+    client.post(f"payments/{payment_id}/request_refund",
+                json={}, headers=headers)
+    response = client.post("/payments/refunds/claim?limit=100",
+                           headers=headers)
+    assert response.status_code == 200
+    claimed = [payment["id"] for payment in response.json()]
+    assert all(payment["refund_requested"] for payment in response.json())
+
+    client, headers = client_with_token("paymentadmin")
+    response = client.post("/payments/refunds/claim?limit=100",
+                           headers=headers)
+    assert response.status_code == 200
+    assert not set(claimed) & {payment["id"] for payment in response.json()}
+
+
+def test_claim_refund_requests_invalid_limit(client_with_token):
+    client, headers = client_with_token("superadmin")
+    response = client.post("/payments/refunds/claim?limit=0",
+                           headers=headers)
+    assert response.status_code == 422
+
+
+def test_claim_refund_requests_no_authorization(client_with_token):
+    client, headers = client_with_token("user")
+    response = client.post("/payments/refunds/claim", headers=headers)
+    assert response.status_code == 403
+
+
+# POST payments/refunds/approve
+def test_approve_refunds(client_with_token):
+    client, headers = client_with_token("superadmin")
+    payment_id = get_last_payment_id(client_with_token)
+    client.post(f"/payments/{payment_id}/pay", json={}, headers=headers)
+    client.post(f"payments/{payment_id}/request_refund",
+                json={}, headers=headers)
+    response = client.post("/payments/refunds/approve",
+                           json={"payment_ids": [payment_id, 452543534]},
+                           headers=headers)
+    assert response.status_code == 200
+    statuses = {result["payment_id"]: result["status"]
+                for result in response.json()["results"]}
+    assert statuses[452543534] == "not_found"
+    assert statuses[payment_id] in ("refunded", "already_refunded")
+
+    response = client.post("/payments/refunds/approve",
+                           json={"payment_ids": [payment_id]},
+                           headers=headers)
+    assert response.json()["results"][0]["status"] == "already_refunded"
+    response = client.get(f"/payments/{payment_id}", headers=headers)
+    assert response.json()["refund_accepted"] is True
+
+
+def test_approve_refunds_empty(client_with_token):
+    client, headers = client_with_token("superadmin")
+    response = client.post("/payments/refunds/approve",
+                           json={"payment_ids": []}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_approve_refunds_no_authorization(client_with_token):
+    client, headers = client_with_token("user")
+    response = client.post("/payments/refunds/approve",
+                           json={"payment_ids": [1]}, headers=headers)
+    assert response.status_code == 403
@@ -363,3 +363,39 @@ def test_stop_session_from_reservation_not_found(client_with_token):
     assert response.status_code == 404
 
 # endregion
+
+
+def test_start_session_parking_lot_full(client_with_token):
+    """
+    Attempts to start a session at a parking lot without free spots.
+
+    Args:
+        client_with_token: Fixture providing an authenticated client and headers.
+
+    Returns:
+        None
+
+    Raises:
+        AssertionError: If the response status code is not 409 or the error code is incorrect.
+    """
+    client, headers = client_with_token("superadmin")
+    lot = {
+        "name": "Volle Parkeergarage",
+        "location": "Center",
+        "address": "Stationsplein 1, 1012 AB Amsterdam",
+        "capacity": 0,
+        "tariff": 0.5,
+        "daytariff": 0.5,
+        "lat": 0,
+        "lng": 0
+    }
+    client.post("/parking-lots", json=lot, headers=headers)
+    lid = get_last_pid(client)
+    vehicle_id = get_last_vid(client_with_token)
+
+    response = client.post(
+        f"/parking-lots/{lid}/sessions/start/{vehicle_id}", headers=headers
+    )
+    client.delete(f"/parking-lots/{lid}/force", headers=headers)
+    assert response.status_code == 409
+    assert response.json()["detail"]["code"] == "PARKING_LOT_FULL"
@@ -0,0 +1,75 @@
+import itertools
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from api.tests.conftest import get_last_pid, get_last_vid
+from api.utilities.prefetch import run_pooled
+
+# Days after the first reservation, shared by all runs so the reservations of
+# the gathered and the serial run do not overlap
+RESERVATION_DAYS = itertools.count()
+
+
+def record_latency_percentiles(benchmark):
+    """Adds the p50 and p99 latency in milliseconds to the benchmark report."""
+    timings = np.array(benchmark.stats.stats.sorted_data) * 1000
+    benchmark.extra_info["p50_ms"] = round(float(np.percentile(timings, 50)), 3)
+    benchmark.extra_info["p99_ms"] = round(float(np.percentile(timings, 99)), 3)
+
+
+async def gather_serially(*queries):
+    """Runs the queries of gather_queries one after another, as before the lookups were gathered."""
+    return [run_pooled(method, *args) for method, args in queries]
+
+
+@pytest.fixture(params=["gathered", "serial"])
+def lookups(request, monkeypatch):
+    """Runs a benchmark with the lookups of the routers gathered, and once with them run serially."""
+    if request.param == "serial":
+        monkeypatch.setattr("api.app.routers.reservations.gather_queries", gather_serially)
+        monkeypatch.setattr("api.app.routers.sessions.gather_queries", gather_serially)
+    return request.param
+
+
+@pytest.mark.benchmark(group="reservations")
+def test_create_reservation_performance(benchmark, client_with_token, lookups):
+    client, headers = client_with_token("superadmin")
+    lot_id = get_last_pid(client)
+    vehicle_id = get_last_vid(client_with_token)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=400)
+
+    def create_reservation():
+        start_time = start + timedelta(days=next(RESERVATION_DAYS))
+        return client.post("/reservations/create", headers=headers, json={
+            "user_id": 1,
+            "vehicle_id": vehicle_id,
+            "parking_lot_id": lot_id,
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + timedelta(hours=1)).isoformat(),
+        })
+
+    result = benchmark(create_reservation)
+    record_latency_percentiles(benchmark)
+    assert result.status_code == 200
+
+
+@pytest.mark.benchmark(group="sessions")
+def test_start_session_performance(benchmark, client_with_token, lookups):
+    client, headers = client_with_token("superadmin")
+    lot_id = get_last_pid(client)
+    vehicle_id = get_last_vid(client_with_token)
+    started = []
+
+    def stop_session():
+        # Not timed, every round starts a session for a vehicle without one
+        client.post(f"/parking-lots/{lot_id}/sessions/stop/{vehicle_id}", headers=headers)
+
+    def start_session():
+        response = client.post(f"/parking-lots/{lot_id}/sessions/start/{vehicle_id}", headers=headers)
+        started.append(response.status_code)
+        return response
+
+    benchmark.pedantic(start_session, setup=stop_session, rounds=50, iterations=1)
+    stop_session()
+    record_latency_percentiles(benchmark)
+    assert set(started) == {201}
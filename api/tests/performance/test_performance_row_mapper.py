@@ -0,0 +1,62 @@
+import pytest
+from datetime import datetime, date
+from api.datatypes.parking_lot import ParkingLot
+from api.datatypes.session import Session
+from api.datatypes.user import User
+from api.models.row_mapper import RowMapper
+
+
+ROWS = 10_000
+
+
+class MockCursor:
+    def __init__(self, columns, rows):
+        self.description = [(column,) for column in columns]
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+def parking_lot_cursor():
+    columns = ["id", "name", "location", "address", "capacity", "reserved",
+               "tariff", "daytariff", "created_at", "lat", "lng", "status",
+               "closed_reason", "closed_date"]
+    rows = [(i, f"Lot {i}", "Loc", "Addr", 100, 0, 1.5, 10.0,
+             date(2025, 1, 1), 52.0, 4.0, "open", None, None)
+            for i in range(ROWS)]
+    return MockCursor(columns, rows)
+
+
+def session_cursor():
+    columns = ["id", "parking_lot_id", "user_id", "vehicle_id",
+               "reservation_id", "start_time", "end_time", "cost"]
+    rows = [(i, 1, 2, 3, None, datetime(2025, 1, 1, 10),
+             datetime(2025, 1, 1, 12), 2.5)
+            for i in range(ROWS)]
+    return MockCursor(columns, rows)
+
+
+def user_cursor():
+    columns = ["id", "username", "password", "name", "email", "phone",
+               "role", "created_at", "birth_year", "active", "old_hash"]
+    rows = [(i, f"user{i}", "pw", "name", "a@b.c", None, "user",
+             datetime(2025, 1, 1), 1990, True, False)
+            for i in range(ROWS)]
+    return MockCursor(columns, rows)
+
+
+@pytest.mark.benchmark(group="row_mapper")
+@pytest.mark.parametrize("strict", [False, True], ids=["trusted", "strict"])
+@pytest.mark.parametrize("model, make_cursor", [
+    (ParkingLot, parking_lot_cursor),
+    (Session, session_cursor),
+    (User, user_cursor),
+], ids=["parking_lot", "session", "user"])
+def test_row_mapper_performance(benchmark, model, make_cursor, strict):
+    mapper = RowMapper(model, strict=strict)
+    cursor = make_cursor()
+
+    result = benchmark(mapper.map_rows, cursor)
+    assert len(result) == ROWS
+    benchmark.extra_info["rows_per_sec"] = ROWS / benchmark.stats.stats.mean
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from api.session_calculator import simulate_revenue
+
+
+SESSIONS = 1_000_000
+CHUNK_SIZE = 100_000
+
+
+def session_chunks():
+    rng = np.random.default_rng(0)
+    starts = (np.datetime64("2025-01-01T00:00", "us")
+              + rng.integers(0, 365 * 86_400_000_000, SESSIONS).astype("timedelta64[us]"))
+    ends = starts + rng.integers(0, 3 * 86_400_000_000, SESSIONS).astype("timedelta64[us]")
+    return [(starts[i:i + CHUNK_SIZE], ends[i:i + CHUNK_SIZE])
+            for i in range(0, SESSIONS, CHUNK_SIZE)]
+
+
+@pytest.mark.benchmark(group="tariff_simulation")
+def test_simulate_revenue_performance(benchmark):
+    chunks = session_chunks()
+
+    days = benchmark.pedantic(simulate_revenue, args=(chunks, 2.5, 15.0, 3.0, 18.0),
+                              rounds=5, iterations=1)
+    assert sum(day["sessions"] for day in days) == SESSIONS
+    benchmark.extra_info["sessions_per_sec"] = SESSIONS / benchmark.stats.stats.mean
@@ -0,0 +1,102 @@
+from unittest.mock import MagicMock
+from datetime import date, datetime
+from api.models.availability_model import rebuild_availability
+from api.utilities.availability import (SLOTS_PER_DAY, add_booking, days_between,
+                                        empty_day, free_capacity, has_room,
+                                        is_valid_granularity, slot_ranges)
+
+
+def test_slot_ranges_rounds_to_whole_slots():
+    ranges = slot_ranges(datetime(2027, 1, 1, 9, 10), datetime(2027, 1, 1, 10, 1))
+    assert ranges == [(date(2027, 1, 1), 36, 41)]
+
+
+def test_slot_ranges_spans_days():
+    ranges = slot_ranges(datetime(2027, 1, 1, 23, 0), datetime(2027, 1, 3, 0, 30))
+    assert ranges == [
+        (date(2027, 1, 1), 92, SLOTS_PER_DAY),
+        (date(2027, 1, 2), 0, SLOTS_PER_DAY),
+        (date(2027, 1, 3), 0, 2),
+    ]
+
+
+def test_slot_ranges_ending_at_midnight():
+    ranges = slot_ranges(datetime(2027, 1, 1, 22, 0), datetime(2027, 1, 2, 0, 0))
+    assert ranges == [(date(2027, 1, 1), 88, SLOTS_PER_DAY)]
+
+
+def test_slot_ranges_empty_window():
+    moment = datetime(2027, 1, 1, 9, 0)
+    assert slot_ranges(moment, moment) == []
+
+
+def test_has_room_until_capacity():
+    ranges = slot_ranges(datetime(2027, 1, 1, 9, 0), datetime(2027, 1, 1, 10, 0))
+    slots_by_day = {}
+    add_booking(slots_by_day, ranges, 1)
+    assert has_room(slots_by_day, ranges, 2)
+    add_booking(slots_by_day, ranges, 1)
+    assert not has_room(slots_by_day, ranges, 2)
+
+
+def test_has_room_ignores_other_slots():
+    day = date(2027, 1, 1)
+    slots = empty_day()
+    slots[40] = 5
+    assert has_room({day: slots}, [(day, 36, 40)], 5)
+    assert not has_room({day: slots}, [(day, 36, 41)], 5)
+
+
+def test_add_booking_release_never_goes_negative():
+    day = date(2027, 1, 1)
+    updated = add_booking({day: empty_day()}, [(day, 0, 4)], -1)
+    assert updated[day][:4] == [0, 0, 0, 0]
+
+
+def test_is_valid_granularity():
+    assert is_valid_granularity(15)
+    assert is_valid_granularity(60)
+    assert is_valid_granularity(1440)
+    assert not is_valid_granularity(0)
+    assert not is_valid_granularity(20)
+    assert not is_valid_granularity(105)
+
+
+def test_days_between():
+    assert days_between(datetime(2027, 1, 1, 22, 0), datetime(2027, 1, 3, 0, 0)) == [
+        date(2027, 1, 1), date(2027, 1, 2)]
+
+
+def test_free_capacity_per_bucket():
+    slots_by_day = {}
+    add_booking(slots_by_day, slot_ranges(datetime(2027, 1, 1, 9, 15),
+                                          datetime(2027, 1, 1, 9, 30)), 1)
+    buckets = free_capacity(slots_by_day, 3, datetime(2027, 1, 1, 8, 20),
+                            datetime(2027, 1, 1, 11, 0), 60)
+    assert [bucket["start"].hour for bucket in buckets] == [8, 9, 10]
+    assert [bucket["free"] for bucket in buckets] == [3, 2, 3]
+
+
+def test_free_capacity_across_days():
+    day = date(2027, 1, 2)
+    slots = empty_day()
+    slots[0] = 4
+    buckets = free_capacity({day: slots}, 4, datetime(2027, 1, 1, 0, 0),
+                            datetime(2027, 1, 3, 0, 0), 1440)
+    assert [bucket["free"] for bucket in buckets] == [4, 0]
+
+
+def test_rebuild_availability_recomputes_lots_from_reservations():
+    mock_cursor = MagicMock()
+    rebuild_availability(mock_cursor, [3, 4])
+
+    (reset, params), (recompute, _) = [c.args for c in mock_cursor.execute.call_args_list]
+    assert "day >= CURRENT_DATE" in reset
+    assert "ON CONFLICT (parking_lot_id, day) DO UPDATE" in recompute
+    assert params == {"lots": [3, 4], "released": ["No Show"]}
+
+
+def test_rebuild_availability_without_lots():
+    mock_cursor = MagicMock()
+    rebuild_availability(mock_cursor, [])
+    mock_cursor.execute.assert_not_called()
@@ -0,0 +1,47 @@
+from api.utilities.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_value_until_expired():
+    clock = FakeClock()
+    cache = TTLCache(10, clock=clock)
+    cache.set("key", 1)
+    clock.now = 9.9
+    assert cache.get("key") == 1
+    clock.now = 10
+    assert cache.get("key") is None
+
+
+def test_invalidate_with_predicate():
+    cache = TTLCache(10)
+    cache.set((1, "a"), "lot 1")
+    cache.set((2, "a"), "lot 2")
+    cache.invalidate(lambda key: key[0] == 1)
+    assert cache.get((1, "a")) is None
+    assert cache.get((2, "a")) == "lot 2"
+
+
+def test_invalidate_all():
+    cache = TTLCache(10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate()
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+
+
+def test_oldest_entry_is_dropped_when_full():
+    cache = TTLCache(10, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
@@ -1,6 +1,9 @@
+from datetime import datetime
+import os
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
-from api.data_converter import DataConverter
+from api.data_converter import (DataConverter, RecordLog, copy_new_rows, copy_value, file_hash, init_session_worker,
+                                loaded_prefix, main, normalize_session_file)
 
 def test_read_data_file_found(monkeypatch):
     # Mock os.path.exists to always return True
@@ -27,9 +30,11 @@ def test_insert_user_inserts_and_commits(monkeypatch):
     mock_conn.cursor.return_value = mock_cursor
     dc.connection = mock_conn
     users = [{"username": "test", "password": "pw", "name": "n", "email": "e", "phone": "p", "birth_year": 2000}]
-    mock_cursor.fetchone.return_value = [0]
-    dc.insert_user(users)
-    assert mock_cursor.execute.call_count >= 2
+    mock_cursor.fetchall.return_value = []
+    mock_cursor.rowcount = 1
+    assert dc.insert_user(users) == 1
+    mock_cursor.copy_expert.assert_called_once()
+    assert "INSERT INTO users" in mock_cursor.execute.call_args[0][0]
     mock_conn.commit.assert_called_once()
     mock_cursor.close.assert_called_once()
 
@@ -93,7 +98,8 @@ def test_insert_vehicle_inserts_and_commits(monkeypatch):
     dc.insert_vehicle(vehicles)
     mock_conn.commit.assert_called_once()
     mock_cursor.close.assert_called_once()
-    assert mock_cursor.execute.call_count == 1
+    assert "INSERT INTO vehicles" in mock_cursor.execute.call_args[0][0]
+    mock_cursor.copy_expert.assert_called_once()
 
 def test_insert_parking_lots_inserts_and_commits(monkeypatch):
     dc = DataConverter()
@@ -117,7 +123,8 @@ def test_insert_parking_lots_inserts_and_commits(monkeypatch):
     dc.insert_parking_lots(lots)
     mock_conn.commit.assert_called_once()
     mock_cursor.close.assert_called_once()
-    assert mock_cursor.execute.call_count == 1
+    assert "INSERT INTO parking_lots" in mock_cursor.execute.call_args[0][0]
+    mock_cursor.copy_expert.assert_called_once()
 
 def test_insert_user_handles_existing_user(monkeypatch):
     dc = DataConverter()
@@ -126,10 +133,11 @@ def test_insert_user_handles_existing_user(monkeypatch):
     mock_conn.cursor.return_value = mock_cursor
     dc.connection = mock_conn
     users = [{"username": "test", "password": "pw", "name": "n", "email": "e", "phone": "p", "birth_year": 2000}]
-    mock_cursor.fetchone.return_value = [1]  # User already exists
+    mock_cursor.fetchall.return_value = [("test",)]  # User already exists
     dc.insert_user(users)
     # is_active should be False, but still inserts
-    assert mock_cursor.execute.call_count >= 2
+    copied = mock_cursor.copy_expert.call_args[0][1].getvalue()
+    assert copied == "test\tpw\tn\te\tp\t2000\tf\tt\n"
     mock_conn.commit.assert_called_once()
     mock_cursor.close.assert_called_once()
 
@@ -154,9 +162,8 @@ def test_insert_payment_inserts_and_commits(monkeypatch):
             "date": "2023-01-01 12:00:00"
         }
     }]
-    with patch("api.data_converter.execute_values") as mock_exec_values:
-        dc.insert_payment(payments, batch_size=1)
-        mock_exec_values.assert_called()
+    dc.insert_payment(payments, batch_size=1)
+    mock_cursor.copy_expert.assert_called_once()
     mock_conn.commit.assert_called_once()
     mock_cursor.close.assert_called_once()
 
@@ -176,10 +183,14 @@ def test_insert_reservations_inserts_and_commits(monkeypatch):
         "created_at": "2023-01-01T09:00:00Z",
         "cost": 5.0
     }]
-    dc.insert_reservations(reservations)
+    mock_cursor.rowcount = 1
+    assert dc.insert_reservations(reservations) == 1
     mock_conn.commit.assert_called_once()
     mock_cursor.close.assert_called_once()
-    assert mock_cursor.execute.call_count == 1
+    sql, copied = mock_cursor.copy_expert.call_args[0]
+    assert sql.startswith("COPY reservation_staging")
+    assert copied.getvalue().startswith("0\t1\t2\t3\t2023-01-01T10:00:00\t")
+    assert any("INSERT INTO reservations" in c.args[0] for c in mock_cursor.execute.call_args_list)
 
 # def test_insert_sessions_inserts_and_commits(monkeypatch):
 #     dc = DataConverter()
@@ -232,13 +243,14 @@ def test_convert_full_flow(monkeypatch):
         [{"initiator": "a", "transaction": "t", "amount": "1", "completed": True, "hash": "h", "t_data": {"method": "m", "issuer": "i", "bank": "b", "date": "2020-01-01 00:00:00"}}],  # payments
         [{"vehicle_id": 1, "user_id": 1, "parking_lot_id": 1, "start_time": "2020-01-01T10:00:00Z", "end_time": "2020-01-01T12:00:00Z", "status": "active", "created_at": "2020-01-01T09:00:00Z", "cost": 5.0}],  # reservations
     ])
-    dc.insert_user = MagicMock()
-    dc.insert_vehicle = MagicMock()
-    dc.insert_parking_lots = MagicMock()
-    dc.insert_payment = MagicMock()
-    dc.insert_reservations = MagicMock()
+    dc.insert_user = MagicMock(return_value=1)
+    dc.insert_vehicle = MagicMock(return_value=1)
+    dc.insert_parking_lots = MagicMock(return_value=1)
+    dc.insert_payment = MagicMock(return_value=1)
+    dc.insert_reservations = MagicMock(return_value=1)
     dc.read_session_data = MagicMock(return_value={"1": {}})
-    dc.insert_sessions = MagicMock()
+    dc.session_files = MagicMock(return_value=["p1-sessions.json"])
+    dc.insert_sessions = MagicMock(return_value=1)
     dc.convert()
     dc.insert_user.assert_called_once()
     dc.insert_vehicle.assert_called_once()
@@ -309,8 +321,7 @@ def test_insert_payment_handles_invalid_date(monkeypatch, caplog):
             "date": "not-a-date"
         }
     }]
-    with patch("api.data_converter.execute_values"):
-        dc.insert_payment(payments, batch_size=1)
+    dc.insert_payment(payments, batch_size=1)
     assert any("Invalid date format" in record.message for record in caplog.records)
 
 def test_insert_sessions_handles_exception(monkeypatch, caplog):
@@ -357,8 +368,7 @@ def test_insert_payment_warns_on_unknown_user(monkeypatch, caplog):
             "date": "2023-01-01 12:00:00"
         }
     }]
-    with patch("api.data_converter.execute_values"):
-        dc.insert_payment(payments, batch_size=1)
+    dc.insert_payment(payments, batch_size=1)
     assert any("could not be uniquely matched" in record.message for record in caplog.records)
 
 def test_insert_user_handles_db_exception(monkeypatch, caplog):
@@ -369,7 +379,7 @@ def test_insert_user_handles_db_exception(monkeypatch, caplog):
     dc.connection = mock_conn
     users = [{"username": "fail", "password": "pw", "name": "n", "email": "e", "phone": "p", "birth_year": 2000}]
     # Force an exception on insert
-    mock_cursor.execute.side_effect = [None, Exception("DB error")]
+    mock_cursor.copy_expert.side_effect = Exception("DB error")
     with pytest.raises(Exception):
         dc.insert_user(users)
     # Exception should propagate, but also be logged if caught in production
@@ -403,8 +413,10 @@ def test_insert_reservations_handles_invalid_dates(monkeypatch, caplog):
         "created_at": "not-a-date",
         "cost": 5.0
     }]
+    mock_cursor.rowcount = 0
     dc.insert_reservations(reservations)
     assert any("Failed to insert reservation" in record.message for record in caplog.records)
+    mock_cursor.copy_expert.assert_not_called()
 
 def test_insert_sessions_warns_on_multiple_users(monkeypatch, caplog):
     dc = DataConverter()
@@ -452,4 +464,313 @@ def test_insert_sessions_warns_on_no_user(monkeypatch, caplog):
         }
     }
     dc.insert_sessions(sessions)
-    assert any("No user found for username" in record.message for record in caplog.records)
\ No newline at end of file
+    assert any("No user found for username" in record.message for record in caplog.records)
+
+def test_iter_data_streams_array_items(tmp_path):
+    dc = DataConverter()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "users.json").write_text(' [{"username": "a"}, {"username": "b", "birth_year": 1.5}]')
+    dc.script_dir = str(tmp_path)
+    records = dc.iter_data("users")
+    assert next(records) == {"username": "a"}
+    assert list(records) == [{"username": "b", "birth_year": 1.5}]
+
+def test_iter_data_streams_object_pairs(tmp_path):
+    dc = DataConverter()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "parking-lots.json").write_text('{"1": {"name": "Lot1"}, "2": {"name": "Lot2"}}')
+    dc.script_dir = str(tmp_path)
+    assert list(dc.iter_data("parking-lots")) == [("1", {"name": "Lot1"}), ("2", {"name": "Lot2"})]
+
+def test_iter_data_empty_file_returns_none(tmp_path):
+    dc = DataConverter()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "users.json").write_text('[]')
+    dc.script_dir = str(tmp_path)
+    assert dc.iter_data("users") is None
+
+def test_iter_session_data_chains_files_and_skips_non_dict(tmp_path):
+    dc = DataConverter()
+    (tmp_path / "data" / "pdata").mkdir(parents=True)
+    (tmp_path / "data" / "pdata" / "p1-sessions.json").write_text('{"1": {"user": "a"}}')
+    (tmp_path / "data" / "pdata" / "p2-sessions.json").write_text('[1, 2, 3]')
+    (tmp_path / "data" / "pdata" / "p3-sessions.json").write_text('{"2": {"user": "b"}}')
+    dc.script_dir = str(tmp_path)
+    assert list(dc.iter_session_data()) == [("1", {"user": "a"}), ("2", {"user": "b"})]
+
+def test_insert_sessions_inserts_in_batches(monkeypatch):
+    dc = DataConverter()
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.side_effect = [[(1, "testuser")], [(2, "XX-YY-01")]]
+    dc.connection = mock_conn
+    sessions = ((str(i), {"parking_lot_id": 1, "user": "testuser", "licenseplate": "XX-YY-01",
+                          "started": "2023-01-01T10:00:00Z", "stopped": "2023-01-01T12:00:00Z",
+                          "cost": 5.0})
+                for i in range(5))
+    batch_sizes = []
+    mock_cursor.copy_expert.side_effect = lambda sql, f: batch_sizes.append(f.getvalue().count("\n"))
+    mock_cursor.rowcount = 5
+    assert dc.insert_sessions(sessions, batch_size=2) == 5
+    assert batch_sizes == [2, 2, 1]
+    copied_sql = mock_cursor.copy_expert.call_args[0][0]
+    assert "vehicle_id" in copied_sql and "license_plate" not in copied_sql
+    mock_conn.commit.assert_called_once()
+
+def test_convert_streaming_uses_iterators(monkeypatch):
+    dc = DataConverter(streaming=True)
+    dc.iter_data = MagicMock(side_effect=lambda name: iter([{"name": name}]))
+    dc.iter_session_data = MagicMock(return_value=iter([("1", {})]))
+    dc.session_files = MagicMock(return_value=["p1-sessions.json"])
+    dc.read_data = MagicMock()
+    dc.insert_user = MagicMock(return_value=1)
+    dc.insert_vehicle = MagicMock(return_value=1)
+    dc.insert_parking_lots = MagicMock(return_value=1)
+    dc.insert_payment = MagicMock(return_value=1)
+    dc.insert_reservations = MagicMock(return_value=1)
+    dc.insert_sessions = MagicMock(return_value=1)
+    dc.convert()
+    dc.read_data.assert_not_called()
+    assert dc.iter_data.call_count == 5
+    dc.insert_sessions.assert_called_once()
+
+def test_copy_value_escapes_copy_text_format():
+    assert copy_value(None) == "\\N"
+    assert copy_value(True) == "t"
+    assert copy_value("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+    assert copy_value(2.5) == "2.5"
+
+def test_insert_user_only_first_duplicate_is_active(monkeypatch):
+    dc = DataConverter()
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    dc.connection = mock_conn
+    mock_cursor.fetchall.return_value = []
+    users = [{"username": "dup", "password": "pw", "name": "n", "email": "e", "phone": "p", "birth_year": 2000}] * 2
+    dc.insert_user(users)
+    copied = mock_cursor.copy_expert.call_args[0][1].getvalue().splitlines()
+    assert [line.split("\t")[6] for line in copied] == ["t", "f"]
+
+def test_normalize_session_file_resolves_user_and_plate(tmp_path):
+    filepath = tmp_path / "p1-sessions.json"
+    filepath.write_text('{"1": {"parking_lot_id": 1, "user": "testuser", "licenseplate": " xx-yy-01 ", '
+                        '"started": "2023-01-01T10:00:00Z", "stopped": null, "cost": 5.0}, '
+                        '"2": {"user": "testuser", "started": "not-a-date"}}')
+    init_session_worker({"testuser": [7]}, {"XX-YY-01": 3})
+    rows, records, _ = normalize_session_file(str(filepath))
+    assert rows == [(1, 7, 3, None, datetime(2023, 1, 1, 10), None, 5.0)]
+    assert records == 2
+
+def test_insert_sessions_parallel_writes_all_files(tmp_path):
+    dc = DataConverter(workers=2)
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.side_effect = [[(1, "testuser")], [(2, "XX-YY-01")]]
+    dc.connection = mock_conn
+    files = []
+    for i in range(1, 6):
+        filepath = tmp_path / f"p{i}-sessions.json"
+        filepath.write_text(f'{{"{i}": {{"parking_lot_id": {i}, "user": "testuser", "licenseplate": "XX-YY-01", '
+                            '"started": "2023-01-01T10:00:00Z", "stopped": "2023-01-01T12:00:00Z", "cost": 5.0}}')
+        files.append(str(filepath))
+    copied = []
+    mock_cursor.copy_expert.side_effect = lambda sql, f: copied.extend(f.getvalue().splitlines())
+    mock_cursor.rowcount = 5
+    file_records = {}
+    assert dc.insert_sessions_parallel(files, batch_size=2, file_records=file_records) == 5
+    assert {filepath: records for filepath, (records, _) in file_records.items()} == {filepath: 1 for filepath in files}
+    # The rows keep the order of the files
+    assert [line.split("\t")[:3] for line in copied] == [[str(i), "1", "2"] for i in range(1, 6)]
+    mock_conn.commit.assert_called_once()
+
+def test_convert_parallel_uses_session_files(monkeypatch):
+    dc = DataConverter(workers=2)
+    dc.read_data = MagicMock(return_value=[{}])
+    dc.session_files = MagicMock(return_value=["p1-sessions.json"])
+    dc.read_session_data = MagicMock()
+    for insert in ["insert_user", "insert_vehicle", "insert_parking_lots", "insert_payment",
+                   "insert_reservations", "insert_sessions", "insert_sessions_parallel"]:
+        setattr(dc, insert, MagicMock(return_value=1))
+    dc.convert()
+    dc.read_session_data.assert_not_called()
+    dc.insert_sessions.assert_not_called()
+    assert dc.insert_sessions_parallel.call_args[0] == (["p1-sessions.json"],)
+
+def test_copy_new_rows_skips_existing_natural_keys():
+    mock_cursor = MagicMock()
+    mock_cursor.rowcount = 1
+    assert copy_new_rows(mock_cursor, "vehicles", ("user_id", "license_plate"), [(1, "XX-YY-01")],
+                         key=("license_plate",), nullable_key=("user_id",)) == 1
+    assert mock_cursor.copy_expert.call_args[0][0] == "COPY vehicles_staging (user_id, license_plate) FROM STDIN"
+    sql = mock_cursor.execute.call_args[0][0]
+    assert "t.license_plate = s.license_plate AND t.user_id IS NOT DISTINCT FROM s.user_id" in sql
+    assert "ORDER BY s.row_no" in sql
+
+def test_convert_resume_skips_unchanged_files(tmp_path):
+    dc = DataConverter(resume=True)
+    (tmp_path / "data" / "pdata").mkdir(parents=True)
+    for filename in ["users", "vehicles", "parking-lots", "payments", "reservations"]:
+        (tmp_path / "data" / f"{filename}.json").write_text(f'[{{"file": "{filename}"}}]')
+    (tmp_path / "data" / "pdata" / "p1-sessions.json").write_text('{"1": {}}')
+    (tmp_path / "data" / "pdata" / "p2-sessions.json").write_text('{"2": {}}')
+    dc.script_dir = str(tmp_path)
+    dc.connection = MagicMock()
+    dc.connection.cursor.return_value.fetchall.return_value = [
+        ("Users", "data/users.json", file_hash(str(tmp_path / "data" / "users.json")), 1, "hash"),
+        ("Vehicles", "data/vehicles.json", "changed", 1, "changed"),
+        ("Sessions", "data/pdata/p1-sessions.json", file_hash(str(tmp_path / "data" / "pdata" / "p1-sessions.json")),
+         1, "hash"),
+    ]
+    for insert in ["insert_user", "insert_vehicle", "insert_parking_lots", "insert_payment",
+                   "insert_reservations", "insert_sessions"]:
+        setattr(dc, insert, MagicMock(return_value=1))
+    dc.save_checkpoint = MagicMock()
+    dc.load_session_lookups = MagicMock(return_value=({}, {}))
+    dc.convert()
+    dc.insert_user.assert_not_called()
+    dc.insert_vehicle.assert_called_once()
+    dc.insert_sessions.assert_called_once()
+    assert list(dc.insert_sessions.call_args[0][0]) == [("2", {})]
+    assert list(dc.insert_vehicle.call_args[0][0]) == [{"file": "vehicles"}]
+    saved = [(c.args[0], os.path.basename(c.args[1])) for c in dc.save_checkpoint.call_args_list]
+    assert saved == [("Vehicles", "vehicles.json"), ("Parking lots", "parking-lots.json"),
+                     ("Payments", "payments.json"), ("Reservations", "reservations.json"),
+                     ("Sessions", "p2-sessions.json")]
+
+def test_main_parses_resume_flag():
+    with patch("api.data_converter.DataConverter") as mock_converter:
+        main(["--resume", "--workers", "4"])
+    mock_converter.assert_called_once_with(streaming=True, workers=4, resume=True)
+    mock_converter.return_value.convert.assert_called_once()
+
+def test_insert_reservations_books_slots_of_imported_lots():
+    dc = DataConverter()
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    dc.connection = mock_conn
+    mock_cursor.rowcount = 1
+    mock_cursor.fetchall.return_value = [(3,)]
+    reservations = [{"vehicle_id": 1, "user_id": 2, "parking_lot_id": 3,
+                     "start_time": "2030-01-01T10:00:00Z", "end_time": "2030-01-01T12:00:00Z",
+                     "status": "active", "created_at": "2023-01-01T09:00:00Z", "cost": 5.0}]
+    with patch("api.data_converter.rebuild_availability") as mock_rebuild, \
+            patch("api.data_converter.invalidate_availability") as mock_invalidate:
+        dc.insert_reservations(reservations)
+    mock_rebuild.assert_called_once_with(mock_cursor, [3])
+    mock_invalidate.assert_called_once_with(3)
+    mock_conn.commit.assert_called_once()
+
+def test_insert_session_files_loads_lookups_once(tmp_path):
+    dc = DataConverter()
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.side_effect = [[(1, "testuser")], [(2, "XX-YY-01")]]
+    mock_cursor.rowcount = 1
+    dc.connection = mock_conn
+    dc.save_checkpoint = MagicMock()
+    files = []
+    for i in range(1, 4):
+        filepath = tmp_path / f"p{i}-sessions.json"
+        filepath.write_text(f'{{"{i}": {{"parking_lot_id": 1, "user": "testuser", "licenseplate": "XX-YY-01", '
+                            '"started": "2023-01-01T10:00:00Z"}}')
+        files.append((str(filepath), "hash"))
+    assert dc.insert_session_files(files) == 3
+    selects = [c.args[0] for c in mock_cursor.execute.call_args_list if c.args[0].startswith("SELECT id")]
+    assert len(selects) == 2
+    assert mock_conn.commit.call_count == 3
+
+def test_rerun_skips_rows_with_null_keys(caplog):
+    dc = DataConverter()
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    dc.connection = mock_conn
+    mock_cursor.fetchall.return_value = [(1, "testuser")]
+    mock_cursor.fetchone.return_value = (1,)
+    mock_cursor.rowcount = 0
+    payments = [{"initiator": "testuser", "transaction": None, "amount": "10.5", "completed": True,
+                 "hash": "abc", "t_data": {"date": "2023-01-01 12:00:00"}}]
+    sessions = {"1": {"parking_lot_id": 1, "user": "testuser", "licenseplate": "XX-YY-01", "started": None}}
+
+    for _ in range(2):
+        dc.insert_payment(payments)
+        dc.insert_sessions(sessions, lookups=({"testuser": [1]}, {"XX-YY-01": 2}))
+
+    inserts = [c.args[0] for c in mock_cursor.execute.call_args_list if "INSERT INTO" in c.args[0]]
+    assert len(inserts) == 4
+    assert all("s.transaction IS NOT NULL" in sql for sql in inserts[0::2])
+    assert all("s.parking_lot_id IS NOT NULL AND s.start_time IS NOT NULL" in sql for sql in inserts[1::2])
+    assert sum("Skipped 1 rows of payments without a transaction" in r.message for r in caplog.records) == 2
+    assert sum("Skipped 1 rows of sessions without a parking_lot_id, start_time" in r.message
+               for r in caplog.records) == 2
+
+def test_insert_reservations_drops_rows_with_missing_references(caplog):
+    dc = DataConverter()
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    dc.connection = mock_conn
+    mock_cursor.fetchall.return_value = []
+
+    def execute(sql, *args):
+        mock_cursor.rowcount = 1 if sql.strip().startswith(("DELETE", "INSERT")) else 0
+    mock_cursor.execute.side_effect = execute
+    reservations = [{"vehicle_id": vehicle_id, "user_id": 2, "parking_lot_id": 3,
+                     "start_time": "2030-01-01T10:00:00Z", "end_time": "2030-01-01T12:00:00Z",
+                     "status": "active", "created_at": "2023-01-01T09:00:00Z", "cost": 5.0}
+                    for vehicle_id in (1, 999)]
+    with patch("api.data_converter.rebuild_availability"):
+        assert dc.insert_reservations(reservations) == 1
+    statements = [c.args[0] for c in mock_cursor.execute.call_args_list]
+    delete = next(sql for sql in statements if sql.strip().startswith("DELETE FROM reservation_staging"))
+    assert "vehicles" in delete and "users" in delete and "parking_lots" in delete
+    assert statements.index(delete) < next(i for i, sql in enumerate(statements) if "INSERT INTO reservations" in sql)
+    assert any("Skipped 1 reservations referencing" in r.message for r in caplog.records)
+    assert not any("overlapping" in r.message for r in caplog.records)
+    mock_conn.commit.assert_called_once()
+
+def test_loaded_prefix_matches_only_unchanged_records():
+    log = RecordLog([{"username": "a"}, {"username": "b"}])
+    list(log)
+    checkpoint = (log.count, log.hexdigest())
+    assert loaded_prefix(iter([{"username": "a"}, {"username": "b"}, {"username": "c"}]), checkpoint) == 2
+    assert loaded_prefix(iter([{"username": "a"}, {"username": "x"}, {"username": "c"}]), checkpoint) == 0
+    assert loaded_prefix(iter([{"username": "a"}]), checkpoint) == 0
+    assert loaded_prefix(iter([{"username": "a"}]), None) == 0
+
+def test_convert_resume_loads_only_appended_records(tmp_path):
+    dc = DataConverter(resume=True)
+    (tmp_path / "data" / "pdata").mkdir(parents=True)
+    for filename in ["users", "parking-lots", "payments", "reservations"]:
+        (tmp_path / "data" / f"{filename}.json").write_text(f'[{{"file": "{filename}"}}]')
+    (tmp_path / "data" / "vehicles.json").write_text('[{"license_plate": "A"}, {"license_plate": "B"}]')
+    (tmp_path / "data" / "pdata" / "p1-sessions.json").write_text('{"1": {}, "2": {}}')
+    loaded = RecordLog([{"license_plate": "A"}])
+    list(loaded)
+    loaded_sessions = RecordLog([("1", {})])
+    list(loaded_sessions)
+    dc.script_dir = str(tmp_path)
+    dc.connection = MagicMock()
+    dc.connection.cursor.return_value.fetchall.return_value = [
+        ("Vehicles", "data/vehicles.json", "changed", loaded.count, loaded.hexdigest()),
+        ("Sessions", "data/pdata/p1-sessions.json", "changed", loaded_sessions.count, loaded_sessions.hexdigest()),
+    ]
+    dc.session_files = MagicMock(return_value=[str(tmp_path / "data" / "pdata" / "p1-sessions.json")])
+    received = {}
+    for insert in ["insert_user", "insert_vehicle", "insert_parking_lots", "insert_payment",
+                   "insert_reservations"]:
+        setattr(dc, insert, MagicMock(side_effect=lambda data, name=insert: len(received.setdefault(name, list(data)))))
+    dc.insert_sessions = MagicMock(side_effect=lambda data, lookups: len(received.setdefault("sessions", list(data))))
+    dc.save_checkpoint = MagicMock()
+    dc.load_session_lookups = MagicMock(return_value=({}, {}))
+    dc.convert()
+    assert received["insert_vehicle"] == [{"license_plate": "B"}]
+    assert received["sessions"] == [("2", {})]
+    vehicles = next(c.args for c in dc.save_checkpoint.call_args_list if c.args[0] == "Vehicles")
+    assert vehicles[3] == 2
+    assert loaded_prefix(iter([{"license_plate": "A"}, {"license_plate": "B"}]), vehicles[3:]) == 2
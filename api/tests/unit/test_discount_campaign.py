@@ -0,0 +1,8 @@
+from api.utilities.discount_campaign import CODE_ALPHABET, generate_codes
+
+
+def test_generate_codes_are_unique_and_prefixed():
+    codes = generate_codes("SPRING-", 8, 1000)
+    assert len(set(codes)) == 1000
+    assert all(code.startswith("SPRING-") and len(code) == 15 for code in codes)
+    assert all(char in CODE_ALPHABET for code in codes for char in code[7:])
@@ -0,0 +1,131 @@
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+import pytest
+from api.datatypes.discount_code import DiscountCampaignCreate
+from api.models.discount_code_model import DiscountCodeModel, discount_code_cache
+
+COLUMNS = ["code", "active", "used_count", "locations"]
+
+
+def create_model(rows):
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = rows
+    mock_cursor.fetchone.return_value = rows[0] if rows else None
+    mock_cursor.description = [(column,) for column in COLUMNS]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    with patch("api.models.discount_code_model.psycopg2.connect", return_value=mock_conn):
+        model = DiscountCodeModel()
+    return model, mock_cursor
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    discount_code_cache.invalidate()
+    yield
+    discount_code_cache.invalidate()
+
+
+def test_listing_many_codes_takes_one_query():
+    rows = [(f"CODE{i}", i % 2 == 0, 0, ["Centrum"]) for i in range(50_000)]
+    model, mock_cursor = create_model(rows)
+
+    codes = model.get_all_discount_codes()
+
+    assert len(codes) == 50_000
+    assert codes[0]["locations"] == ["Centrum"]
+    assert mock_cursor.execute.call_count == 1
+
+
+def test_listing_is_served_from_cache():
+    model, mock_cursor = create_model([("A", True, 0, []), ("B", False, 0, [])])
+
+    model.get_all_discount_codes()
+    active = model.get_all_active_discount_codes()
+
+    assert [code["code"] for code in active] == ["A"]
+    assert mock_cursor.execute.call_count == 1
+
+
+def test_changing_a_returned_code_does_not_change_the_cache():
+    model, _ = create_model([("A", True, 0, [])])
+    model.get_all_discount_codes()[0]["active"] = False
+    assert model.get_all_discount_codes()[0]["active"] is True
+
+
+def test_increment_used_count_invalidates_cache():
+    model, mock_cursor = create_model([("A", True, 0, [])])
+
+    model.get_all_discount_codes()
+    model.increment_used_count("A")
+    model.get_all_discount_codes()
+
+    assert mock_cursor.execute.call_count == 3
+
+
+def test_redeem_discount_code_checks_and_uses_code_in_one_statement():
+    model, mock_cursor = create_model([("A", True, 1, [])])
+    model.get_all_discount_codes()
+    now = datetime(2026, 1, 1, 12)
+
+    redeemed = model.redeem_discount_code("A", 2, "Centrum", now)
+
+    assert redeemed["code"] == "A"
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "used_count < d.use_amount" in sql
+    assert params == {"code": "A", "user_id": 2, "location": "Centrum", "now": now}
+    assert discount_code_cache.get("all") is None
+
+
+def test_redeem_discount_code_without_match_keeps_cache():
+    model, mock_cursor = create_model([("A", True, 1, [])])
+    model.get_all_discount_codes()
+    mock_cursor.fetchone.return_value = None
+
+    assert model.redeem_discount_code("A", 2, "Centrum", datetime(2026, 1, 1, 12)) is None
+    assert discount_code_cache.get("all") is not None
+
+
+def test_create_discount_campaign_replaces_existing_codes():
+    model, mock_cursor = create_model([])
+    mock_cursor.fetchall.side_effect = [[("NEW-A",), ("NEW-B",)], [("NEW-D",)]]
+    batches = iter([["NEW-A", "NEW-B", "NEW-C"], ["NEW-D"]])
+    campaign = DiscountCampaignCreate(prefix="NEW-", count=3, discount_type="fixed",
+                                      discount_value=1, locations=["Centrum"])
+
+    codes = model.create_discount_campaign(campaign, lambda count: next(batches))
+
+    assert codes == ["NEW-A", "NEW-B", "NEW-D"]
+    copies = [c.args for c in mock_cursor.copy_expert.call_args_list]
+    assert copies[0][1].getvalue() == "NEW-A\nNEW-B\nNEW-C\n"
+    assert copies[1][1].getvalue() == "NEW-D\n"
+    assert copies[2][1].getvalue() == "NEW-A\tCentrum\nNEW-B\tCentrum\nNEW-D\tCentrum\n"
+    model.connection.commit.assert_called_once()
+
+
+def test_create_discount_campaign_gives_up_after_too_many_conflicts():
+    model, mock_cursor = create_model([])
+    mock_cursor.fetchall.return_value = []
+    campaign = DiscountCampaignCreate(prefix="NEW-", count=1, discount_type="fixed",
+                                      discount_value=1)
+
+    with pytest.raises(RuntimeError):
+        model.create_discount_campaign(campaign, lambda count: ["NEW-A"])
+    model.connection.rollback.assert_called_once()
+
+
+def test_release_discount_code_gives_a_use_back():
+    model, mock_cursor = create_model([("A", True, 1, [])])
+    model.get_all_discount_codes()
+
+    assert model.release_discount_code("A") is True
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "used_count = used_count - 1" in sql and "used_count > 0" in sql
+    assert params == ("A",)
+    assert discount_code_cache.get("all") is None
+
+
+def test_release_discount_code_never_goes_below_zero():
+    model, mock_cursor = create_model([])
+    mock_cursor.fetchone.return_value = None
+    assert model.release_discount_code("A") is False
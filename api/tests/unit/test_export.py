@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from datetime import datetime
+from api.utilities.export import csv_chunks, export_chunks, ndjson_chunks
+
+
+COLUMNS = ("id", "amount", "date")
+CHUNKS = [
+    [(1, 2.5, datetime(2025, 1, 1, 10, 0)), (2, 3.0, datetime(2025, 1, 1, 11, 0))],
+    [(3, None, datetime(2025, 1, 2, 9, 30))],
+]
+
+
+def test_csv_chunks_writes_header_once():
+    output = "".join(csv_chunks(COLUMNS, CHUNKS))
+    rows = list(csv.reader(io.StringIO(output)))
+    assert rows[0] == ["id", "amount", "date"]
+    assert rows[1] == ["1", "2.5", "2025-01-01 10:00:00"]
+    assert rows[3] == ["3", "", "2025-01-02 09:30:00"]
+    assert len(rows) == 4
+
+
+def test_csv_chunks_yields_per_chunk():
+    assert len(list(csv_chunks(COLUMNS, CHUNKS))) == 3
+
+
+def test_ndjson_chunks_writes_one_object_per_line():
+    lines = "".join(ndjson_chunks(COLUMNS, CHUNKS)).splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[0]) == {"id": 1, "amount": 2.5,
+                                    "date": "2025-01-01T10:00:00"}
+    assert json.loads(lines[2])["amount"] is None
+
+
+def test_export_chunks_without_rows():
+    assert "".join(export_chunks("csv", COLUMNS, [])) == "id,amount,date\n"
+    assert "".join(export_chunks("ndjson", COLUMNS, [])) == ""
@@ -0,0 +1,102 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from api.utilities.idempotency import IdempotencyMiddleware
+
+
+class MemoryStore:
+    def __init__(self):
+        self.keys = {}
+
+    def reserve(self, scope, key, fingerprint, ttl):
+        stored = self.keys.get((scope, key))
+        if stored is None:
+            self.keys[(scope, key)] = {"fingerprint": fingerprint, "status_code": None,
+                                       "body": b"", "content_type": None}
+        return stored
+
+    def complete(self, scope, key, status_code, body, content_type):
+        self.keys[(scope, key)].update(status_code=status_code, body=body,
+                                       content_type=content_type)
+
+    def release(self, scope, key):
+        self.keys.pop((scope, key), None)
+
+
+def create_client():
+    app = FastAPI()
+    calls = []
+
+    @app.post("/payments", status_code=201)
+    async def create_payment(payment: dict):
+        calls.append(payment)
+        return {"message": "Payment created successfully", "count": len(calls)}
+
+    @app.post("/payments/{payment_id}/pay")
+    async def pay_payment(payment_id: int):
+        calls.append(payment_id)
+        raise HTTPException(status_code=503, detail="Payment provider unavailable")
+
+    store = MemoryStore()
+    app.add_middleware(IdempotencyMiddleware, store=store)
+    return TestClient(app), calls, store
+
+
+def test_retry_replays_stored_response():
+    client, calls, _ = create_client()
+    headers = {"Idempotency-Key": "abc", "Authorization": "Bearer token"}
+
+    first = client.post("/payments", json={"amount": 5}, headers=headers)
+    second = client.post("/payments", json={"amount": 5}, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 1
+
+
+def test_requests_without_key_are_not_stored():
+    client, calls, store = create_client()
+    client.post("/payments", json={"amount": 5})
+    client.post("/payments", json={"amount": 5})
+    assert len(calls) == 2
+    assert store.keys == {}
+
+
+def test_key_is_scoped_to_caller():
+    client, calls, _ = create_client()
+    client.post("/payments", json={"amount": 5},
+                headers={"Idempotency-Key": "abc", "Authorization": "Bearer one"})
+    client.post("/payments", json={"amount": 5},
+                headers={"Idempotency-Key": "abc", "Authorization": "Bearer two"})
+    assert len(calls) == 2
+
+
+def test_reused_key_with_different_body_is_rejected():
+    client, calls, _ = create_client()
+    headers = {"Idempotency-Key": "abc"}
+    client.post("/payments", json={"amount": 5}, headers=headers)
+    response = client.post("/payments", json={"amount": 6}, headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+    assert len(calls) == 1
+
+
+def test_request_in_progress_is_rejected():
+    client, calls, store = create_client()
+    headers = {"Idempotency-Key": "abc"}
+    client.post("/payments", json={"amount": 5}, headers=headers)
+    for stored in store.keys.values():
+        stored["status_code"] = None
+    response = client.post("/payments", json={"amount": 5}, headers=headers)
+    assert response.status_code == 409
+    assert len(calls) == 1
+
+
+def test_server_errors_can_be_retried():
+    client, calls, store = create_client()
+    headers = {"Idempotency-Key": "abc"}
+    client.post("/payments/1/pay", headers=headers)
+    response = client.post("/payments/1/pay", headers=headers)
+    assert response.status_code == 503
+    assert len(calls) == 2
+    assert store.keys == {}
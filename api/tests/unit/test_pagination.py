@@ -0,0 +1,46 @@
+import pytest
+from datetime import datetime
+from fastapi import HTTPException
+from api.utilities.pagination import decode_cursor, encode_cursor, paginate
+
+
+PARSERS = (datetime.fromisoformat, int)
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor(datetime(2025, 1, 1, 10, 30), 42)
+    assert decode_cursor(cursor, PARSERS) == (datetime(2025, 1, 1, 10, 30), 42)
+
+
+def test_cursor_roundtrip_of_missing_date():
+    # Payments without a date are paginated with datetime.min as their date
+    cursor = encode_cursor(datetime.min, 7)
+    assert decode_cursor(cursor, PARSERS) == (datetime.min, 7)
+
+
+def test_decode_cursor_without_cursor():
+    assert decode_cursor(None, PARSERS) is None
+    assert decode_cursor("", PARSERS) is None
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor(42),
+    encode_cursor("yesterday", 42),
+])
+def test_decode_cursor_rejects_invalid_cursors(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor, PARSERS)
+    assert e.value.status_code == 400
+
+
+def test_paginate_last_page_has_no_cursor():
+    page, cursor = paginate([1, 2, 3], 3, lambda x: (x,))
+    assert page == [1, 2, 3]
+    assert cursor is None
+
+
+def test_paginate_returns_cursor_of_last_row():
+    page, cursor = paginate([1, 2, 3, 4], 3, lambda x: (x,))
+    assert page == [1, 2, 3]
+    assert decode_cursor(cursor, (int,)) == (3,)
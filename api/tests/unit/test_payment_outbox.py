@@ -0,0 +1,111 @@
+from unittest.mock import patch, MagicMock
+import psycopg2
+from api.datatypes.payment import PaymentCreate
+from api.models.payment_outbox_model import PaymentOutboxModel, enqueue_payment, enqueue_payments
+from api.session_calculator import generate_payment_hash
+
+
+def create_model(rows):
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = rows
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    with patch("api.models.payment_outbox_model.get_connection", return_value=mock_conn):
+        model = PaymentOutboxModel()
+    return model, mock_conn, mock_cursor
+
+
+def test_enqueue_payment_does_not_commit():
+    mock_cursor = MagicMock()
+    enqueue_payment(mock_cursor, PaymentCreate(parking_lot_id=1, user_id=2,
+                                               amount=5.0, session_id=3))
+    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_args[0][1] == (2, 1, 3, None, 5.0)
+
+
+def test_process_batch_inserts_payments_in_bulk():
+    rows = [(10, 2, 1, 3, None, 5.0, "AB-12-CD"),
+            (11, 4, 1, None, 7, 12.5, None)]
+    model, mock_conn, mock_cursor = create_model(rows)
+
+    with patch("api.models.payment_outbox_model.execute_values") as mock_execute_values:
+        assert model.process_batch(500) == 2
+
+    payments = mock_execute_values.call_args[0][2]
+    assert payments[0][:5] == (2, 1, None, 3, generate_payment_hash("3", "AB-12-CD"))
+    assert payments[1][:5] == (4, 1, 7, None, generate_payment_hash("7", ""))
+    assert mock_cursor.execute.call_args[0][1] == ([10, 11],)
+    mock_conn.commit.assert_called_once()
+
+
+def test_process_batch_without_rows():
+    model, mock_conn, _ = create_model([])
+    with patch("api.models.payment_outbox_model.execute_values") as mock_execute_values:
+        assert model.process_batch(500) == 0
+    mock_execute_values.assert_not_called()
+    mock_conn.commit.assert_not_called()
+
+
+def test_drain_stops_when_outbox_is_empty():
+    model, _, _ = create_model([])
+    with patch.object(model, "process_batch", side_effect=[2, 2, 1]) as mock_batch:
+        assert model.drain(batch_size=2) == 5
+    assert mock_batch.call_count == 3
+
+
+def test_enqueue_payments_uses_one_statement():
+    mock_cursor = MagicMock()
+    payments = [PaymentCreate(parking_lot_id=1, user_id=2, amount=5.0, reservation_id=3),
+                PaymentCreate(parking_lot_id=1, user_id=2, amount=7.5, reservation_id=4)]
+    with patch("api.models.payment_outbox_model.execute_values") as mock_execute_values:
+        enqueue_payments(mock_cursor, payments)
+    mock_execute_values.assert_called_once()
+    assert mock_execute_values.call_args[0][2] == [(2, 1, None, 3, 5.0), (2, 1, None, 4, 7.5)]
+
+
+def test_process_batch_moves_failing_rows_to_dead_letters():
+    # Row 11 belongs to a reservation that was deleted before the outbox drained
+    rows = [(10, 2, 1, 3, None, 5.0, "AB-12-CD"),
+            (11, 4, 1, None, 7, 12.5, None),
+            (12, 5, 1, 4, None, 3.0, "EF-34-GH")]
+    model, mock_conn, mock_cursor = create_model(rows)
+
+    def insert(cursor, sql, payments, page_size=100):
+        if len(payments) > 1 or payments[0][2] == 7:
+            raise psycopg2.IntegrityError("reservation 7 does not exist")
+
+    with patch("api.models.payment_outbox_model.execute_values", side_effect=insert):
+        assert model.process_batch(500) == 2
+
+    statements = [c.args for c in mock_cursor.execute.call_args_list]
+    dead_letters = [args for args in statements if "payment_outbox_dead_letters" in args[0]]
+    assert [args[1][1] for args in dead_letters] == [11]
+    assert statements[-1][1] == ([10, 11, 12],)
+    mock_conn.commit.assert_called_once()
+
+
+def test_add_to_pending_payment_updates_outbox_row():
+    model, mock_conn, mock_cursor = create_model([])
+    mock_cursor.fetchone.return_value = (17.5,)
+
+    assert model.add_to_pending_payment(7, 5.0) == 17.5
+
+    mock_cursor.execute.assert_called_once()
+    assert "UPDATE payment_outbox" in mock_cursor.execute.call_args[0][0]
+    assert mock_cursor.execute.call_args[0][1] == (5.0, 7)
+    mock_conn.commit.assert_called_once()
+
+
+def test_add_to_pending_payment_falls_back_to_open_payment():
+    model, _, mock_cursor = create_model([])
+    mock_cursor.fetchone.side_effect = [None, (22.5,)]
+
+    assert model.add_to_pending_payment(7, 10.0) == 22.5
+    assert "UPDATE payments" in mock_cursor.execute.call_args[0][0]
+
+
+def test_add_to_pending_payment_without_open_payment():
+    model, _, mock_cursor = create_model([])
+    mock_cursor.fetchone.return_value = None
+
+    assert model.add_to_pending_payment(7, 10.0) is None
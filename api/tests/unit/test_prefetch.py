@@ -0,0 +1,50 @@
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import patch, MagicMock
+import pytest
+from api.utilities.prefetch import gather_queries, query
+
+
+class LookupModel:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def lookup(self, value):
+        return self.connection, value
+
+    def fail(self):
+        raise ValueError("lookup failed")
+
+
+def fake_pool(connections):
+    @contextmanager
+    def pooled_connection():
+        yield connections.pop(0)
+    return pooled_connection
+
+
+def test_queries_run_on_pooled_connections():
+    model = LookupModel("model connection")
+    pooled = fake_pool(["pooled 1", "pooled 2"])
+    with patch("api.utilities.prefetch.pooled_connection", side_effect=pooled):
+        results = asyncio.run(gather_queries(query(model.lookup, 1), query(model.lookup, 2)))
+
+    assert sorted(connection for connection, _ in results) == ["pooled 1", "pooled 2"]
+    assert [value for _, value in results] == [1, 2]
+    assert model.connection == "model connection"
+
+
+def test_unbound_callables_are_called_directly():
+    mock_lookup = MagicMock(return_value=42)
+    with patch("api.utilities.prefetch.pooled_connection") as mock_pool:
+        assert asyncio.run(gather_queries(query(mock_lookup, 1))) == [42]
+    mock_pool.assert_not_called()
+    mock_lookup.assert_called_once_with(1)
+
+
+def test_first_error_is_raised_after_all_queries_finish():
+    model = LookupModel("model connection")
+    pooled = fake_pool(["pooled 1", "pooled 2"])
+    with patch("api.utilities.prefetch.pooled_connection", side_effect=pooled):
+        with pytest.raises(ValueError):
+            asyncio.run(gather_queries(query(model.fail), query(model.lookup, 2)))
@@ -0,0 +1,94 @@
+import pytest
+from datetime import date, datetime
+from pydantic import ValidationError
+from api.datatypes.reservation import ReservationRecurrence
+from api.utilities.recurrence import expand_recurrence, find_overlap
+
+
+def test_expand_recurrence_on_weekdays():
+    recurrence = ReservationRecurrence(
+        start_time=datetime(2027, 3, 5, 8, 30),  # a Friday
+        end_time=datetime(2027, 3, 5, 17, 0),
+        until=date(2027, 3, 10),
+    )
+    windows = expand_recurrence(recurrence)
+    assert [start.day for start, _ in windows] == [5, 8, 9, 10]
+    assert windows[1] == (datetime(2027, 3, 8, 8, 30), datetime(2027, 3, 8, 17, 0))
+
+
+def test_expand_recurrence_keeps_overnight_duration():
+    recurrence = ReservationRecurrence(
+        start_time=datetime(2027, 3, 6, 22, 0),  # a Saturday
+        end_time=datetime(2027, 3, 7, 6, 0),
+        until=date(2027, 3, 20),
+        weekdays=[5],
+    )
+    windows = expand_recurrence(recurrence)
+    assert windows == [
+        (datetime(2027, 3, 6, 22, 0), datetime(2027, 3, 7, 6, 0)),
+        (datetime(2027, 3, 13, 22, 0), datetime(2027, 3, 14, 6, 0)),
+        (datetime(2027, 3, 20, 22, 0), datetime(2027, 3, 21, 6, 0)),
+    ]
+
+
+def test_expand_recurrence_until_before_start():
+    recurrence = ReservationRecurrence(
+        start_time=datetime(2027, 3, 5, 8, 30),
+        end_time=datetime(2027, 3, 5, 17, 0),
+        until=date(2027, 3, 1),
+    )
+    assert expand_recurrence(recurrence) == []
+
+
+def test_find_overlap():
+    first = (datetime(2027, 3, 5, 8, 0), datetime(2027, 3, 5, 18, 0))
+    second = (datetime(2027, 3, 5, 9, 0), datetime(2027, 3, 5, 10, 0))
+    third = (datetime(2027, 3, 6, 8, 0), datetime(2027, 3, 6, 18, 0))
+    assert find_overlap([third, second, first]) == (first, second)
+    assert find_overlap([first, third]) is None
+
+
+def test_find_overlap_touching_windows():
+    first = (datetime(2027, 3, 5, 8, 0), datetime(2027, 3, 5, 9, 0))
+    second = (datetime(2027, 3, 5, 9, 0), datetime(2027, 3, 5, 10, 0))
+    assert find_overlap([first, second]) is None
+
+
+def test_expand_recurrence_stops_after_limit():
+    recurrence = ReservationRecurrence(
+        start_time=datetime(2027, 3, 1, 8, 30),
+        end_time=datetime(2027, 3, 1, 17, 0),
+        until=date(2028, 2, 28),
+        weekdays=[0, 1, 2, 3, 4, 5, 6],
+    )
+    assert len(expand_recurrence(recurrence, limit=10)) == 11
+    assert len(expand_recurrence(recurrence)) == 365
+
+
+def test_recurrence_until_at_most_a_year_after_start():
+    with pytest.raises(ValidationError):
+        ReservationRecurrence(
+            start_time=datetime(2027, 3, 1, 8, 30),
+            end_time=datetime(2027, 3, 1, 17, 0),
+            until=date(9999, 12, 31),
+        )
+
+
+def test_recurrence_needs_weekdays():
+    with pytest.raises(ValidationError):
+        ReservationRecurrence(
+            start_time=datetime(2027, 3, 1, 8, 30),
+            end_time=datetime(2027, 3, 1, 17, 0),
+            until=date(2027, 4, 1),
+            weekdays=[],
+        )
+
+
+def test_expand_recurrence_until_last_date():
+    recurrence = ReservationRecurrence(
+        start_time=datetime(9999, 12, 30, 8, 30),
+        end_time=datetime(9999, 12, 30, 17, 0),
+        until=date(9999, 12, 31),
+        weekdays=[0, 1, 2, 3, 4, 5, 6],
+    )
+    assert len(expand_recurrence(recurrence)) == 2
@@ -0,0 +1,107 @@
+import pytest
+import psycopg2
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+from api.datatypes.reservation import ReservationCreate
+from api.models.parking_lot_model import ParkingLotFullError
+from api.models.reservation_model import ReservationModel, ReservationOverlapError
+
+
+def create_model():
+    mock_cursor = MagicMock()
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    with patch("api.models.reservation_model.psycopg2.connect", return_value=mock_conn):
+        model = ReservationModel()
+    return model, mock_conn, mock_cursor
+
+
+RESERVATION = ReservationCreate(
+    user_id=2,
+    vehicle_id=3,
+    parking_lot_id=1,
+    start_time=datetime(2027, 12, 10, 9, 0),
+    end_time=datetime(2027, 12, 10, 18, 0),
+)
+
+
+def test_create_reservation_overlap_raises():
+    model, mock_conn, mock_cursor = create_model()
+    mock_cursor.execute.side_effect = psycopg2.errors.ExclusionViolation()
+
+    with pytest.raises(ReservationOverlapError) as e:
+        model.create_reservation(RESERVATION, 10.0)
+
+    assert e.value.vehicle_id == 3
+    mock_conn.rollback.assert_called_once()
+    mock_conn.commit.assert_not_called()
+
+
+def test_has_overlapping_reservation():
+    model, _, mock_cursor = create_model()
+    mock_cursor.__enter__.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = (True,)
+
+    assert model.has_overlapping_reservation(
+        3, RESERVATION.start_time, RESERVATION.end_time) is True
+    assert mock_cursor.execute.call_args[0][1] == (
+        3, RESERVATION.start_time, RESERVATION.end_time)
+
+
+def test_overlap_checks_ignore_no_show_reservations():
+    model, _, mock_cursor = create_model()
+    mock_cursor.__enter__.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = (False,)
+    mock_cursor.fetchall.return_value = []
+
+    model.has_overlapping_reservation(3, RESERVATION.start_time, RESERVATION.end_time)
+    model.get_overlapping_windows(3, [(RESERVATION.start_time, RESERVATION.end_time)])
+
+    for call in mock_cursor.execute.call_args_list:
+        assert "status IS DISTINCT FROM 'No Show'" in call[0][0]
+
+
+def test_create_reservation_full_lot_rolls_back():
+    model, mock_conn, mock_cursor = create_model()
+
+    with patch("api.models.reservation_model.book_slots",
+               side_effect=ParkingLotFullError(1)):
+        with pytest.raises(ParkingLotFullError):
+            model.create_reservation(RESERVATION, 10.0)
+
+    mock_cursor.execute.assert_not_called()
+    mock_conn.rollback.assert_called_once()
+    mock_conn.commit.assert_not_called()
+
+
+def test_create_reservations_in_one_transaction():
+    model, mock_conn, _ = create_model()
+    windows = [(datetime(2027, 12, 10, 9, 0), datetime(2027, 12, 10, 18, 0)),
+               (datetime(2027, 12, 11, 9, 0), datetime(2027, 12, 11, 18, 0))]
+    rows = [(8, windows[1][0]), (7, windows[0][0])]
+
+    with patch("api.models.reservation_model.book_windows") as mock_book, \
+            patch("api.models.reservation_model.execute_values", return_value=rows), \
+            patch("api.models.reservation_model.enqueue_payments") as mock_enqueue:
+        ids = model.create_reservations(2, 3, 1, windows, [10.0, 12.5])
+
+    assert ids == [7, 8]
+    mock_book.assert_called_once()
+    payments = mock_enqueue.call_args[0][1]
+    assert [(p.reservation_id, p.amount) for p in payments] == [(7, 10.0), (8, 12.5)]
+    mock_conn.commit.assert_called_once()
+
+
+def test_delete_reservation_before_outbox_drains_removes_its_payment():
+    model, mock_conn, mock_cursor = create_model()
+    mock_cursor.fetchone.return_value = (1, RESERVATION.start_time, RESERVATION.end_time)
+
+    with patch("api.models.reservation_model.release_slots") as mock_release, \
+            patch("api.models.reservation_model.invalidate_availability"):
+        assert model.delete_reservation(7) is True
+
+    statements = [c.args for c in mock_cursor.execute.call_args_list]
+    assert statements[0] == ("DELETE FROM payment_outbox WHERE reservation_id = %s;", (7,))
+    assert "DELETE FROM reservations" in statements[1][0]
+    mock_release.assert_called_once_with(mock_cursor, 1, RESERVATION.start_time, RESERVATION.end_time)
+    mock_conn.commit.assert_called_once()
@@ -0,0 +1,68 @@
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+from api import jobs
+from api.models.reservation_sweep_model import ReservationSweepModel
+
+
+def create_model(rows):
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = rows
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    with patch("api.models.reservation_sweep_model.get_connection", return_value=mock_conn):
+        model = ReservationSweepModel()
+    return model, mock_conn, mock_cursor
+
+
+def test_expire_no_shows_releases_remaining_windows_per_lot():
+    rows = [(1, datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 12)),
+            (2, datetime(2026, 1, 1, 11), datetime(2026, 1, 1, 13)),
+            (1, datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 11)),
+            (1, datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 9))]
+    model, mock_conn, mock_cursor = create_model(rows)
+
+    with patch("api.models.reservation_sweep_model.release_windows") as mock_release, \
+            patch("api.models.reservation_sweep_model.invalidate_availability") as mock_invalidate:
+        assert model.expire_no_shows(500, 30) == 4
+
+    assert [c.args[1:] for c in mock_release.call_args_list] == [
+        (1, [(datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 12)),
+             (datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 11))]),
+        (2, [(datetime(2026, 1, 1, 11), datetime(2026, 1, 1, 13))]),
+    ]
+    mock_conn.commit.assert_called_once()
+    assert {c.args[0] for c in mock_invalidate.call_args_list} == {1, 2}
+
+
+def test_expire_no_shows_without_rows():
+    model, mock_conn, _ = create_model([])
+    with patch("api.models.reservation_sweep_model.release_windows") as mock_release:
+        assert model.expire_no_shows(500, 30) == 0
+    mock_release.assert_not_called()
+
+
+def test_sweep_skips_when_another_worker_holds_the_lock():
+    model, mock_conn, _ = create_model([])
+    with patch("api.jobs.ReservationSweepModel", return_value=model), \
+            patch.object(model, "try_lock", return_value=False), \
+            patch.object(model, "expire_no_shows") as mock_expire:
+        assert jobs.sweep_reservations()["expired"] == 0
+    mock_expire.assert_not_called()
+    mock_conn.close.assert_called_once()
+
+
+def test_sweep_runs_batches_until_done_and_unlocks():
+    model, mock_conn, _ = create_model([])
+    with patch("api.jobs.ReservationSweepModel", return_value=model), \
+            patch("api.jobs.RESERVATION_SWEEP_BATCH_SIZE", 2), \
+            patch.object(model, "try_lock", return_value=True), \
+            patch.object(model, "expire_no_shows", side_effect=[2, 2, 1]) as mock_expire, \
+            patch.object(model, "reconcile_reserved", return_value=3), \
+            patch.object(model, "unlock") as mock_unlock:
+        result = jobs.sweep_reservations()
+
+    assert result["expired"] == 5
+    assert result["corrected_lots"] == 3
+    assert mock_expire.call_count == 3
+    mock_unlock.assert_called_once()
+    mock_conn.close.assert_called_once()
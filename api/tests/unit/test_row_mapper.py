@@ -0,0 +1,102 @@
+from datetime import datetime, date
+from api.datatypes.parking_lot import ParkingLot
+from api.datatypes.session import Session
+from api.datatypes.user import User, UserRole
+from api.models.row_mapper import RowMapper
+
+
+class MockCursor:
+    def __init__(self, columns, rows):
+        self.description = [(column,) for column in columns]
+        self.rows = rows
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+
+SESSION_COLUMNS = ["id", "parking_lot_id", "user_id", "vehicle_id",
+                   "reservation_id", "start_time", "end_time", "cost"]
+
+
+def session_row(sid, cost=2.5):
+    return (sid, 1, 2, 3, None, datetime(2025, 1, 1, 10), datetime(2025, 1, 1, 12), cost)
+
+
+def test_map_rows_builds_objects():
+    mapper = RowMapper(Session)
+    cursor = MockCursor(SESSION_COLUMNS, [session_row(1), session_row(2)])
+    sessions = mapper.map_rows(cursor)
+    assert [s.id for s in sessions] == [1, 2]
+    assert isinstance(sessions[0], Session)
+    assert sessions[0].start_time == datetime(2025, 1, 1, 10)
+    assert sessions[0].cost == 2.5
+
+
+def test_map_rows_ignores_unknown_columns():
+    mapper = RowMapper(Session)
+    cursor = MockCursor(SESSION_COLUMNS + ["license_plate"],
+                        [session_row(1) + ("AB-12-CD",)])
+    session = mapper.map_one(cursor)
+    assert session.id == 1
+    assert not hasattr(session, "license_plate")
+
+
+def test_map_rows_caches_layout_per_description():
+    mapper = RowMapper(Session)
+    mapper.map_rows(MockCursor(SESSION_COLUMNS, [session_row(1)]))
+    mapper.map_rows(MockCursor(SESSION_COLUMNS, [session_row(2)]))
+    assert len(mapper._layouts) == 1
+    mapper.map_rows(MockCursor(["id", "parking_lot_id"], []))
+    assert len(mapper._layouts) == 2
+
+
+def test_map_rows_fills_defaults_for_missing_columns():
+    mapper = RowMapper(ParkingLot)
+    cursor = MockCursor(
+        ["id", "name", "location", "address", "capacity", "reserved",
+         "tariff", "daytariff", "lat", "lng"],
+        [(1, "Lot", "Loc", "Addr", 10, 0, 1.5, 10.0, 0.0, 0.0)])
+    lot = mapper.map_one(cursor)
+    assert lot.status is None
+    assert lot.created_at is None
+
+
+def test_map_rows_converts_enum_fields():
+    mapper = RowMapper(User)
+    cursor = MockCursor(
+        ["id", "username", "password", "email", "name", "created_at", "role"],
+        [(1, "user", "pw", "a@b.c", "name", datetime(2025, 1, 1), "superadmin")])
+    user = mapper.map_one(cursor)
+    assert user.role is UserRole.SUPERADMIN
+
+
+def test_map_rows_skips_unknown_enum_values():
+    mapper = RowMapper(User)
+    cursor = MockCursor(
+        ["id", "username", "password", "email", "name", "created_at", "role"],
+        [(1, "user", "pw", "a@b.c", "name", datetime(2025, 1, 1), "admin")])
+    assert mapper.map_rows(cursor) == []
+
+
+def test_strict_mode_skips_invalid_rows():
+    mapper = RowMapper(Session, strict=True)
+    cursor = MockCursor(SESSION_COLUMNS, [session_row(1), session_row(2, cost="free")])
+    sessions = mapper.map_rows(cursor)
+    assert [s.id for s in sessions] == [1]
+
+
+def test_strict_can_be_enabled_per_call():
+    mapper = RowMapper(ParkingLot)
+    cursor = MockCursor(
+        ["id", "name", "location", "address", "capacity", "reserved",
+         "tariff", "daytariff", "lat", "lng", "created_at"],
+        [(1, "Lot", "Loc", "Addr", "10", 0, 1.5, 10.0, 0.0, 0.0, "2025-01-01")])
+    lot = mapper.map_one(cursor, strict=True)
+    assert lot.capacity == 10
+    assert lot.created_at == date(2025, 1, 1)
+
+
+def test_map_one_returns_none_without_rows():
+    mapper = RowMapper(Session)
+    assert mapper.map_one(MockCursor(SESSION_COLUMNS, [])) is None
@@ -0,0 +1,29 @@
+import asyncio
+from api.utilities.scheduler import PeriodicJob
+
+
+def test_run_once_returns_result():
+    job = PeriodicJob("answer", 60, lambda: 42)
+    assert asyncio.run(job.run_once()) == 42
+
+
+def test_run_once_logs_failures(caplog):
+    def fail():
+        raise RuntimeError("database unavailable")
+
+    job = PeriodicJob("failing", 60, fail)
+    assert asyncio.run(job.run_once()) is None
+    assert "Job failing failed" in caplog.text
+
+
+def test_job_runs_every_interval():
+    calls = []
+
+    async def run():
+        job = PeriodicJob("counter", 0.01, lambda: calls.append(1))
+        job.start()
+        await asyncio.sleep(0.1)
+        await job.stop()
+
+    asyncio.run(run())
+    assert len(calls) >= 2
@@ -1,8 +1,11 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import numpy as np
 from api.session_calculator import (
     calculate_price,
+    calculate_prices,
     generate_payment_hash,
     generate_transaction_validation_hash,
+    simulate_revenue,
 )
 
 
@@ -69,3 +72,52 @@ def test_generate_transaction_validation_hash_is_uuid():
     hash1 = generate_transaction_validation_hash()
     hash2 = generate_transaction_validation_hash()
     assert hash1 != hash2
+
+
+def test_calculate_prices_matches_calculate_price():
+    base_time = datetime(2023, 1, 1, 12, 0, 0)
+    durations = [
+        timedelta(minutes=2),
+        timedelta(hours=1, minutes=10),
+        timedelta(hours=3),
+        timedelta(hours=11, minutes=59),
+        timedelta(hours=25),
+        timedelta(days=3, seconds=1),
+    ]
+    parking_lot = MockParkingLot(tariff=4.515, daytariff=13.545)
+    starts = [base_time for _ in durations]
+    ends = [base_time + duration for duration in durations]
+
+    prices = calculate_prices(starts, ends, parking_lot.tariff, parking_lot.daytariff)
+
+    for price, start, end in zip(prices, starts, ends):
+        expected = calculate_price(parking_lot, MockSession(start, end), None)
+        assert price == float(expected)
+
+
+def test_calculate_prices_per_session_tariffs():
+    base_time = datetime(2023, 1, 1, 12, 0, 0)
+    prices = calculate_prices(
+        [base_time, base_time],
+        [base_time + timedelta(hours=2), base_time + timedelta(hours=2)],
+        [1.0, 3.0],
+        [10.0, 5.0],
+    )
+    assert prices.tolist() == [2.0, 5.0]
+
+
+def test_simulate_revenue_per_day():
+    starts = np.array(["2023-01-01T10:00", "2023-01-01T12:00", "2023-01-02T09:00"],
+                      dtype="datetime64[us]")
+    ends = np.array(["2023-01-01T11:30", "2023-01-01T12:01", "2023-01-02T10:00"],
+                    dtype="datetime64[us]")
+
+    days = simulate_revenue([(starts[:2], ends[:2]), (starts[2:], ends[2:])],
+                            2.0, 10.0, 3.0, 10.0)
+
+    assert [day["date"] for day in days] == [date(2023, 1, 1), date(2023, 1, 2)]
+    assert days[0]["sessions"] == 2
+    assert days[0]["current_revenue"] == 4.0  # 2 hours * 2.0, second session is free
+    assert days[0]["projected_revenue"] == 6.0
+    assert days[1]["current_revenue"] == 2.0
+    assert days[1]["projected_revenue"] == 3.0
@@ -0,0 +1,166 @@
+"""
+This file contains the slot calculations of the parking lot availability.
+
+Every day of a parking lot is split in slots of SLOT_MINUTES minutes. The
+number of reservations that cover a slot is stored in one array per lot per
+day, so the availability of any window is a few array lookups.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Tuple
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOT = timedelta(minutes=SLOT_MINUTES)
+
+SlotRange = Tuple[date, int, int]
+
+
+def empty_day() -> List[int]:
+    """
+    Create the slots of a day without any reservations.
+
+    Returns:
+        list[int]: SLOTS_PER_DAY zeros.
+    """
+    return [0] * SLOTS_PER_DAY
+
+
+def slot_ranges(start_time: datetime, end_time: datetime) -> List[SlotRange]:
+    """
+    Split a window in the slots it covers per day.
+
+    A slot is covered when any part of it lies in the window, so the start
+    is rounded down and the end is rounded up to a whole slot.
+
+    Args:
+        start_time (datetime): The start of the window.
+        end_time (datetime): The end of the window.
+
+    Returns:
+        list[tuple[date, int, int]]: Per day the first slot and the slot
+            after the last covered slot, ordered by day.
+    """
+    ranges = []
+    day = start_time.date()
+    while True:
+        day_start = datetime.combine(day, time.min, tzinfo=start_time.tzinfo)
+        first = max(0, (start_time - day_start) // SLOT)
+        last = min(SLOTS_PER_DAY, -((day_start - end_time) // SLOT))
+        if first < last:
+            ranges.append((day, first, last))
+        day += timedelta(days=1)
+        if day_start + timedelta(days=1) >= end_time:
+            return ranges
+
+
+def has_room(slots_by_day: Dict[date, List[int]], ranges: List[SlotRange],
+             capacity: int) -> bool:
+    """
+    Check whether every slot in the ranges has a spot left.
+
+    Args:
+        slots_by_day (dict[date, list[int]]): The booked slots per day.
+        ranges (list[tuple[date, int, int]]): The slots to check.
+        capacity (int): The number of spots of the parking lot.
+
+    Returns:
+        bool: True if no slot in the ranges is fully booked.
+    """
+    for day, first, last in ranges:
+        slots = slots_by_day.get(day)
+        if slots is not None and max(slots[first:last]) >= capacity:
+            return False
+    return True
+
+
+def add_booking(slots_by_day: Dict[date, List[int]], ranges: List[SlotRange],
+                delta: int) -> Dict[date, List[int]]:
+    """
+    Add or remove one reservation from the booked slots.
+
+    Args:
+        slots_by_day (dict[date, list[int]]): The booked slots per day. Days
+            without slots are added.
+        ranges (list[tuple[date, int, int]]): The slots of the reservation.
+        delta (int): 1 to add the reservation, -1 to remove it.
+
+    Returns:
+        dict[date, list[int]]: The updated slots of the days in the ranges.
+    """
+    updated = {}
+    for day, first, last in ranges:
+        slots = slots_by_day.setdefault(day, empty_day())
+        slots[first:last] = [max(0, booked + delta) for booked in slots[first:last]]
+        updated[day] = slots
+    return updated
+
+
+def is_valid_granularity(minutes: int) -> bool:
+    """
+    Check whether a bucket size is a whole number of slots that divides a day.
+
+    Args:
+        minutes (int): The size of a bucket in minutes.
+
+    Returns:
+        bool: True if buckets of this size line up with the slots.
+    """
+    return (minutes > 0 and minutes % SLOT_MINUTES == 0
+            and SLOTS_PER_DAY % (minutes // SLOT_MINUTES) == 0)
+
+
+def days_between(start_time: datetime, end_time: datetime) -> List[date]:
+    """
+    List the days a window touches.
+
+    Args:
+        start_time (datetime): The start of the window.
+        end_time (datetime): The end of the window.
+
+    Returns:
+        list[date]: Every day from the day of the start up to the last day
+            that is part of the window.
+    """
+    return [day for day, _, _ in slot_ranges(start_time, end_time)]
+
+
+def free_capacity(slots_by_day: Dict[date, List[int]], capacity: int,
+                  start_time: datetime, end_time: datetime,
+                  granularity: int) -> List[dict]:
+    """
+    Compute the free spots per bucket of a window.
+
+    Buckets start at midnight, so the first bucket starts at or before the
+    start of the window. The free spots of a bucket are the spots that are
+    free during the whole bucket.
+
+    Args:
+        slots_by_day (dict[date, list[int]]): The booked slots per day.
+        capacity (int): The number of spots of the parking lot.
+        start_time (datetime): The start of the window.
+        end_time (datetime): The end of the window.
+        granularity (int): The size of a bucket in minutes, see
+            is_valid_granularity().
+
+    Returns:
+        list[dict]: Per bucket the start, end and number of free spots.
+    """
+    slots_per_bucket = granularity // SLOT_MINUTES
+    bucket_size = timedelta(minutes=granularity)
+    day_start = datetime.combine(start_time.date(), time.min, tzinfo=start_time.tzinfo)
+    bucket_start = day_start + (start_time - day_start) // bucket_size * bucket_size
+
+    buckets = []
+    while bucket_start < end_time:
+        day = bucket_start.date()
+        first = (bucket_start - datetime.combine(day, time.min, tzinfo=start_time.tzinfo)) // SLOT
+        slots = slots_by_day.get(day)
+        booked = max(slots[first:first + slots_per_bucket]) if slots else 0
+        buckets.append({
+            "start": bucket_start,
+            "end": bucket_start + bucket_size,
+            "free": max(0, capacity - booked),
+        })
+        bucket_start += bucket_size
+    return buckets
@@ -0,0 +1,87 @@
+"""
+This file contains a small in-process cache with a time to live per entry.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Keeps values in memory for at most ttl seconds.
+
+    Every API worker has its own cache, so entries are also invalidated
+    explicitly by the code that changes the cached data. The time to live
+    bounds how long another worker can serve an outdated value.
+
+    Attributes:
+        ttl (float): The number of seconds an entry is kept.
+        max_size (int): The maximum number of entries.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty cache.
+
+        Args:
+            ttl (float): The number of seconds an entry is kept.
+            max_size (int): The maximum number of entries. The oldest entry
+                is dropped when a new entry does not fit.
+            clock (Callable[[], float]): Returns the current time in seconds.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retrieve a value that has not expired.
+
+        Args:
+            key (Hashable): The key of the value.
+
+        Returns:
+            Any | None: The cached value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (Any): The value to cache.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_size:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (self._clock() + self.ttl, value)
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """
+        Remove entries from the cache.
+
+        Args:
+            predicate (Callable | None): Removes the entries whose key matches.
+                All entries are removed when no predicate is given.
+        """
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if predicate(key)]:
+                    del self._entries[key]
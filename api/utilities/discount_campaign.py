@@ -0,0 +1,42 @@
+"""
+This file contains the code generation of discount code campaigns.
+"""
+
+import re
+import secrets
+from typing import List
+
+# Upper case letters and digits without the easily confused 0, O, 1 and I
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+MAX_CAMPAIGN_SIZE = 100_000
+MIN_CODE_LENGTH = 6
+MAX_CODE_LENGTH = 32
+PREFIX_PATTERN = re.compile(r"^[A-Za-z0-9_-]{0,20}$")
+
+# Maps every random byte to a character. 256 is a multiple of the alphabet
+# size, so every character is equally likely.
+_BYTE_TO_CHAR = bytes.maketrans(
+    bytes(range(256)),
+    bytes(ord(CODE_ALPHABET[byte % len(CODE_ALPHABET)]) for byte in range(256)))
+
+
+def generate_codes(prefix: str, code_length: int, count: int) -> List[str]:
+    """
+    Generate unique random discount codes.
+
+    Args:
+        prefix (str): The text every code starts with.
+        code_length (int): The number of random characters after the prefix.
+        count (int): The number of codes.
+
+    Returns:
+        list[str]: count distinct codes. They can still collide with codes
+            that already exist in the database.
+    """
+    codes = set()
+    while len(codes) < count:
+        missing = count - len(codes)
+        chars = secrets.token_bytes(missing * code_length).translate(_BYTE_TO_CHAR).decode()
+        codes.update(prefix + chars[i:i + code_length]
+                     for i in range(0, len(chars), code_length))
+    return list(codes)
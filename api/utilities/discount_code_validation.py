@@ -2,7 +2,7 @@ from api.models.discount_code_model import DiscountCodeModel
 from api.datatypes.reservation import ReservationCreate
 from api.datatypes.parking_lot import ParkingLot
 from api.datatypes.user import User
-from api.datatypes.discount_code import DiscountCodeCreate, DiscountCodeUpdate
+from api.datatypes.discount_code import DiscountCampaignCreate, DiscountCodeCreate, DiscountCodeUpdate
 from fastapi import HTTPException
 from datetime import datetime, date
 from typing import Dict, Any
@@ -12,7 +12,46 @@ logger = logging.getLogger(__name__)
 discount_code_model: DiscountCodeModel = DiscountCodeModel()
 
 
-def use_discount_code_validation(discount_code: Dict[str, Any], reservation: ReservationCreate, current_user: User, parking_lot: ParkingLot):
+def use_discount_code_validation(discount_code: Dict[str, Any], reservation: ReservationCreate, current_user: User, parking_lot: ParkingLot) -> Dict[str, Any]:
+    """
+    Validate and use a discount code for a reservation.
+
+    The code is checked and its used_count is increased by one conditional
+    update. Only when the update does not match, the code is read again to
+    find out why it can not be used.
+
+    Raises:
+        HTTPException: 404 if the code no longer exists.
+        HTTPException: 400 if the code can not be used for this reservation.
+        HTTPException: 409 if the code changed while it was being redeemed.
+
+    Returns:
+        dict: The discount code after its use.
+    """
+    now = datetime.now()
+    redeemed = discount_code_model.redeem_discount_code(
+        discount_code["code"], current_user.id, parking_lot.location, now)
+    if redeemed is not None:
+        return redeemed
+
+    current = discount_code_model.get_discount_code_by_code(discount_code["code"])
+    if current is None:
+        logger.error("User ID %s tried to use discount code %s, but it was not found",
+                     current_user.id, reservation.discount_code)
+        raise HTTPException(status_code=404, detail="No discount code was found.")
+    raise_discount_code_error(current, reservation, current_user, parking_lot, now)
+
+
+def raise_discount_code_error(discount_code: Dict[str, Any], reservation: ReservationCreate, current_user: User, parking_lot: ParkingLot,
+                              now: datetime):
+    """
+    Raise the reason why a discount code could not be redeemed.
+
+    Raises:
+        HTTPException: 400 with the first check the code fails.
+        HTTPException: 409 if the code passes every check, which means it
+            changed after the redemption was attempted.
+    """
     if discount_code["user_id"] is not None and current_user.id != discount_code["user_id"]:
         logger.error("User ID %s tried to use discount code %s, "
                      "but doesn't have permission",
@@ -20,8 +59,10 @@ def use_discount_code_validation(discount_code: Dict[str, Any], reservation: Res
         raise HTTPException(status_code=400,
                             detail="This account can not use this discount code")
 
-    locations = discount_code_model.get_all_locations_by_code(
-        discount_code["code"])
+    locations = discount_code.get("locations")
+    if locations is None:
+        locations = discount_code_model.get_all_locations_by_code(
+            discount_code["code"])
     if locations and parking_lot.location not in locations:
         logger.error(
             "User ID %s tried to use discount code %s, but it is not applicable in location %s",
@@ -30,13 +71,12 @@ def use_discount_code_validation(discount_code: Dict[str, Any], reservation: Res
             status_code=400,
             detail="This discount code is not valid for this parking lot location")
     if discount_code["start_applicable_time"] is not None and discount_code["end_applicable_time"] is not None:
-        now = datetime.now().time()
-        if not (discount_code["start_applicable_time"] <= now <= discount_code["end_applicable_time"]):
+        if not (discount_code["start_applicable_time"] <= now.time() <= discount_code["end_applicable_time"]):
             logger.error(
                 "User ID %s tried to use discount code %s, but current time %s is not between %s and %s",
                 current_user.id,
                 discount_code["code"],
-                now,
+                now.time(),
                 discount_code["start_applicable_time"],
                 discount_code["end_applicable_time"])
             raise HTTPException(
@@ -52,28 +92,25 @@ def use_discount_code_validation(discount_code: Dict[str, Any], reservation: Res
     if end_date is not None:
         if isinstance(end_date, str):
             end_date = datetime.fromisoformat(end_date)
-        if datetime.now() >= end_date:
+        if now >= end_date:
             logger.error("User ID %s tried to use discount code %s, "
                          "but it has reached past it's end date %s",
                          current_user.id, reservation.discount_code, discount_code["end_date"])
             raise HTTPException(status_code=400,
                                 detail="This discount code has expired")
-    if discount_code["active"] is False:
+    if discount_code["active"] is not True:
         logger.error("User ID %s tried to use discount code %s, "
                      "but it it inactive",
                      current_user.id, reservation.discount_code)
         raise HTTPException(status_code=400,
                             detail="This discount code has expired")
-    incremented = discount_code_model.increment_used_count(
-        discount_code["code"])
-    if not incremented:
-        logger.error("Incrementing discount code's used count %s has failed",
-                     reservation.discount_code)
-        raise HTTPException(status_code=500,
-                            detail="Failed to increment discount code's use count")
+    logger.error("Discount code %s changed while user ID %s was redeeming it",
+                 reservation.discount_code, current_user.id)
+    raise HTTPException(status_code=409,
+                        detail="The discount code changed while it was being used, please try again")
 
 
-def create_or_update_discount_code_validation(d: DiscountCodeCreate | DiscountCodeUpdate, current_user: User):
+def create_or_update_discount_code_validation(d: DiscountCodeCreate | DiscountCodeUpdate | DiscountCampaignCreate, current_user: User):
     if d.discount_type is not None and d.discount_type != "percentage" and d.discount_type != "fixed":
         logger.error("Admin ID %s tried to create a discount code, but entered invalid discount type %s",
                      current_user.id, d.discount_type)
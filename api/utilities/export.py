@@ -0,0 +1,80 @@
+"""
+This file contains helpers to write query results as CSV or NDJSON streams.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Iterable, Iterator, Sequence
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(columns: Sequence[str],
+               chunks: Iterable[list[tuple]]) -> Iterator[str]:
+    """
+    Write chunks of rows as CSV, starting with a header line.
+
+    Args:
+        columns (Sequence[str]): The names of the columns.
+        chunks (Iterable[list[tuple]]): The rows, one chunk at a time.
+
+    Yields:
+        str: The CSV text of the header and of every chunk.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(columns: Sequence[str],
+                  chunks: Iterable[list[tuple]]) -> Iterator[str]:
+    """
+    Write chunks of rows as newline delimited JSON, one object per row.
+
+    Args:
+        columns (Sequence[str]): The names of the columns.
+        chunks (Iterable[list[tuple]]): The rows, one chunk at a time.
+
+    Yields:
+        str: The JSON lines of every chunk.
+    """
+    for rows in chunks:
+        yield "".join(
+            json.dumps({column: _json_value(value)
+                        for column, value in zip(columns, row)}) + "\n"
+            for row in rows)
+
+
+def export_chunks(export_format: str, columns: Sequence[str],
+                  chunks: Iterable[list[tuple]]) -> Iterator[str]:
+    """
+    Write chunks of rows in the requested export format.
+
+    Args:
+        export_format (str): Either "csv" or "ndjson".
+        columns (Sequence[str]): The names of the columns.
+        chunks (Iterable[list[tuple]]): The rows, one chunk at a time.
+
+    Returns:
+        Iterator[str]: The exported text, one chunk at a time.
+    """
+    if export_format == "csv":
+        return csv_chunks(columns, chunks)
+    return ndjson_chunks(columns, chunks)
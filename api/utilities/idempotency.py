@@ -0,0 +1,131 @@
+"""
+This file contains the middleware that handles the Idempotency-Key header.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, Response
+from api.models.idempotency_model import IdempotencyModel
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+MAX_KEY_LENGTH = 255
+
+# POST endpoints that create payments or change sessions and reservations.
+IDEMPOTENT_PATHS = [
+    re.compile(pattern) for pattern in (
+        r"^/payments$",
+        r"^/payments/pay$",
+        r"^/payments/\d+/pay$",
+        r"^/reservations/create$",
+        r"^/reservations/bulk$",
+        r"^/parking-lots/\d+/sessions/(start|stop)/\d+$",
+        r"^/sessions/reservations/\d+/(start|stop)$",
+    )
+]
+
+
+def _error(status_code: int, message: str, code: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": {"error": "Idempotency error",
+                            "message": message, "code": code}},
+    )
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """
+    Replays the stored response when a request is retried with the same
+    Idempotency-Key, without running the endpoint again.
+
+    Keys are scoped to the Authorization header of the caller. A key that
+    is reused for a different request is rejected with 422, and a retry
+    that arrives while the first request is still running gets a 409.
+    Responses with a 5xx status are not stored, so those can be retried.
+    """
+
+    def __init__(self, app, store=None, ttl: int = IDEMPOTENCY_KEY_TTL):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application.
+            store: The store of idempotency keys. Defaults to an IdempotencyModel.
+            ttl (int): The number of seconds a key is remembered.
+        """
+        super().__init__(app)
+        self.store = store if store is not None else IdempotencyModel()
+        self.ttl = ttl
+
+    async def dispatch(self, request: Request, call_next):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if (key is None or request.method != "POST"
+                or not any(p.match(request.url.path) for p in IDEMPOTENT_PATHS)):
+            return await call_next(request)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(400, f"{IDEMPOTENCY_HEADER} must be between 1 and "
+                          f"{MAX_KEY_LENGTH} characters", "INVALID_IDEMPOTENCY_KEY")
+
+        body = await request.body()
+        scope = hashlib.sha256(
+            request.headers.get("Authorization", "").encode("utf-8")).hexdigest()
+        fingerprint = hashlib.sha256(
+            b"\n".join([request.method.encode(), request.url.path.encode(),
+                        request.url.query.encode(), body])).hexdigest()
+
+        try:
+            stored = self.store.reserve(scope, key, fingerprint, self.ttl)
+        except Exception as e:
+            logger.error("Idempotency store unavailable, handling request "
+                         "without key: %s", e)
+            return await call_next(request)
+
+        if stored is not None:
+            if stored["fingerprint"] != fingerprint:
+                logger.warning("Idempotency key reused for a different request "
+                               "on %s", request.url.path)
+                return _error(422, "This idempotency key was used for a "
+                              "different request", "IDEMPOTENCY_KEY_REUSED")
+            if stored["status_code"] is None:
+                return _error(409, "A request with this idempotency key is "
+                              "still being processed", "IDEMPOTENCY_KEY_IN_USE")
+            logger.info("Replaying stored response for %s", request.url.path)
+            return Response(content=stored["body"],
+                            status_code=stored["status_code"],
+                            media_type=stored["content_type"],
+                            headers={REPLAYED_HEADER: "true"})
+
+        try:
+            response = await call_next(request)
+            response_body = b"".join([chunk async for chunk in response.body_iterator])
+        except Exception:
+            self._release(scope, key)
+            raise
+
+        if response.status_code >= 500:
+            self._release(scope, key)
+        else:
+            try:
+                self.store.complete(scope, key, response.status_code, response_body,
+                                    response.headers.get("content-type"))
+            except Exception as e:
+                logger.error("Failed to store response for idempotency key: %s", e)
+
+        return Response(content=response_body,
+                        status_code=response.status_code,
+                        headers=dict(response.headers),
+                        media_type=response.media_type)
+
+    def _release(self, scope: str, key: str):
+        try:
+            self.store.release(scope, key)
+        except Exception as e:
+            logger.error("Failed to release idempotency key: %s", e)
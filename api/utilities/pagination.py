@@ -0,0 +1,82 @@
+"""
+This file contains helpers for cursor based (keyset) pagination.
+"""
+
+import base64
+import binascii
+import json
+from typing import Callable, Optional, Sequence
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values) -> str:
+    """
+    Encode the sort key of the last row of a page into an opaque cursor.
+
+    Args:
+        values: The values of the sort key, e.g. a timestamp and an id.
+
+    Returns:
+        str: A url safe cursor string.
+    """
+    payload = [v.isoformat() if hasattr(v, "isoformat") else v for v in values]
+    encoded = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8"))
+    return encoded.decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str],
+                  parsers: Sequence[Callable]) -> Optional[tuple]:
+    """
+    Decode a cursor created by encode_cursor.
+
+    Args:
+        cursor (str | None): The cursor sent by the client.
+        parsers (Sequence[Callable]): One parser for every value of the sort key.
+
+    Returns:
+        tuple | None: The parsed sort key, or None if no cursor was given.
+
+    Raises:
+        HTTPException: Raises 400 if the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("cursor has the wrong number of values")
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError, binascii.Error, UnicodeError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Bad Request",
+                "message": "Invalid pagination cursor",
+                "code": "INVALID_CURSOR",
+            },
+        ) from e
+
+
+def paginate(rows: list, limit: int, key: Callable) -> tuple[list, Optional[str]]:
+    """
+    Split the rows of a keyset query into a page and the cursor of the next page.
+
+    Queries fetch one row more than the page size, so the extra row tells
+    whether there is a next page without a separate count query.
+
+    Args:
+        rows (list): The rows returned by the query, at most limit + 1.
+        limit (int): The page size.
+        key (Callable): Returns the sort key values of a row.
+
+    Returns:
+        tuple[list, str | None]: The page and the cursor of the next page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
@@ -0,0 +1,74 @@
+"""
+This file contains a helper to run independent model queries concurrently.
+
+The models keep one connection each, which can only run one query at a time.
+Every query given to gather_queries() runs in its own thread on a copy of its
+model that uses a connection from the pool, so the queries of one request
+overlap instead of waiting for each other.
+"""
+
+import asyncio
+import copy
+from typing import Any, Callable, List, Tuple
+from api.models.connection import pooled_connection
+
+Query = Tuple[Callable[..., Any], tuple]
+
+
+def query(method: Callable[..., Any], *args: Any) -> Query:
+    """
+    Describe a call of a model method for gather_queries().
+
+    Args:
+        method (Callable): A bound method of a model instance.
+        *args: The arguments of the call.
+
+    Returns:
+        tuple: The method and its arguments.
+    """
+    return method, args
+
+
+def run_pooled(method: Callable[..., Any], *args: Any) -> Any:
+    """
+    Call a model method on a pooled connection instead of the connection of
+    the model. Callables that are not bound to a model are called as is.
+
+    Args:
+        method (Callable): A bound method of a model instance.
+        *args: The arguments of the call.
+
+    Returns:
+        Any: The result of the method.
+    """
+    owner = getattr(method, "__self__", None)
+    if owner is None or not hasattr(owner, "connection"):
+        return method(*args)
+    with pooled_connection() as connection:
+        model = copy.copy(owner)
+        model.connection = connection
+        return getattr(model, method.__name__)(*args)
+
+
+async def gather_queries(*queries: Query) -> List[Any]:
+    """
+    Run model queries concurrently, each on its own pooled connection.
+
+    Args:
+        *queries: The calls to run, created with query().
+
+    Returns:
+        list: The results, in the order of the queries.
+
+    Raises:
+        Exception: The first exception raised by a query, after all queries
+            have finished.
+    """
+    results = await asyncio.gather(
+        *(asyncio.to_thread(run_pooled, method, *args) for method, args in queries),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return list(results)
@@ -0,0 +1,57 @@
+"""
+This file contains helpers to expand and check the windows of bulk reservations.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from api.datatypes.reservation import ReservationRecurrence
+
+Window = Tuple[datetime, datetime]
+
+
+def expand_recurrence(recurrence: ReservationRecurrence,
+                      limit: Optional[int] = None) -> List[Window]:
+    """
+    Expand a weekly recurrence into one window per matching day.
+
+    Every window has the start time and duration of the first occurrence.
+
+    Args:
+        recurrence (ReservationRecurrence): The recurrence to expand.
+        limit (int | None): Stop once there are more windows than this, so
+            the caller can reject the recurrence without expanding all of it.
+
+    Returns:
+        list[tuple[datetime, datetime]]: The start and end of every occurrence,
+            at most limit + 1 windows.
+    """
+    duration = recurrence.end_time - recurrence.start_time
+    weekdays = set(recurrence.weekdays)
+    windows = []
+    first_day = recurrence.start_time.date()
+    for offset in range((recurrence.until - first_day).days + 1):
+        day = first_day + timedelta(days=offset)
+        if day.weekday() in weekdays:
+            start = datetime.combine(day, recurrence.start_time.timetz())
+            windows.append((start, start + duration))
+            if limit is not None and len(windows) > limit:
+                break
+    return windows
+
+
+def find_overlap(windows: List[Window]) -> Optional[Tuple[Window, Window]]:
+    """
+    Find two windows that overlap each other.
+
+    Args:
+        windows (list[tuple[datetime, datetime]]): The windows to check.
+
+    Returns:
+        tuple | None: The first pair of overlapping windows, or None.
+    """
+    ordered = sorted(windows)
+    for previous, current in zip(ordered, ordered[1:]):
+        if current[0] < previous[1]:
+            return previous, current
+    return None
@@ -0,0 +1,74 @@
+"""
+This file contains a small runner for jobs that repeat on a fixed interval.
+"""
+
+import asyncio
+import contextlib
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """
+    Runs a blocking function every interval seconds on a worker thread,
+    so the database calls of the job never block the event loop.
+
+    Attributes:
+        name (str): The name of the job, used in log messages.
+        interval (float): The number of seconds between two runs.
+        func (Callable): The function that is run.
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable):
+        """
+        Initialize a new PeriodicJob.
+
+        Args:
+            name (str): The name of the job, used in log messages.
+            interval (float): The number of seconds between two runs.
+            func (Callable): The function that is run.
+        """
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self):
+        """
+        Run the job once. Failures are logged so the next run still happens.
+
+        Returns:
+            The result of the job, or None if it failed.
+        """
+        try:
+            result = await asyncio.to_thread(self.func)
+            logger.info("Job %s finished: %s", self.name, result)
+            return result
+        except Exception:
+            logger.exception("Job %s failed", self.name)
+            return None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def start(self):
+        """
+        Start running the job in the background of the current event loop.
+        """
+        if self._task is None:
+            logger.info("Starting job %s every %s seconds", self.name, self.interval)
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """
+        Stop the job and wait until it has been cancelled.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
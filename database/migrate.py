@@ -171,6 +171,211 @@ CREATE TABLE IF NOT EXISTS discount_code_locations (
 );
 """)
 
+cur.execute("""
+ALTER TABLE parking_lots ADD COLUMN IF NOT EXISTS occupied INTEGER NOT NULL DEFAULT 0;
+""")
+
+cur.execute("""
+UPDATE parking_lots p
+SET occupied = (
+    SELECT COUNT(*) FROM sessions s
+    WHERE s.parking_lot_id = p.id AND s.end_time IS NULL
+);
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_sessions_parking_lot_start
+    ON sessions (parking_lot_id, start_time, id);
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_sessions_active_start
+    ON sessions (start_time, id) WHERE end_time IS NULL;
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_payments_user_date
+    ON payments (user_id, (COALESCE(date, '-infinity'::timestamp)), id);
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_payments_user_open
+    ON payments (user_id, (COALESCE(date, '-infinity'::timestamp)), id) WHERE completed IS FALSE;
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_payments_lot_date
+    ON payments (parking_lot_id, (COALESCE(date, '-infinity'::timestamp)), id);
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_payments_transaction
+    ON payments (transaction);
+""")
+
+cur.execute("""
+ALTER TABLE payments
+    ADD COLUMN IF NOT EXISTS refund_claimed_by INTEGER REFERENCES users(id),
+    ADD COLUMN IF NOT EXISTS refund_claimed_until TIMESTAMP;
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_payments_pending_refunds
+    ON payments (date, id)
+    WHERE refund_requested = TRUE AND refund_accepted = FALSE;
+""")
+
+cur.execute("""
+CREATE TABLE IF NOT EXISTS payment_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER,
+    parking_lot_id INTEGER,
+    session_id INTEGER,
+    reservation_id INTEGER,
+    amount FLOAT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+""")
+
+cur.execute("""
+CREATE TABLE IF NOT EXISTS payment_outbox_dead_letters (
+    id BIGINT PRIMARY KEY,
+    user_id INTEGER,
+    parking_lot_id INTEGER,
+    session_id INTEGER,
+    reservation_id INTEGER,
+    amount FLOAT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    error TEXT,
+    failed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+""")
+
+cur.execute("""
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(64) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL,
+    status_code INTEGER,
+    response_body BYTEA,
+    content_type VARCHAR,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires
+    ON idempotency_keys (expires_at);
+""")
+
+cur.execute("""
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+""")
+
+cur.execute("""
+DO $$
+BEGIN
+    -- No-show reservations have released their spot, so they no longer block
+    -- the vehicle. Recreate constraints made before that rule existed.
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'reservations_vehicle_no_overlap'
+          AND pg_get_constraintdef(oid) NOT LIKE '%No Show%'
+    ) THEN
+        ALTER TABLE reservations DROP CONSTRAINT reservations_vehicle_no_overlap;
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'reservations_vehicle_no_overlap'
+    ) THEN
+        ALTER TABLE reservations
+            ADD CONSTRAINT reservations_vehicle_no_overlap
+            EXCLUDE USING gist (
+                vehicle_id WITH =,
+                tsrange(start_time, end_time) WITH &&
+            ) WHERE (start_time < end_time AND status IS DISTINCT FROM 'No Show');
+    END IF;
+EXCEPTION WHEN exclusion_violation THEN
+    RAISE WARNING 'Overlapping reservations exist, constraint not created';
+END $$;
+""")
+
+cur.execute("""
+CREATE TABLE IF NOT EXISTS parking_lot_availability (
+    parking_lot_id INTEGER NOT NULL REFERENCES parking_lots(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    slots INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[96]),
+    PRIMARY KEY (parking_lot_id, day)
+);
+""")
+
+# Recompute the availability from today on from the reservations that have
+# not ended yet, so reservations added without booking slots are counted
+cur.execute("""
+UPDATE parking_lot_availability
+SET slots = array_fill(0, ARRAY[96])
+WHERE day >= CURRENT_DATE;
+""")
+
+cur.execute("""
+WITH booked AS (
+    SELECT r.parking_lot_id,
+           t::date AS day,
+           (EXTRACT(HOUR FROM t) * 4 + EXTRACT(MINUTE FROM t) / 15)::int AS slot,
+           COUNT(*) AS booked
+    FROM reservations r,
+         generate_series(
+             date_bin('15 minutes', r.start_time, TIMESTAMP '2000-01-01'),
+             r.end_time - INTERVAL '1 microsecond',
+             INTERVAL '15 minutes') AS t
+    WHERE r.parking_lot_id IS NOT NULL
+      AND r.start_time < r.end_time
+      AND r.end_time > NOW()
+      AND r.status IS DISTINCT FROM 'No Show'
+      AND t >= CURRENT_DATE
+    GROUP BY 1, 2, 3
+)
+INSERT INTO parking_lot_availability (parking_lot_id, day, slots)
+SELECT d.parking_lot_id, d.day,
+       array_agg(COALESCE(b.booked, 0)::int ORDER BY s.slot)
+FROM (SELECT DISTINCT parking_lot_id, day FROM booked) AS d
+CROSS JOIN generate_series(0, 95) AS s(slot)
+LEFT JOIN booked b
+       ON b.parking_lot_id = d.parking_lot_id
+      AND b.day = d.day
+      AND b.slot = s.slot
+GROUP BY d.parking_lot_id, d.day
+ON CONFLICT (parking_lot_id, day) DO UPDATE SET slots = EXCLUDED.slots;
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_reservations_open_start
+    ON reservations (start_time, id) WHERE status IN ('Payment Pending', 'active');
+""")
+
+cur.execute("""
+CREATE INDEX IF NOT EXISTS idx_sessions_reservation
+    ON sessions (reservation_id) WHERE reservation_id IS NOT NULL;
+""")
+
+cur.execute("""
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    stage VARCHAR NOT NULL,
+    source_file VARCHAR NOT NULL,
+    content_hash CHAR(64),
+    records BIGINT NOT NULL DEFAULT 0,
+    records_hash CHAR(64),
+    completed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (stage, source_file)
+);
+""")
+
+cur.execute("""
+ALTER TABLE import_checkpoints ADD COLUMN IF NOT EXISTS records_hash CHAR(64);
+""")
+
 
 conn.commit()
 